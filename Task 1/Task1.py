@@ -2,14 +2,26 @@
 import time        # For delays and timing
 import pandas as pd  # Data manipulation
 import logging     # For logging progress and errors
+import os          # For the module search path
+import sys         # For the module search path
+import json        # For DevTools log entries and captured API responses
+import base64      # For binary API response bodies
+import queue       # For idle drivers in the pool
+import argparse    # For command-line options
+import threading   # For the driver pool's bookkeeping
+from contextlib import contextmanager  # For borrowing pooled drivers
+from concurrent.futures import ThreadPoolExecutor, as_completed  # For crawl workers
+from urllib.parse import urlsplit  # For the rate controller's host key
 # Selenium imports for browser automation
 from selenium import webdriver
-from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from bs4 import BeautifulSoup  # For HTML parsing
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rate_control import RateController, is_throttled  # Adaptive per-host pacing (repository root)
+
 
 # Configuration for scraping
 CONFIG = {
@@ -18,10 +30,40 @@ CONFIG = {
     'STATE': 'Gujarat',
     'MIN_GYMS': 80,  # Minimum gyms to scrape
     'OUTPUT_FILE': 'Task 1/ahmedabad_gyms.csv',  # Output CSV file
-    'SCROLL_COUNT': 12,  # Number of scrolls to load more gyms
-    'SCROLL_DELAY': 1.5,  # Delay between scrolls (seconds)
+    'MAX_SCROLLS': 100,  # Upper bound on scrolls; the loop normally stops at MIN_GYMS or when the feed stalls
+    'SCROLL_TIMEOUT': 6,  # Seconds to wait for new articles after a scroll
+    'STALL_SCROLLS': 2,  # Stop after this many scrolls in a row load no new articles
+    'SCROLL_DELAY': 1.5,  # Starting delay between scrolls (seconds); adapted by the rate controller
+    'MIN_SCROLL_DELAY': 0.5,  # Fastest the rate controller may scroll (seconds between scrolls)
+    'BLOCK_MARKERS': ('Access Denied', 'Too Many Requests', 'Request blocked', 'unusual traffic'),  # Block page text
+    # Multi-city / multi-category crawl (--crawl)
+    'URL_TEMPLATE': 'https://magicpin.in/india/{city}/All/{category}/',
+    'CITIES': {  # City -> state
+        'Ahmedabad': 'Gujarat', 'Surat': 'Gujarat', 'Vadodara': 'Gujarat', 'Mumbai': 'Maharashtra',
+        'Pune': 'Maharashtra', 'New-Delhi': 'Delhi', 'Bangalore': 'Karnataka', 'Hyderabad': 'Telangana',
+        'Chennai': 'Tamil Nadu', 'Kolkata': 'West Bengal', 'Jaipur': 'Rajasthan', 'Lucknow': 'Uttar Pradesh',
+    },
+    'CATEGORIES': ['Gym', 'Salon', 'Cafe', 'Spa'],
+    'WORKERS': 4,  # Headless drivers in the pool
+    'BLOCKED_URLS': ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',  # Not needed for the listings
+                     '*.woff', '*.woff2', '*.ttf', '*.otf', '*.css'],
+    'CRAWL_OUTPUT_FILE': 'Task 1/magicpin_listings.csv',
+    # XHR capture mode (--capture): listing API responses read from the DevTools performance log
+    'API_URL_MARKERS': ('getMerchants', 'merchantList', 'merchant_list', '/listing'),  # Listing endpoints only
+    'API_MERCHANT_KEYS': ('merchantId', 'merchant_id', 'merchantUserId', 'merchantName', 'merchant_name',
+                          'storeId', 'store_id', 'storeName'),  # A listing object carries at least one of these
+    'API_FIELDS': {  # Record field -> JSON keys that may hold it
+        'Name': ('merchantName', 'merchant_name', 'storeName', 'name', 'title'),
+        'Area': ('locality', 'localityName', 'locality_name', 'area', 'areaName'),
+        'Address': ('address', 'fullAddress', 'merchantAddress', 'addressLine'),
+        'Phone Number': ('phone', 'phoneNumber', 'phone_number', 'contactNumber', 'mobile', 'phones'),
+        'Timings': ('timings', 'timing', 'openingHours', 'opening_hours', 'businessHours', 'hours'),
+    },
 }
 
+# Columns of the merged crawl output
+CRAWL_COLUMNS = ['Category', 'Name', 'Address', 'Area', 'City', 'State', 'Phone Number', 'Timings']
+
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(message)s')
@@ -29,126 +71,315 @@ logger = logging.getLogger(__name__)
 
 
 # Set up Selenium Chrome WebDriver with custom options
-def setup_driver():
+def setup_driver(headless=False, capture=False):
+    """
+    Start Chrome. headless=True runs without a window and blocks images,
+    fonts and stylesheets (BLOCKED_URLS), which the listings do not need.
+    capture=True records network events in the performance log so
+    scrape_listing can read the listing API responses.
+    """
     options = Options()
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
     options.add_argument('--window-size=1400,900')
     options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
-    return webdriver.Chrome(options=options)
+    if headless:
+        options.add_argument('--headless=new')
+        options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+    if capture:
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    driver = webdriver.Chrome(options=options)
+    if headless or capture:
+        driver.execute_cdp_cmd('Network.enable', {})
+    if headless:
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': CONFIG['BLOCKED_URLS']})
+    return driver
+
+
+# Load a URL, backing off and retrying while the site serves a block page
+def load_page(driver, url, rate):
+    host = urlsplit(url).netloc
+    for attempt in range(rate.max_retries + 1):
+        if attempt:
+            rate.retried(host)
+            delay = rate.backoff(attempt - 1)
+            logger.warning(f'⚠ Blocked, retrying in {delay:.1f}s (attempt {attempt + 1})')
+            time.sleep(delay)
+        rate.wait(host)
+        driver.get(url)
+        if is_throttled(None, driver.page_source, CONFIG['BLOCK_MARKERS']):
+            rate.throttled(host)
+            continue
+        rate.success(host)
+        return True
+    rate.failed(host)
+    return False
+
+
+# Outer HTML of the store articles from position `start` on (the ones appended since the last call)
+NEW_ARTICLES_JS = """
+return Array.from(document.querySelectorAll('article.store')).slice(arguments[0]).map(a => a.outerHTML);
+"""
+
+
+# Number of store articles currently in the page
+def article_count(driver):
+    return driver.execute_script("return document.querySelectorAll('article.store').length;")
+
+
+# Bodies of the listing API responses that finished loading since the last call
+def captured_payloads(driver, state):
+    """
+    Reads the Chrome performance log (DevTools Network events). JSON
+    responses whose URL contains one of API_URL_MARKERS are remembered on
+    Network.responseReceived and their bodies fetched with
+    Network.getResponseBody once Network.loadingFinished arrives. state
+    carries pending request ids and read ids between calls.
+    """
+    payloads = []
+    for entry in driver.get_log('performance'):
+        event = json.loads(entry['message'])['message']
+        params = event.get('params', {})
+        if event['method'] == 'Network.responseReceived':
+            response = params['response']
+            if 'json' in response.get('mimeType', '') and any(marker in response['url']
+                                                               for marker in CONFIG['API_URL_MARKERS']):
+                state['pending'][params['requestId']] = response['url']
+        elif event['method'] == 'Network.loadingFinished' and params.get('requestId') in state['pending']:
+            request_id = params['requestId']
+            del state['pending'][request_id]
+            if request_id in state['seen']:
+                continue
+            state['seen'].add(request_id)
+            try:
+                body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+                text = base64.b64decode(body['body']).decode('utf-8') if body.get('base64Encoded') else body['body']
+                payloads.append(json.loads(text))
+            except Exception as e:
+                logger.info(f'✗ Could not read API response: {str(e)[:40]}')
+    return payloads
 
 
-# ============================================
-# MAIN SCRAPER FUNCTION
-# ============================================
+# First present, non-empty field of a JSON object among its aliases
+def first_field(item, aliases):
+    for alias in aliases:
+        value = item.get(alias)
+        if value not in (None, '', [], {}):
+            return value
+    return None
+
+
+# Flatten a phone / timings value (string, list or mapping) to one string
+def flatten_value(value):
+    if isinstance(value, dict):
+        return '; '.join(f'{key}: {flatten_value(item)}' for key, item in value.items())
+    if isinstance(value, list):
+        separator = '; ' if any(isinstance(item, (dict, list)) for item in value) else ', '
+        return separator.join(flatten_value(item) for item in value)
+    return str(value).strip()
 
 
-def scrape_magicpin_gyms() -> pd.DataFrame:
+# Listing records found anywhere in a listing API payload
+def listings_from_json(payload, city=CONFIG['CITY'], state=CONFIG['STATE']):
     """
-    Main function to scrape gym listings from MagicPin for Ahmedabad.
+    Walks the whole payload and yields a record (same fields as
+    parse_store_article) for every merchant object: one with a merchant key
+    (API_MERCHANT_KEYS), a name and at least one location or contact
+    field, using the aliases in API_FIELDS. City or category metadata that
+    merely has a name is skipped, and objects nested inside a merchant
+    (e.g. the outlets of a chain) are walked too.
+    """
+    stack = [payload]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(reversed(item))
+            continue
+        if not isinstance(item, dict):
+            continue
+        stack.extend(reversed(list(item.values())))
+        if not any(key in item for key in CONFIG['API_MERCHANT_KEYS']):
+            continue
+        name = first_field(item, CONFIG['API_FIELDS']['Name'])
+        details = {field: first_field(item, aliases) for field, aliases in CONFIG['API_FIELDS'].items()
+                   if field != 'Name'}
+        if isinstance(name, str) and len(name.strip()) >= 2 and any(value is not None for value in details.values()):
+            area = details['Area']
+            if isinstance(area, dict):  # e.g. {"locality": {"name": ...}}
+                area = first_field(area, CONFIG['API_FIELDS']['Name'])
+            area = flatten_value(area).split(',')[0].strip() if area else 'N/A'
+            yield {
+                'Name': name.strip(),
+                'Address': flatten_value(details['Address']) if details['Address']
+                else (f'{area}, {city}, {state}' if area != 'N/A' else 'N/A'),
+                'Area': area,
+                'City': city,
+                'State': state,
+                'Phone Number': flatten_value(details['Phone Number']) if details['Phone Number'] else 'N/A',
+                'Timings': flatten_value(details['Timings']) if details['Timings'] else 'N/A',
+            }
+
+
+# Extract a listing record from one store article; returns None when it has no usable name
+def parse_store_article(article, city=CONFIG['CITY'], state=CONFIG['STATE']):
+    # Get store name from h2 or h3 tag
+    name_elem = article.find(['h2', 'h3'])
+    name = name_elem.get_text(strip=True) if name_elem else 'N/A'
+
+    # Validate store name
+    if not name or name == 'N/A' or len(name) < 2:
+        return None
+
+    # Get location from merchant-location div
+    location_elem = article.find('div', class_='merchant-location')
+    area = 'N/A'
+
+    if location_elem:
+        # The first link contains area name
+        location_link = location_elem.find('a')
+        if location_link:
+            area = location_link.get_text(strip=True).split(',')[0].strip()
+
+    # Address is area + city + state
+    address = f'{area}, {city}, {state}' if area != 'N/A' else 'N/A'
+
+    return {
+        'Name': name,
+        'Address': address,
+        'Area': area,
+        'City': city,
+        'State': state,
+        'Phone Number': 'N/A',  # Not available
+        'Timings': 'N/A',       # Not available
+    }
+
+
+def scrape_listing(driver, url, rate, city=CONFIG['CITY'], state=CONFIG['STATE'], min_count=CONFIG['MIN_GYMS'],
+                   label='', capture=False):
+    """
+    Scrape one MagicPin listing page with an open driver.
     Steps:
-    1. Load the listing page in Selenium Chrome browser
-    2. Scroll multiple times to load more gyms
-    3. Parse the page source with BeautifulSoup
-    4. Extract gym details from each article
-    5. Clean, deduplicate, and save results to CSV
+    1. Load the listing page
+    2. Scroll until min_count unique stores are found or the feed stops
+       growing, waiting for new stores after each scroll
+    3. Extract only what arrived since the last scroll: the appended store
+       articles, or with capture=True the listing API responses (the
+       driver must come from setup_driver(capture=True))
+    4. Deduplicate stores by name as they arrive
+    Returns the list of records; label prefixes the log lines.
     """
-    driver = setup_driver()
-    all_gyms = []  # List to store gym records
-
+    records = []  # List to store listing records
+    seen_names = set()  # Store names already collected
+    parsed = 0  # Articles / API responses parsed so far
+    host = urlsplit(url).netloc
+    capture_state = {'pending': {}, 'seen': set()}  # Listing responses still loading, responses already read
+
+    # Keep a record unless its name was seen before
+    def add_record(record, idx):
+        if record is None:
+            logger.info(f'{label}[{idx:3d}] ✗ Invalid name')
+        elif record['Name'] in seen_names:
+            logger.info(f'{label}[{idx:3d}] - Duplicate: {record["Name"]}')
+        else:
+            seen_names.add(record['Name'])
+            records.append(record)
+            logger.info(f'{label}[{idx:3d}] ✓ {record["Name"]:40} | {record["Area"]}')
+
+    # Parse the articles appended since the last call; True when there were any
+    def extract_new_articles():
+        nonlocal parsed
+        if article_count(driver) <= parsed:
+            return False
+        fragments = driver.execute_script(NEW_ARTICLES_JS, parsed)
+        for idx, fragment in enumerate(fragments, parsed + 1):
+            try:
+                add_record(parse_store_article(BeautifulSoup(fragment, 'html.parser').article, city, state), idx)
+            except Exception as e:
+                logger.info(f'{label}[{idx:3d}] ✗ Error: {str(e)[:40]}')
+        parsed += len(fragments)
+        return True
+
+    # Read the listing API responses captured since the last call; True when there were any
+    def extract_new_responses():
+        nonlocal parsed
+        payloads = captured_payloads(driver, capture_state)
+        for payload in payloads:
+            for record in listings_from_json(payload, city, state):
+                add_record(record, len(records) + 1)
+        parsed += len(payloads)
+        return bool(payloads)
+
+    extract_new = extract_new_responses if capture else extract_new_articles
+
+    # STEP 1: Load listing page
+    logger.info(f'\n{label}>>> Loading: {url}')
+    if not load_page(driver, url, rate):
+        logger.error(f'{label}✗ Site kept serving a block page')
+        return records
+
+    # Wait for the first stores to arrive
+    logger.info(f'\n{label}>>> Extracting store details...\n')
     try:
-        # STEP 1: Load listing page
-        logger.info(f'\n>>> Loading: {CONFIG["MAIN_URL"]}')
-        driver.get(CONFIG['MAIN_URL'])
-
-        # Wait for page to render
-        logger.info('>>> Waiting for page to render...')
-        time.sleep(3)
-
-        # Wait for articles to appear
+        WebDriverWait(driver, 15).until(lambda d: extract_new())
+        logger.info(f'{label}✓ Listings found!')
+    except TimeoutException:
+        logger.warning(f'{label}⚠ Timeout waiting for listings')
+
+    # STEP 2 + 3: Scroll until min_count is reached or the feed stalls, extracting what each scroll adds
+    stalled = 0
+    for scroll_idx in range(CONFIG['MAX_SCROLLS']):
+        if len(records) >= min_count or stalled >= CONFIG['STALL_SCROLLS']:
+            break
+        rate.wait(host)
+        before = len(records)
+        driver.execute_script('window.scrollTo(0, document.body.scrollHeight);')
         try:
-            WebDriverWait(driver, 15).until(
-                EC.presence_of_all_elements_located((By.TAG_NAME, 'article'))
-            )
-            logger.info('✓ Articles found!')
-        except:
-            logger.warning('⚠ Timeout waiting for articles')
-
-        # STEP 2: Scroll to load more gyms
-        logger.info(f'\n>>> Scrolling {CONFIG["SCROLL_COUNT"]} times to load gyms...')
-        for scroll_idx in range(CONFIG['SCROLL_COUNT']):
-            driver.execute_script('window.scrollTo(0, document.body.scrollHeight);')
-            time.sleep(CONFIG['SCROLL_DELAY'])
-            logger.info(f'  Scroll {scroll_idx + 1}/{CONFIG["SCROLL_COUNT"]}')
-
-        # STEP 3: Parse gym articles
-        logger.info(f'\n>>> Parsing gym articles...')
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-
-        # Find all gym articles
-        articles = soup.find_all('article', class_='store')
-        logger.info(f'✓ Found {len(articles)} gym articles')
+            WebDriverWait(driver, CONFIG['SCROLL_TIMEOUT']).until(lambda d: extract_new())
+        except TimeoutException:
+            if is_throttled(None, driver.page_source, CONFIG['BLOCK_MARKERS']):
+                rate.throttled(host)
+                logger.warning(f'{label}  Scroll {scroll_idx + 1} ⚠ blocked, slowing down')
+            else:
+                stalled += 1
+                logger.info(f'{label}  Scroll {scroll_idx + 1}: nothing new ({stalled}/{CONFIG["STALL_SCROLLS"]})')
+            continue
+        rate.success(host)
+        stalled = 0
+        logger.info(f'{label}  Scroll {scroll_idx + 1}: {len(records) - before} new stores')
+
+    logger.info(f'{label}✓ Rate control: {rate.stats().get(host)}')
+    logger.info(f'{label}✓ Parsed {parsed} {"API responses" if capture else "store articles"}')
+    return records
 
-        if len(articles) == 0:
-            logger.error('✗ No gym articles found!')
-            return pd.DataFrame()
 
-        # STEP 4: Extract gym info from each article
-        logger.info(f'\n>>> Extracting gym details...\n')
+# ============================================
+# MAIN SCRAPER FUNCTION
+# ============================================
 
-        for idx, article in enumerate(articles, 1):
-            try:
-                # Get gym name from h2 or h3 tag
-                name_elem = article.find(['h2', 'h3'])
-                gym_name = name_elem.get_text(strip=True) if name_elem else 'N/A'
-
-                # Get location from merchant-location div
-                location_elem = article.find('div', class_='merchant-location')
-                area = 'N/A'
-
-                if location_elem:
-                    # The first link contains area name
-                    location_link = location_elem.find('a')
-                    if location_link:
-                        area = location_link.get_text(strip=True).split(',')[0].strip()
-
-                # Address is area + city + state
-                address = f'{area}, {CONFIG["CITY"]}, {CONFIG["STATE"]}' if area != 'N/A' else 'N/A'
-
-                # Validate gym name
-                if not gym_name or gym_name == 'N/A' or len(gym_name) < 2:
-                    logger.info(f'[{idx:3d}] ✗ Invalid gym name')
-                    continue
 
-                # Create gym record
-                gym_record = {
-                    'Gym Name': gym_name,
-                    'Address': address,
-                    'Area': area,
-                    'City': CONFIG['CITY'],
-                    'State': CONFIG['STATE'],
-                    'Phone Number': 'N/A',  # Not available
-                    'Timings': 'N/A',       # Not available
-                }
+def scrape_magicpin_gyms(url=CONFIG['MAIN_URL'], capture=False) -> pd.DataFrame:
+    """
+    Main function to scrape gym listings from MagicPin for Ahmedabad.
+    Steps:
+    1. Scrape the listing page in Selenium Chrome browser (scrape_listing),
+       from the rendered articles or, with capture=True, the API responses
+    2. Build a DataFrame from the gyms (already unique by name)
+    3. Save results to CSV
+    """
+    driver = setup_driver(capture=capture)
 
-                all_gyms.append(gym_record)
-                logger.info(f'[{idx:3d}] ✓ {gym_name:40} | {area}')
+    # Scrolls are paced per host: faster while pages stay healthy, slower on block pages
+    rate = RateController(initial_rate=1 / CONFIG['SCROLL_DELAY'], max_rate=1 / CONFIG['MIN_SCROLL_DELAY'])
 
-            except Exception as e:
-                logger.info(f'[{idx:3d}] ✗ Error: {str(e)[:40]}')
-                continue
+    try:
+        all_gyms = scrape_listing(driver, url, rate, capture=capture)
 
-        # STEP 5: Create DataFrame from collected gyms
         if not all_gyms:
             logger.error('\n✗ No valid gym data collected')
             return pd.DataFrame()
 
         logger.info(f'\n>>> Processing data...')
-        df = pd.DataFrame(all_gyms)
-
-        # Remove duplicate gyms by name
-        df = df.drop_duplicates(subset=['Gym Name'], keep='first')
-        df = df.reset_index(drop=True)
+        df = pd.DataFrame(all_gyms).rename(columns={'Name': 'Gym Name'})
 
         logger.info(f'✓ Total unique gyms: {len(df)}')
         logger.info(f'✓ Unique areas: {df["Area"].nunique()}')
@@ -174,6 +405,121 @@ def scrape_magicpin_gyms() -> pd.DataFrame:
             pass
 
 
+# ============================================
+# MULTI-CITY / MULTI-CATEGORY CRAWL
+# ============================================
+
+
+class DriverPool:
+    """
+    Reusable headless drivers shared by crawl workers. Drivers are started
+    on first use, up to `size`, and handed back after each job. A driver
+    that failed during a job is discarded and replaced on the next
+    checkout.
+    """
+
+    def __init__(self, size, capture=False):
+        self.size = size
+        self.capture = capture
+        self.idle = queue.Queue()
+        self.started = 0
+        self.lock = threading.Lock()
+        self.drivers = []
+
+    # Borrow a driver for one job
+    @contextmanager
+    def driver(self):
+        with self.lock:
+            start_new = self.idle.empty() and self.started < self.size
+            if start_new:
+                self.started += 1
+        if start_new:
+            try:
+                driver = setup_driver(headless=True, capture=self.capture)
+            except Exception:
+                with self.lock:
+                    self.started -= 1
+                raise
+            with self.lock:
+                self.drivers.append(driver)
+        else:
+            driver = self.idle.get()
+        try:
+            yield driver
+        except Exception:
+            self.discard(driver)
+            raise
+        self.idle.put(driver)
+
+    def discard(self, driver):
+        with self.lock:
+            self.started -= 1
+            self.drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        for driver in list(self.drivers):
+            self.discard(driver)
+
+
+# Scrape one (city, category) listing with a pooled driver; returns (records, seconds)
+def crawl_job(pool, rate, city, category, min_count, capture=False):
+    label = f'[{city}/{category}] '
+    url = CONFIG['URL_TEMPLATE'].format(city=city, category=category)
+    start = time.time()
+    with pool.driver() as driver:
+        records = scrape_listing(driver, url, rate, city, CONFIG['CITIES'][city], min_count, label, capture)
+    for record in records:
+        record['Category'] = category
+    return records, time.time() - start
+
+
+def crawl_magicpin(cities, categories, workers=CONFIG['WORKERS'], min_count=CONFIG['MIN_GYMS'],
+                   capture=False) -> pd.DataFrame:
+    """
+    Crawl every (city, category) listing with a pool of `workers` headless
+    drivers and merge the results into one DataFrame (CRAWL_COLUMNS),
+    deduplicated on category, city, name and area. All jobs share one rate
+    controller, so the pool as a whole stays within the per-host pace.
+    Per-job timings are logged as jobs finish; a failed job is logged and
+    skipped. capture=True reads listing API responses instead of articles.
+    """
+    rate = RateController(initial_rate=1 / CONFIG['SCROLL_DELAY'], max_rate=1 / CONFIG['MIN_SCROLL_DELAY'])
+    pool = DriverPool(workers, capture)
+    jobs = [(city, category) for city in cities for category in categories]
+    all_records = []
+    timings = []
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(crawl_job, pool, rate, city, category, min_count, capture): (city, category)
+                       for city, category in jobs}
+            for future in as_completed(futures):
+                city, category = futures[future]
+                try:
+                    records, seconds = future.result()
+                except Exception as e:
+                    logger.error(f'✗ [{city}/{category}] failed: {str(e)[:60]}')
+                    continue
+                all_records += records
+                timings.append((city, category, len(records), seconds))
+                logger.info(f'✓ [{city}/{category}] {len(records)} listings in {seconds:.1f}s')
+    finally:
+        pool.close()
+
+    logger.info('\n>>> Job timings:')
+    for city, category, count, seconds in sorted(timings, key=lambda timing: -timing[3]):
+        logger.info(f'  {city:15} {category:12} {count:5d} listings  {seconds:6.1f}s')
+
+    df = pd.DataFrame(all_records, columns=CRAWL_COLUMNS)
+    df = df.drop_duplicates(subset=['Category', 'City', 'Name', 'Area'], keep='first').reset_index(drop=True)
+    logger.info(f'✓ Total unique listings: {len(df)} from {len(timings)}/{len(jobs)} jobs')
+    return df
+
+
 # ============================================
 # MAIN EXECUTION BLOCK
 # ============================================
@@ -181,12 +527,46 @@ def scrape_magicpin_gyms() -> pd.DataFrame:
 
 if __name__ == '__main__':
     # Entry point for script execution
+    arg_parser = argparse.ArgumentParser(description='Scrape MagicPin listings')
+    arg_parser.add_argument('--crawl', action='store_true',
+                            help='crawl every city x category with a pool of headless drivers '
+                                 f'(output: {CONFIG["CRAWL_OUTPUT_FILE"]})')
+    arg_parser.add_argument('--cities', nargs='+', choices=list(CONFIG['CITIES']), default=list(CONFIG['CITIES']),
+                            help='cities to crawl (default: all)')
+    arg_parser.add_argument('--categories', nargs='+', default=CONFIG['CATEGORIES'],
+                            help=f'MagicPin categories to crawl (default: {" ".join(CONFIG["CATEGORIES"])})')
+    arg_parser.add_argument('--workers', type=int, default=CONFIG['WORKERS'],
+                            help=f'headless drivers in the pool (default: {CONFIG["WORKERS"]})')
+    arg_parser.add_argument('--capture', action='store_true',
+                            help='read listings from the site\'s API responses (DevTools performance log) '
+                                 'instead of the rendered articles; fills Phone Number and Timings')
+    arg_parser.add_argument('--url', default=CONFIG['MAIN_URL'],
+                            help='listing URL for the single-listing scrape (e.g. a local stub)')
+    arg_parser.add_argument('--min-per-job', type=int, default=CONFIG['MIN_GYMS'],
+                            help=f'stop scrolling a listing after this many stores (default: {CONFIG["MIN_GYMS"]})')
+    args = arg_parser.parse_args()
+
+    if args.crawl:
+        logger.info('\n' + '='*70)
+        logger.info(f'MAGICPIN CRAWL - {len(args.cities)} cities x {len(args.categories)} categories, '
+                    f'{args.workers} workers')
+        logger.info('='*70)
+
+        start = time.time()
+        df = crawl_magicpin(args.cities, args.categories, args.workers, args.min_per_job, args.capture)
+        df.to_csv(CONFIG['CRAWL_OUTPUT_FILE'], index=False)
+        logger.info(f'\nCOMPLETED IN {time.time() - start:.1f} SECONDS')
+        if not df.empty:
+            print('\n' + df.groupby(['City', 'Category']).size().unstack(fill_value=0).to_string())
+        print(f'\n✓ File: {CONFIG["CRAWL_OUTPUT_FILE"]} ({len(df)} listings)')
+        raise SystemExit(0)
+
     logger.info('\n' + '='*70)
     logger.info('MAGICPIN GYM SCRAPER - CORRECTED')
     logger.info('='*70)
 
     start = time.time()
-    df = scrape_magicpin_gyms()
+    df = scrape_magicpin_gyms(args.url, args.capture)
     elapsed = time.time() - start
 
     logger.info('\n' + '='*70)
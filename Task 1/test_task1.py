@@ -0,0 +1,100 @@
+# Tests for the Task 1 API capture mode (run with: python -m pytest "Task 1")
+import os            # For fixture paths
+import json          # For the recorded API responses
+import base64        # For base64-encoded response bodies
+import pytest
+
+pytest.importorskip('selenium')
+import Task1
+from rate_control import RateController
+
+
+FIXTURE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+LISTING_URL = 'https://magicpin.in/india/Ahmedabad/All/Gym/'
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURE_FOLDER, name), encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+class StubDriver:
+    """
+    Replays fixtures/performance_log.json: loading the page releases the
+    first batch of DevTools events and every scroll the next one.
+    Network.getResponseBody serves the recorded JSON files.
+    """
+
+    page_source = '<html><body>listing</body></html>'
+
+    def __init__(self):
+        log = load_fixture('performance_log.json')
+        self.batches = log['batches']
+        self.bodies = log['bodies']
+        self.events = []
+
+    def release_batch(self):
+        if self.batches:
+            self.events += [{'message': json.dumps({'message': event})} for event in self.batches.pop(0)]
+
+    def get(self, url):
+        self.release_batch()
+
+    def execute_script(self, script, *args):
+        if 'scrollTo' in script:
+            self.release_batch()
+
+    def get_log(self, kind):
+        events, self.events = self.events, []
+        return events
+
+    def execute_cdp_cmd(self, command, params):
+        body = self.bodies[params['requestId']]
+        with open(os.path.join(FIXTURE_FOLDER, body['file']), 'rb') as handle:
+            content = handle.read()
+        if body['base64Encoded']:
+            return {'body': base64.b64encode(content).decode('ascii'), 'base64Encoded': True}
+        return {'body': content.decode('utf-8'), 'base64Encoded': False}
+
+
+def test_listings_from_json_reads_merchants():
+    records = list(Task1.listings_from_json(load_fixture('listing_page1.json')))
+    assert [record['Name'] for record in records] == ['Iron Temple Fitness', "Gold's Gym", 'Anytime Fitness']
+    iron_temple, golds_gym, anytime = records
+    assert iron_temple['Area'] == 'Navrangpura'
+    assert iron_temple['Phone Number'] == '+91 98250 11111, +91 79 2640 1111'
+    assert iron_temple['Timings'] == 'day: Mon-Sat; hours: 6am - 10pm; day: Sun; hours: 7am - 12pm'
+    assert golds_gym['Area'] == 'Satellite'
+    assert golds_gym['Address'] == 'Satellite, Ahmedabad, Gujarat'
+    assert golds_gym['Timings'] == 'weekdays: 5:30am - 11pm; weekend: 6am - 9pm'
+    assert anytime['Phone Number'] == 'N/A'
+
+
+def test_listings_from_json_finds_nested_merchants_and_skips_metadata():
+    names = [record['Name'] for record in Task1.listings_from_json(load_fixture('listing_page2.json'))]
+    assert names == ['Fitness Hub Chain', 'Hidden Gym', 'Fitness Hub Vastrapur', 'Iron Temple Fitness']
+
+
+def test_listings_from_json_ignores_unrelated_payloads():
+    assert list(Task1.listings_from_json(load_fixture('search_suggest.json'))) == []
+    assert list(Task1.listings_from_json({'name': 'Ahmedabad', 'areaName': 'all'})) == []
+
+
+def test_captured_payloads_reads_listing_responses_once():
+    driver = StubDriver()
+    state = {'pending': {}, 'seen': set()}
+    driver.get(LISTING_URL)
+    assert Task1.captured_payloads(driver, state) == [load_fixture('listing_page1.json')]
+    driver.execute_script('window.scrollTo(0, document.body.scrollHeight);')
+    assert Task1.captured_payloads(driver, state) == [load_fixture('listing_page2.json')]
+    assert Task1.captured_payloads(driver, state) == []
+
+
+def test_scrape_listing_with_capture(monkeypatch):
+    monkeypatch.setitem(Task1.CONFIG, 'SCROLL_TIMEOUT', 0.2)
+    rate = RateController(initial_rate=100, max_rate=100)
+    records = Task1.scrape_listing(StubDriver(), LISTING_URL, rate, min_count=50, capture=True)
+    assert [record['Name'] for record in records] == [
+        'Iron Temple Fitness', "Gold's Gym", 'Anytime Fitness', 'Fitness Hub Chain', 'Hidden Gym',
+        'Fitness Hub Vastrapur',
+    ]
@@ -1,11 +1,39 @@
-
 # Standard library imports
 import time        # For delays between requests
-import random      # For randomizing delays
 import pandas as pd  # Data manipulation
 from bs4 import BeautifulSoup  # HTML parsing
 import requests    # HTTP requests
 import os          # For directory creation
+import io          # For parsing page bytes incrementally
+import asyncio     # For concurrent fetching
+import aiohttp     # Async HTTP client with connection pooling
+from urllib.parse import urlsplit, urljoin  # For grouping URLs by host and following pagination
+from concurrent.futures import ProcessPoolExecutor  # For parsing off the event loop
+import argparse    # For command-line options
+from collections import defaultdict  # For per-host semaphores
+import sqlite3     # For the persistent ASIN index
+import threading   # For sharing the index with executor threads
+import sys         # For the module search path
+import contextlib  # For sessions shared between stages
+import re          # For number parsing
+from enum import Enum  # For product categories
+from dataclasses import dataclass  # For the product record
+from typing import Optional  # For missing numbers
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_cache import ResponseCache, DEFAULT_CACHE_PATH, DEFAULT_TTL  # Shared response cache (repository root)
+from rate_control import RateController, is_throttled  # Adaptive per-host pacing (repository root)
+
+try:
+    from lxml import html as lxml_html, etree as lxml_etree  # Fast HTML parser backend (optional)
+except ImportError:
+    lxml_html = lxml_etree = None
+
+# Amazon serves UTF-8; lxml would otherwise guess Latin-1 for undeclared bytes
+LXML_PARSER = lxml_html.HTMLParser(encoding='utf-8') if lxml_html is not None else None
+# Text nodes of an element, minus the script/style/template text BeautifulSoup's get_text() leaves out
+LXML_TEXT = (lxml_etree.XPath('.//text()[not(ancestor::script or ancestor::style or ancestor::template)]')
+             if lxml_etree is not None else None)
 
 
 # List of Amazon search URLs for different product categories
@@ -31,129 +59,902 @@ HEADERS = {
 }
 
 
+# Async fetch engine settings
+MAX_CONCURRENT_PER_HOST = 4   # Simultaneous requests to one host
+MAX_CONNECTIONS = 32          # Total pooled connections
+REQUEST_TIMEOUT = 15          # Seconds per request
+
+# Markers of Amazon's robot-check page (served with status 200)
+CAPTCHA_MARKERS = (b'/errors/validateCaptcha', b'Type the characters you see in this image')
+
+# Streaming mode settings
+DEFAULT_MAX_PAGES = 20        # Result pages followed per search
+PAGE_QUEUE_SIZE = 16          # Parsed pages buffered ahead of the writer
+PRODUCT_BATCH_SIZE = 1000     # Products per written batch
+
+# Columns of the product file, in order
+PRODUCT_COLUMNS = ['Category', 'Subcategory', 'Product Title', 'Price', 'Rating', 'Reviews', 'Product URL', 'ASIN']
+DETAIL_COLUMNS = ['Brand', 'Seller', 'Availability', '5 Star %', '4 Star %', '3 Star %', '2 Star %', '1 Star %']
+
+# Enrichment stage settings (--enrich)
+DETAIL_WORKERS = 8            # Detail pages fetched and parsed at once
+DETAIL_QUEUE_SIZE = 64        # Products buffered between the search crawl and the detail workers
+
+# Persistent ASIN index shared by runs (--index)
+DEFAULT_INDEX_PATH = 'Task 2/data/asin_index.sqlite'
+
+
+# High-level product categories
+class Category(Enum):
+    ELECTRONICS = 'Electronics'
+    BOOKS = 'Books'
+    ACCESSORIES = 'Accessories'
+    CLOTHING = 'Clothing'
+    GENERAL = 'General'
+
+
+@dataclass
+class Product:
+    """
+    One search result, normalized while it is extracted: price and reviews
+    are ints, rating is a float (None when missing) and category is a
+    Category. detail is filled in by the optional enrichment stage.
+    __slots__ keeps each record small.
+    """
+    __slots__ = ('category', 'subcategory', 'title', 'price', 'rating', 'reviews', 'url', 'asin', 'detail')
+    category: Category
+    subcategory: str
+    title: str
+    price: Optional[int]
+    rating: Optional[float]
+    reviews: Optional[int]
+    url: str
+    asin: str
+    detail: Optional['ProductDetail']
+
+
+@dataclass
+class ProductDetail:
+    """Fields from a product page; histogram holds the 5..1 star percentages."""
+    __slots__ = ('brand', 'seller', 'availability', 'histogram')
+    brand: Optional[str]
+    seller: Optional[str]
+    availability: Optional[str]
+    histogram: Optional[tuple]
+
+
 # Extracts a high-level category from the search query string
 def extract_category_from_query(query):
-    """Extract category name from search query."""
+    """Extract category from search query."""
     category_map = {
-        'laptop': 'Electronics',
-        'mobile': 'Electronics',
-        'headphones': 'Electronics',
-        'keyboard': 'Electronics',
-        'mouse': 'Electronics',
-        'monitor': 'Electronics',
-        'webcam': 'Electronics',
-        'book': 'Books',
-        'watch': 'Accessories',
-        'shoes': 'Clothing',
+        'laptop': Category.ELECTRONICS,
+        'mobile': Category.ELECTRONICS,
+        'headphones': Category.ELECTRONICS,
+        'keyboard': Category.ELECTRONICS,
+        'mouse': Category.ELECTRONICS,
+        'monitor': Category.ELECTRONICS,
+        'webcam': Category.ELECTRONICS,
+        'book': Category.BOOKS,
+        'watch': Category.ACCESSORIES,
+        'shoes': Category.CLOTHING,
     }
     for key, cat in category_map.items():
         if key in query.lower():
             return cat
-    return 'General'
+    return Category.GENERAL
 
 
 # Scrapes product data from a single Amazon search result page
-def scrape_amazon_search(url):
-    """Scrape products from Amazon search results."""
-    products = []
-
+def scrape_amazon_search(url, parser=None, cache=None):
+    """Scrape products from Amazon search results, through cache (a ResponseCache) when given."""
     try:
         print(f"Fetching: {url}")
-        response = requests.get(url, headers=HEADERS, timeout=15)
+        response = (cache or requests).get(url, headers=HEADERS, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
+        return parse_amazon_search(response.content, url, parser)
+
+    except Exception as e:
+        print(f"  ✗ Error: {str(e)[:60]}\n")
+        return []
 
-        soup = BeautifulSoup(response.content, 'html.parser')
 
-        # Find all product containers on the page
-        items = soup.select('div[data-component-type="s-search-result"]')
-        if not items:
-            items = soup.select('div.s-result-item[data-asin]')
+# Result containers and next-page link through BeautifulSoup (reference backend)
+def bs4_search_page(content):
+    soup = BeautifulSoup(content, 'html.parser')
+    items = soup.select('div[data-component-type="s-search-result"]')
+    if not items:
+        items = soup.select('div.s-result-item[data-asin]')
+    next_link = soup.select_one('a.s-pagination-next')
+    return items, next_link.get('href') if next_link else None
+
+
+def bs4_item_fields(item):
+    h2 = item.find('h2')
+    if not h2:
+        h2 = item.find('span', {'class': 'a-size-medium'})
+    fields = {'asin': item.get('data-asin', ''), 'title': h2.get_text(strip=True) if h2 else None}
+    for field, tag, css_class in FIELD_ELEMENTS:
+        element = item.find(tag, {'class': css_class})
+        fields[field] = element.get_text(strip=True) if element else None
+    link = item.find('a', {'class': 'a-link-normal'})
+    fields['href'] = link.get('href') if link else None
+    return fields
+
+
+# Result containers and next-page link through lxml, in one pass over the page.
+# Elements outside the result containers are emptied as soon as they are
+# parsed, so only the containers are kept as trees; fields come from one walk.
+def lxml_search_page(content):
+    items, fallback_items, next_href = [], [], None
+    open_containers = 0  # Containers the parser is currently inside
+    events = lxml_etree.iterparse(io.BytesIO(content), events=('start', 'end'), html=True, encoding='utf-8')
+    for event, element in events:
+        tag = element.tag
+        if tag == 'div':
+            primary = element.get('data-component-type') == 's-search-result'
+            container = primary or (element.get('data-asin') is not None and has_class(element, 's-result-item'))
+        else:
+            container = False
+        if event == 'start':
+            if container:
+                open_containers += 1
+                (items if primary else fallback_items).append(element)  # Document order, as a CSS select
+            elif next_href is None and tag == 'a' and has_class(element, 's-pagination-next'):
+                next_href = element.get('href')
+        elif container:
+            open_containers -= 1
+        elif not open_containers:
+            element.clear()  # Kept containers below it survive as their own trees
+    return items or fallback_items, next_href
+
+
+def has_class(element, css_class):
+    return css_class in element.get('class', '').split()
+
+
+def lxml_item_fields(item):
+    """
+    Walk the container once, keeping the first element that matches each
+    field, i.e. what the BeautifulSoup backend finds with one find() per field.
+    """
+    first = {}
+    for element in item.iter('h2', 'span', 'a'):
+        if element.tag == 'h2':
+            first.setdefault('h2', element)
+            continue
+        for css_class in element.get('class', '').split():
+            key = (element.tag, css_class)
+            if key in LXML_FIELD_KEYS:
+                first.setdefault(key, element)
+
+    def text(element):
+        return ''.join(part.strip() for part in LXML_TEXT(element)) if element is not None else None
+
+    h2 = first.get('h2')
+    if h2 is None:
+        h2 = first.get(('span', 'a-size-medium'))
+    fields = {'asin': item.get('data-asin', ''), 'title': text(h2)}
+    for field, tag, css_class in FIELD_ELEMENTS:
+        fields[field] = text(first.get((tag, css_class)))
+    link = first.get(('a', 'a-link-normal'))
+    fields['href'] = link.get('href') if link is not None else None
+    return fields
+
+
+# Elements read as text: (field, tag, class), first match inside the container
+FIELD_ELEMENTS = [
+    ('price', 'span', 'a-price-whole'),
+    ('rating', 'span', 'a-icon-alt'),
+    ('rating_star', 'span', 'a-icon-star-small'),
+    ('reviews', 'span', 'a-size-base'),
+]
+LXML_FIELD_KEYS = {(tag, css_class) for _, tag, css_class in FIELD_ELEMENTS} | {('span', 'a-size-medium'), ('a', 'a-link-normal')}
+
+# Parser backends: name -> (find result containers and next link, read raw fields of one container)
+PARSER_BACKENDS = {'bs4': (bs4_search_page, bs4_item_fields)}
+if lxml_html is not None:
+    PARSER_BACKENDS['lxml'] = (lxml_search_page, lxml_item_fields)
+DEFAULT_PARSER = 'lxml' if 'lxml' in PARSER_BACKENDS else 'bs4'
+
+
+NUMBER = re.compile(r'\d+\.?\d*')
+INTEGER = re.compile(r'\d+')
 
-        print(f"  Found {len(items)} product containers")
 
-        # Extract query for category/subcategory
-        query = url.split('k=')[-1] if 'k=' in url else 'General'
+# "₹54,990." -> 54990
+def parse_price(text):
+    match = NUMBER.search(text.replace(',', '').replace('₹', ''))
+    return int(float(match.group())) if match else None
+
+
+# "4.1 out of 5 stars" -> 4.1
+def parse_rating(text):
+    match = NUMBER.search(text)
+    return float(match.group()) if match else None
+
+
+# "1,234" -> 1234
+def parse_reviews(text):
+    match = INTEGER.search(text.replace(',', ''))
+    return int(match.group()) if match else None
+
+
+# Turns the raw fields of one container into a Product (None to skip it)
+def build_product(fields, category, subcategory):
+    if not fields['asin']:
+        return None
+
+    # Skip sponsored or missing titles
+    title = fields['title'] if fields['title'] is not None else 'N/A'
+    if not title or 'Sponsored' in title or title == 'N/A':
+        return None
+
+    price = parse_price(fields['price']) if fields['price'] is not None else None
+
+    rating = None
+    if fields['rating'] is not None:
+        if 'stars' in fields['rating']:
+            rating = parse_rating(fields['rating'])  # e.g., "4.1 out of 5 stars"
+    elif fields['rating_star']:
+        rating = parse_rating(fields['rating_star'])
+
+    reviews = parse_reviews(fields['reviews']) if fields['reviews'] else None
+
+    product_url = 'N/A'
+    href = fields['href']
+    if href:
+        if href.startswith('/'):
+            product_url = 'https://www.amazon.in' + href.split('?')[0]
+        else:
+            product_url = href.split('?')[0]
+
+    return Product(category, subcategory, title, price, rating, reviews, product_url, fields['asin'], None)
+
+
+HISTOGRAM_LABEL = re.compile(r'(\d+) percent of reviews have ([1-5]) star')
+HISTOGRAM_ROW = re.compile(r'([1-5]) star\D*?(\d+)\s*%')
+BRAND_BYLINE = re.compile(r'^(?:Visit the (.+?) Store|Brand:\s*(.+))$')
+
+
+# Parses brand, seller, stock and rating histogram out of a product detail page
+def parse_product_detail(content):
+    soup = BeautifulSoup(content, 'lxml' if lxml_html is not None else 'html.parser')
+
+    def text(selector):
+        element = soup.select_one(selector)
+        return ' '.join(element.get_text(' ', strip=True).split()) if element else None
+
+    brand = text('#bylineInfo')
+    if brand:
+        match = BRAND_BYLINE.match(brand)
+        brand = next(group for group in match.groups() if group) if match else brand
+    else:
+        brand = text('tr.po-brand td.a-span9')
+
+    seller = (text('#sellerProfileTriggerId') or text('#merchant-info a')
+              or text('#merchantInfoFeature_feature_div .offer-display-feature-text-message'))
+
+    histogram = {}
+    table = soup.select_one('#histogramTable')
+    if table:
+        for element in table.select('[aria-label]'):
+            match = HISTOGRAM_LABEL.search(element['aria-label'])
+            if match:
+                histogram.setdefault(int(match.group(2)), int(match.group(1)))
+        if not histogram:
+            for row in table.select('tr, li'):
+                match = HISTOGRAM_ROW.search(row.get_text(' ', strip=True))
+                if match:
+                    histogram.setdefault(int(match.group(1)), int(match.group(2)))
+
+    return ProductDetail(brand, seller, text('#availability'),
+                         tuple(histogram.get(stars) for stars in (5, 4, 3, 2, 1)) if histogram else None)
+
+
+# Parses product data out of a downloaded Amazon search result page
+def parse_amazon_search(content, url, parser=None, verbose=True):
+    """
+    Extract products from the HTML of an Amazon search results page with the
+    given parser backend (DEFAULT_PARSER when None). Every backend yields the
+    same records; 'bs4' is the reference, 'lxml' is several times faster.
+    """
+    return parse_search_page(content, url, parser, verbose)[0]
+
+
+# Parses one search page into (products, absolute URL of the next page or None)
+def parse_search_page(content, url, parser=None, verbose=True):
+    products = []
+    search_page, item_fields = PARSER_BACKENDS[parser or DEFAULT_PARSER]
+
+    try:
+        # Find all product containers on the page
+        items, next_href = search_page(content)
+        if verbose:
+            print(f"  Found {len(items)} product containers")
+
+        # Extract query for category/subcategory (later pages carry &page=N&ref=...)
+        query = url.split('k=')[-1].split('&')[0] if 'k=' in url else 'General'
         category = extract_category_from_query(query)
+        subcategory = query.replace('+', ' ').upper()  # One string shared by the page's products
 
         for item in items:
             try:
-                asin = item.get('data-asin', '')
-                if not asin:
-                    continue
+                product = build_product(item_fields(item), category, subcategory)
+                if product:
+                    products.append(product)
+            except Exception as e:
+                # Skip product if any error occurs
+                continue
 
-                # Extract product title
-                h2 = item.find('h2')
-                if not h2:
-                    h2 = item.find('span', {'class': 'a-size-medium'})
-                title = h2.get_text(strip=True) if h2 else 'N/A'
+        if verbose:
+            print(f"  ✓ Extracted {len(products)} products\n")
+        return products, urljoin(url, next_href) if next_href else None
 
-                # Skip sponsored or missing titles
-                if not title or 'Sponsored' in title or title == 'N/A':
-                    continue
+    except Exception as e:
+        if verbose:
+            print(f"  ✗ Error: {str(e)[:60]}\n")
+        return [], None
+
+
+# Times each parser backend on saved pages and checks it against bs4
+def benchmark_parsers(html_files, repeat=5):
+    """
+    Parse every saved search page repeat times with each backend and return
+    {backend: (pages per second, pages whose products differ from bs4)}.
+    """
+    pages = []
+    for path in html_files:
+        with open(path, 'rb') as handle:
+            pages.append(handle.read())
+    url = 'https://www.amazon.in/s?k=benchmark'
+    reference = [parse_amazon_search(page, url, parser='bs4', verbose=False) for page in pages]
 
-                # Extract price
-                price = 'N/A'
-                price_span = item.find('span', {'class': 'a-price-whole'})
-                if price_span:
-                    price = price_span.get_text(strip=True)
-
-                # Extract rating
-                rating = 'N/A'
-                rating_span = item.find('span', {'class': 'a-icon-alt'})
-                if rating_span:
-                    rating_text = rating_span.get_text(strip=True)
-                    if 'stars' in rating_text:
-                        rating = rating_text  # e.g., "4.1 out of 5 stars"
+    results = {}
+    for name in PARSER_BACKENDS:
+        mismatches = sum(parse_amazon_search(page, url, parser=name, verbose=False) != expected
+                         for page, expected in zip(pages, reference))
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for page in pages:
+                parse_amazon_search(page, url, parser=name, verbose=False)
+        results[name] = (repeat * len(pages) / (time.perf_counter() - start), mismatches)
+    return results
+
+
+# Downloads one page through the shared session, returning None on failure
+async def fetch_page(session, host_limits, url, cache=None, rate=None):
+    """
+    Fetch a page, holding the per-host semaphore while the request is open.
+    With rate (a RateController) requests are paced per host, and 429/503
+    answers, captcha pages, server errors and network errors are retried up
+    to rate.max_retries times with exponential backoff.
+    """
+    host = urlsplit(url).netloc
+    async with host_limits[host]:
+        print(f"Fetching: {url}")
+        if cache is not None and cache.fresh('GET', url):
+            try:
+                return await cache.fetch_async(session, url)  # No network, so no pacing
+            except Exception as e:
+                print(f"  ✗ Error fetching {url}: {str(e)[:60]}\n")
+                return None
+
+        attempts = rate.max_retries + 1 if rate is not None else 1
+        error = None
+        for attempt in range(attempts):
+            if attempt:
+                rate.retried(host)
+                await asyncio.sleep(rate.backoff(attempt - 1))
+            if rate is not None:
+                await rate.wait_async(host)
+            try:
+                if cache is not None:
+                    status, content = 200, await cache.fetch_async(session, url)
                 else:
-                    rating_span = item.find('span', {'class': 'a-icon-star-small'})
-                    if rating_span:
-                        rating_text = rating_span.get_text(strip=True)
-                        if rating_text:
-                            rating = rating_text
-
-                # Extract number of reviews
-                reviews = 'N/A'
-                reviews_span = item.find('span', {'class': 'a-size-base'})
-                if reviews_span:
-                    reviews_text = reviews_span.get_text(strip=True)
-                    if reviews_text and any(char.isdigit() for char in reviews_text):
-                        reviews = reviews_text
-
-                # Extract product URL
-                link = item.find('a', {'class': 'a-link-normal'})
-                product_url = 'N/A'
-                if link and link.get('href'):
-                    href = link['href']
-                    if href.startswith('/'):
-                        product_url = 'https://www.amazon.in' + href.split('?')[0]
-                    else:
-                        product_url = href.split('?')[0]
-
-                # Add product to list
-                if title and title != 'N/A':
-                    products.append({
-                        'Category': category,
-                        'Subcategory': query.replace('+', ' ').upper(),
-                        'Product Title': title,
-                        'Price': price,
-                        'Rating': rating,
-                        'Reviews': reviews,
-                        'Product URL': product_url
-                    })
+                    async with session.get(url) as response:
+                        status, content = response.status, await response.read()
+            except aiohttp.ClientResponseError as e:
+                status, content = e.status, b''
+            except Exception as e:
+                error = str(e)[:60]
+                continue
+
+            if is_throttled(status, content, CAPTCHA_MARKERS):
+                if rate is not None:
+                    rate.throttled(host)
+                if cache is not None:
+                    cache.forget('GET', url)  # Never replay a captcha page
+                error = f"throttled (HTTP {status})"
+                continue
+            if status >= 500:
+                error = f"HTTP {status}"
+                continue
+            if status >= 400:
+                print(f"  ✗ Error fetching {url}: HTTP {status}\n")
+                return None
+            if rate is not None:
+                rate.success(host)
+            return content
+
+        if rate is not None:
+            rate.failed(host)
+        print(f"  ✗ Error fetching {url}: {error} after {attempts} attempt(s)\n")
+        return None
+
+
+# Opens the pooled keep-alive session shared by every request of a crawl
+def open_session(max_per_host):
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, limit_per_host=max_per_host, keepalive_timeout=30)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    return aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=timeout)
+
+
+# The session a stage was given, or a new one it owns (closed on exit)
+def stage_session(session, max_per_host):
+    return open_session(max_per_host) if session is None else contextlib.nullcontext(session)
+
+
+# Scrapes many Amazon search pages concurrently
+async def scrape_amazon_searches(urls, max_per_host=MAX_CONCURRENT_PER_HOST, parse_executor=None, parser=None,
+                                 cache=None, rate=None):
+    """
+    Fetch all search URLs over one pooled keep-alive session, with at most
+    max_per_host requests open per host, and parse each page with the given
+    parser backend in parse_executor (a process pool by default) so parsing
+    never blocks the event loop. Pages go through cache (a ResponseCache)
+    when given and are paced by rate (a new RateController when None).
+    Returns one product list per URL, in the order of urls.
+    """
+    if rate is None:
+        rate = RateController()
+    loop = asyncio.get_running_loop()
+    host_limits = defaultdict(lambda: asyncio.Semaphore(max_per_host))
+    own_executor = parse_executor is None
+    if own_executor:
+        parse_executor = ProcessPoolExecutor()
+
+    async def scrape(session, url):
+        content = await fetch_page(session, host_limits, url, cache, rate)
+        if content is None:
+            return []
+        return await loop.run_in_executor(parse_executor, parse_amazon_search, content, url, parser)
 
+    try:
+        async with open_session(max_per_host) as session:
+            return await asyncio.gather(*(scrape(session, url) for url in urls))
+    finally:
+        if own_executor:
+            parse_executor.shutdown()
+
+
+# Follows the result pages of one search, yielding the products of each page
+async def crawl_search_pages(session, host_limits, url, parse_executor, parser=None,
+                             max_pages=DEFAULT_MAX_PAGES, max_products=None, cache=None, rate=None):
+    loop = asyncio.get_running_loop()
+    page_url, pages, count = url, 0, 0
+    while page_url and pages < max_pages and (max_products is None or count < max_products):
+        content = await fetch_page(session, host_limits, page_url, cache, rate)
+        if content is None:
+            return
+        products, page_url = await loop.run_in_executor(parse_executor, parse_search_page, content, page_url, parser)
+        pages += 1
+        if max_products is not None:
+            products = products[:max_products - count]
+        count += len(products)
+        yield products
+
+
+# Streams products from many paginated searches as they are parsed
+async def stream_amazon_products(urls, max_pages=DEFAULT_MAX_PAGES, max_products=None,
+                                 max_per_host=MAX_CONCURRENT_PER_HOST, parse_executor=None, parser=None,
+                                 max_queued_pages=PAGE_QUEUE_SIZE, cache=None, rate=None, session=None,
+                                 host_limits=None):
+    """
+    Async generator of product records. Every search in urls is crawled
+    concurrently, following its next-page links for up to max_pages pages or
+    max_products products. Parsed pages wait in a queue of max_queued_pages;
+    when the consumer falls behind, the crawlers pause, so memory stays
+    bounded however many products are scraped. Products are yielded in
+    arrival order, not URL order. Pass session and host_limits to share the
+    connection pool and per-host limits with another stage.
+    """
+    if host_limits is None:
+        host_limits = defaultdict(lambda: asyncio.Semaphore(max_per_host))
+    own_executor = parse_executor is None
+    if own_executor:
+        parse_executor = ProcessPoolExecutor()
+    queue = asyncio.Queue(maxsize=max_queued_pages)
+    done = object()  # Put once by each crawler when its search is finished
+
+    async def crawl(session, url):
+        try:
+            async for products in crawl_search_pages(session, host_limits, url, parse_executor, parser,
+                                                     max_pages, max_products, cache, rate):
+                await queue.put(products)
+        except Exception as e:
+            print(f"  ✗ Error crawling {url}: {str(e)[:60]}\n")
+        await queue.put(done)  # Skipped on cancellation, where it could block on a full queue
+
+    try:
+        async with stage_session(session, max_per_host) as session:
+            crawlers = [asyncio.create_task(crawl(session, url)) for url in urls]
+            try:
+                remaining = len(crawlers)
+                while remaining:
+                    products = await queue.get()
+                    if products is done:
+                        remaining -= 1
+                        continue
+                    for product in products:
+                        yield product
+            finally:
+                for crawler in crawlers:
+                    crawler.cancel()
+                await asyncio.gather(*crawlers, return_exceptions=True)
+    finally:
+        if own_executor:
+            parse_executor.shutdown()
+
+
+# Attaches product-page details to a product stream while the search crawl runs
+async def enrich_products(products, workers=DETAIL_WORKERS, max_per_host=MAX_CONCURRENT_PER_HOST,
+                          parse_executor=None, cache=None, rate=None, index=None, max_queued=DETAIL_QUEUE_SIZE,
+                          session=None, host_limits=None):
+    """
+    Async generator over the async products stream that sets product.detail.
+    A feeder moves products into a queue of max_queued, and `workers` tasks
+    fetch and parse detail pages from it. When the workers fall behind, the
+    feeder blocks, and so does the search crawl behind it, so both stages
+    overlap without unbounded buffering. Repeated ASINs are dropped by the
+    feeder, so each product page is fetched once (save_product_stream
+    would drop the repeats anyway), and products already in index are
+    passed through without a fetch; that check runs in the default
+    executor, off the event loop. Products come out in completion order;
+    detail stays None when the page could not be fetched. Pass the search
+    stage's session and host_limits so both stages share one connection
+    pool and max_per_host requests per host.
+    """
+    loop = asyncio.get_running_loop()
+    if host_limits is None:
+        host_limits = defaultdict(lambda: asyncio.Semaphore(max_per_host))
+    own_executor = parse_executor is None
+    if own_executor:
+        parse_executor = ProcessPoolExecutor()
+    todo = asyncio.Queue(maxsize=max_queued)
+    enriched = asyncio.Queue(maxsize=max_queued)
+    finished = object()  # One per worker once the stream is exhausted
+
+    async def feed():
+        seen_asins = set()
+        try:
+            async for product in products:
+                if product.asin in seen_asins:
+                    continue
+                seen_asins.add(product.asin)
+                await todo.put(product)
+        except Exception as e:
+            print(f"  ✗ Error in product stream: {str(e)[:60]}\n")
+        for _ in range(workers):
+            await todo.put(finished)
+
+    async def work(session):
+        while True:
+            product = await todo.get()
+            if product is finished:
+                await enriched.put(finished)
+                return
+            try:
+                known_product = (index is not None
+                                 and await loop.run_in_executor(None, index.contains, product.asin))
+                if product.url != 'N/A' and not known_product:
+                    content = await fetch_page(session, host_limits, product.url, cache, rate)
+                    if content is not None:
+                        product.detail = await loop.run_in_executor(parse_executor, parse_product_detail, content)
             except Exception as e:
-                # Skip product if any error occurs
+                print(f"  ✗ Error enriching {product.asin}: {str(e)[:60]}\n")
+            await enriched.put(product)
+
+    try:
+        async with stage_session(session, max_per_host) as session:
+            tasks = [asyncio.create_task(feed())] + [asyncio.create_task(work(session)) for _ in range(workers)]
+            try:
+                remaining = workers
+                while remaining:
+                    product = await enriched.get()
+                    if product is finished:
+                        remaining -= 1
+                        continue
+                    yield product
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        if own_executor:
+            parse_executor.shutdown()
+
+
+# Builds a typed DataFrame (PRODUCT_COLUMNS, plus DETAIL_COLUMNS with details=True) from Product records
+def products_frame(products, details=False):
+    frame = pd.DataFrame({
+        'Category': pd.Categorical([product.category.value for product in products],
+                                   categories=[category.value for category in Category]),
+        'Subcategory': [product.subcategory for product in products],
+        'Product Title': [product.title for product in products],
+        'Price': pd.array([product.price for product in products], dtype='Int64'),
+        'Rating': pd.array([product.rating for product in products], dtype='Float64'),
+        'Reviews': pd.array([product.reviews for product in products], dtype='Int64'),
+        'Product URL': [product.url for product in products],
+        'ASIN': [product.asin for product in products],
+    }, columns=PRODUCT_COLUMNS)
+    if details:
+        empty = ProductDetail(None, None, None, None)
+        product_details = [product.detail or empty for product in products]
+        frame['Brand'] = [detail.brand for detail in product_details]
+        frame['Seller'] = [detail.seller for detail in product_details]
+        frame['Availability'] = [detail.availability for detail in product_details]
+        for position, column in enumerate(DETAIL_COLUMNS[3:]):
+            frame[column] = pd.array([detail.histogram[position] if detail.histogram else None
+                                      for detail in product_details], dtype='Int64')
+    return frame
+
+
+class CsvSink:
+    """
+    Appends batches to a UTF-8 CSV file. The header (columns, in order) is
+    written on open, so a run that writes no rows still leaves a readable file.
+    """
+
+    def __init__(self, output_path, columns=PRODUCT_COLUMNS):
+        self.output_path = output_path
+        self.columns = columns
+        self.handle = open(output_path, 'w', newline='', encoding='utf-8')
+        pd.DataFrame(columns=columns).to_csv(self.handle, index=False)
+
+    def write(self, batch):
+        batch.to_csv(self.handle, columns=self.columns, index=False, header=False)
+
+    def close(self):
+        self.handle.close()
+
+
+class ParquetSink:
+    """
+    Writes each batch as a Parquet row group with pyarrow, typed like
+    products_frame: Price/Reviews and star percentages int64, Rating double,
+    Category and Subcategory dictionary-encoded, the rest strings.
+    """
+
+    DICTIONARY_COLUMNS = ('Category', 'Subcategory')
+    TYPES = {'Price': 'int64', 'Rating': 'float64', 'Reviews': 'int64',
+             '5 Star %': 'int64', '4 Star %': 'int64', '3 Star %': 'int64', '2 Star %': 'int64', '1 Star %': 'int64'}
+
+    def __init__(self, output_path, columns=PRODUCT_COLUMNS):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.pa = pa
+        self.output_path = output_path
+        self.columns = columns
+        self.schema = pa.schema([
+            (name, pa.dictionary(pa.int32(), pa.string()) if name in self.DICTIONARY_COLUMNS
+             else pa.type_for_alias(self.TYPES.get(name, 'string')))
+            for name in columns
+        ])
+        self.writer = pq.ParquetWriter(output_path, self.schema)
+
+    def write(self, batch):
+        table = self.pa.Table.from_pandas(batch[self.columns], preserve_index=False)
+        self.writer.write_table(table.cast(self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+# Available output formats for the product file
+SINKS = {
+    'csv': CsvSink,
+    'parquet': ParquetSink,
+}
+
+
+class ProductIndex:
+    """
+    Persistent SQLite index of every ASIN seen by earlier runs, with the
+    price, rating and reviews it was last saved with. Lookups are batched and
+    hit the ASIN primary key, so they stay fast with millions of products.
+    The connection is guarded by a lock, so the event loop can call it
+    through run_in_executor.
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS products ('
+            ' asin TEXT PRIMARY KEY, price INTEGER, rating REAL, reviews INTEGER,'
+            ' first_seen REAL, last_seen REAL) WITHOUT ROWID'
+        )
+        self.connection.commit()
+
+    # Return {asin: last saved price} for the ASINs already in the index
+    def lookup(self, asins):
+        connection = self.connection
+        with self.lock:
+            connection.execute('CREATE TEMP TABLE IF NOT EXISTS lookup_asins (asin TEXT PRIMARY KEY)')
+            connection.execute('DELETE FROM lookup_asins')
+            connection.executemany('INSERT OR IGNORE INTO lookup_asins VALUES (?)', ((asin,) for asin in asins))
+            rows = connection.execute(
+                'SELECT products.asin, products.price FROM lookup_asins JOIN products ON products.asin = lookup_asins.asin'
+            )
+            return dict(rows.fetchall())
+
+    # Whether one ASIN is already in the index (a single primary-key SELECT)
+    def contains(self, asin):
+        with self.lock:
+            row = self.connection.execute('SELECT 1 FROM products WHERE asin = ?', (asin,)).fetchone()
+        return row is not None
+
+    # Insert new products and update known ones in place (first_seen is kept)
+    def store(self, products):
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                'INSERT INTO products VALUES (?, ?, ?, ?, ?, ?)'
+                ' ON CONFLICT (asin) DO UPDATE SET price = excluded.price, rating = excluded.rating,'
+                ' reviews = excluded.reviews, last_seen = excluded.last_seen',
+                ((product.asin, product.price, product.rating, product.reviews, now, now)
+                 for product in products),
+            )
+            self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+# Picks the products of one batch ({asin: product}) to write against a ProductIndex
+def select_unseen(batch, index, known, counts):
+    """
+    Products from earlier runs are dropped when known='skip'; with
+    known='update' they are refreshed in the index and kept only if their
+    price changed. New products are added to the index. Updates the new,
+    changed and skipped counts and returns the products to write.
+    """
+    previous_prices = index.lookup(batch)
+    rows = []
+    for asin, product in batch.items():
+        if asin not in previous_prices:
+            counts['new'] += 1
+            rows.append(product)
+        elif known == 'update' and previous_prices[asin] != product.price:
+            counts['changed'] += 1
+            rows.append(product)
+        else:
+            counts['skipped'] += 1
+    index.store(batch.values() if known == 'update'
+                else [product for product in batch.values() if product.asin not in previous_prices])
+    return rows
+
+
+# Writes a product stream to disk in batches
+async def save_product_stream(products, output_path, output_format='csv', batch_size=PRODUCT_BATCH_SIZE,
+                              index=None, known='skip', details=False):
+    """
+    Consume the async product stream and write typed batches to
+    output_path, keeping the first product seen for each ASIN. With a
+    ProductIndex, each batch is filtered by select_unseen (known='skip' or
+    'update'). details=True adds DETAIL_COLUMNS from the
+    enrichment stage. Returns counts of new, changed and skipped products.
+    """
+    sink = SINKS[output_format](output_path, PRODUCT_COLUMNS + DETAIL_COLUMNS if details else PRODUCT_COLUMNS)
+    seen_asins = set()  # Only needed without an index, which already remembers this run
+    pending = {}
+    counts = {'new': 0, 'changed': 0, 'skipped': 0}
+
+    def flush():
+        if index is None:
+            rows = list(pending.values())
+            counts['new'] += len(rows)
+        else:
+            rows = select_unseen(pending, index, known, counts)
+        if rows:
+            sink.write(products_frame(rows, details))
+        pending.clear()
+
+    try:
+        async for product in products:
+            asin = product.asin
+            if asin in pending or asin in seen_asins:
+                counts['skipped'] += 1
                 continue
+            if index is None:
+                seen_asins.add(asin)
+            pending[asin] = product
+            if len(pending) >= batch_size:
+                flush()
+        if pending:
+            flush()
+    finally:
+        sink.close()
+    return counts
 
-        print(f"  ✓ Extracted {len(products)} products\n")
-        return products
 
-    except Exception as e:
-        print(f"  ✗ Error: {str(e)[:60]}\n")
-        return []
+# Crawls searches (and product pages with enrich=True) into a product file
+async def stream_to_file(urls, output_path, output_format='csv', batch_size=PRODUCT_BATCH_SIZE,
+                         max_pages=DEFAULT_MAX_PAGES, max_products=None, max_per_host=MAX_CONCURRENT_PER_HOST,
+                         parse_executor=None, parser=None, cache=None, rate=None, index=None, known='skip',
+                         enrich=False, detail_workers=DETAIL_WORKERS):
+    """
+    stream_amazon_products, optionally enrich_products, into
+    save_product_stream. The stages share one session and one set of
+    per-host semaphores, so at most max_per_host requests are open per host
+    in total. Returns the counts from save_product_stream.
+    """
+    host_limits = defaultdict(lambda: asyncio.Semaphore(max_per_host))
+    async with open_session(max_per_host) as session:
+        products = stream_amazon_products(urls, max_pages=max_pages, max_products=max_products,
+                                          max_per_host=max_per_host, parse_executor=parse_executor, parser=parser,
+                                          cache=cache, rate=rate, session=session, host_limits=host_limits)
+        if enrich:
+            products = enrich_products(products, workers=detail_workers, max_per_host=max_per_host,
+                                       parse_executor=parse_executor, cache=cache, rate=rate,
+                                       index=index if known == 'skip' else None, session=session,
+                                       host_limits=host_limits)
+        return await save_product_stream(products, output_path, output_format, batch_size, index, known,
+                                         details=enrich)
 
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Scrape Amazon search results")
+    arg_parser.add_argument('--parser', choices=sorted(PARSER_BACKENDS), default=DEFAULT_PARSER,
+                            help=f"HTML parser backend (default: {DEFAULT_PARSER})")
+    arg_parser.add_argument('--benchmark-parsers', nargs='+', metavar='HTML_FILE',
+                            help="time every parser backend on saved search pages and check parity with bs4")
+    arg_parser.add_argument('--stream', action='store_true',
+                            help="follow result pagination and write products in batches as they arrive")
+    arg_parser.add_argument('--max-pages', type=int, default=DEFAULT_MAX_PAGES,
+                            help=f"result pages per search in --stream mode (default: {DEFAULT_MAX_PAGES})")
+    arg_parser.add_argument('--max-products', type=int, help="products per search in --stream mode (default: no limit)")
+    arg_parser.add_argument('--batch-size', type=int, default=PRODUCT_BATCH_SIZE,
+                            help=f"products per written batch in --stream mode (default: {PRODUCT_BATCH_SIZE})")
+    arg_parser.add_argument('--format', dest='output_format', choices=sorted(SINKS), default='csv',
+                            help="output format in --stream mode (default: csv)")
+    arg_parser.add_argument('--index', nargs='?', const=DEFAULT_INDEX_PATH,
+                            help=f"persistent ASIN index shared by runs (default path: {DEFAULT_INDEX_PATH})")
+    arg_parser.add_argument('--known', choices=['skip', 'update'], default='skip',
+                            help="with --index: drop products seen in earlier runs, or update them and "
+                                 "write them again when their price changed (default: skip)")
+    arg_parser.add_argument('--enrich', action='store_true',
+                            help="with --stream: fetch each product page for brand, seller, stock and rating "
+                                 "histogram while the search crawl runs")
+    arg_parser.add_argument('--detail-workers', type=int, default=DETAIL_WORKERS,
+                            help=f"detail pages fetched at once with --enrich (default: {DETAIL_WORKERS})")
+    arg_parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_PATH,
+                            help=f"cache responses on disk (default path: {DEFAULT_CACHE_PATH})")
+    arg_parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL,
+                            help=f"seconds a cached page is used before revalidation (default: {DEFAULT_TTL})")
+    arg_parser.add_argument('--offline', action='store_true',
+                            help="serve every page from the response cache and never touch the network")
+    arg_parser.add_argument('--initial-rate', type=float, default=1.0,
+                            help="starting requests/second per host; raised while responses are healthy (default: 1)")
+    arg_parser.add_argument('--max-rate', type=float, default=10.0,
+                            help="ceiling for the adaptive per-host request rate (default: 10)")
+    arg_parser.add_argument('urls', nargs='*', default=AMAZON_SEARCH_URLS,
+                            help="search URLs to scrape (default: AMAZON_SEARCH_URLS)")
+    args = arg_parser.parse_args()
+    if args.enrich and not args.stream:
+        arg_parser.error("--enrich requires --stream")
+
+    if args.benchmark_parsers:
+        results = benchmark_parsers(args.benchmark_parsers)
+        for name, (pages_per_second, mismatches) in results.items():
+            parity = "matches bs4" if not mismatches else f"✗ {mismatches} page(s) differ from bs4"
+            print(f"{name:5}: {pages_per_second:8.1f} pages/s  ({parity})")
+        raise SystemExit(1 if any(mismatches for _, mismatches in results.values()) else 0)
+
     # Create output directory if it doesn't exist
     os.makedirs('Task 2/data', exist_ok=True)
 
@@ -161,32 +962,80 @@ if __name__ == "__main__":
     print("AMAZON PRODUCT SCRAPER - REQUESTS METHOD")
     print("="*70 + "\n")
 
+    cache = None
+    if args.cache or args.offline:
+        cache = ResponseCache(args.cache or DEFAULT_CACHE_PATH, ttl=args.cache_ttl, offline=args.offline)
+    rate = RateController(initial_rate=args.initial_rate, max_rate=args.max_rate)
+
+    if args.stream:
+        output_path = f'Task 2/data/amazon_products.{args.output_format}'
+        start = time.time()
+        index = ProductIndex(args.index) if args.index else None
+        parse_executor = ProcessPoolExecutor()  # Shared by the search and detail stages
+        try:
+            counts = asyncio.run(stream_to_file(args.urls, output_path, args.output_format, args.batch_size,
+                                                max_pages=args.max_pages, max_products=args.max_products,
+                                                parse_executor=parse_executor, parser=args.parser, cache=cache,
+                                                rate=rate, index=index, known=args.known, enrich=args.enrich,
+                                                detail_workers=args.detail_workers))
+        finally:
+            parse_executor.shutdown()
+            if index is not None:
+                index.close()
+        saved = counts['new'] + counts['changed']
+        if saved:
+            print("="*70)
+            print(f"✓ SAVED: {saved} products to {output_path} in {time.time() - start:.1f}s")
+            print(f"✓ New: {counts['new']}, price changed: {counts['changed']}, skipped: {counts['skipped']}")
+            print("="*70 + "\n")
+        else:
+            print(f"✗ No new products ({counts['skipped']} skipped)")
+        if cache is not None:
+            print(f"Response cache: {cache.stats}")
+        print(f"Rate control: {rate.stats()}")
+        raise SystemExit(0)
+
     all_products = []
 
-    # Scrape each Amazon search URL
-    for url in AMAZON_SEARCH_URLS:
-        products = scrape_amazon_search(url)
+    # Scrape all Amazon search URLs concurrently (politeness comes from the per-host limit)
+    start = time.time()
+    for products in asyncio.run(scrape_amazon_searches(args.urls, parser=args.parser, cache=cache, rate=rate)):
         all_products.extend(products)
-        time.sleep(random.uniform(1, 2))  # Polite delay between requests
+    print(f"Fetched {len(args.urls)} search pages in {time.time() - start:.1f}s\n")
+    if cache is not None:
+        print(f"Response cache: {cache.stats}\n")
+    print(f"Rate control: {rate.stats()}\n")
 
     # Save results to CSV if any products were scraped
     if all_products:
-        df = pd.DataFrame(all_products)
-        df.drop_duplicates(subset=['Product URL'], inplace=True)
-
-        # Clean and normalize data columns
-        df['Price'] = df['Price'].str.replace(',', '').str.replace('₹', '').str.extract(r'(\d+\.?\d*)')[0]
-        df['Rating'] = df['Rating'].str.extract(r'(\d+\.?\d*)')[0]
-        df['Reviews'] = df['Reviews'].str.replace(',', '').str.extract(r'(\d+)')[0]
+        # Keep the first product per ASIN, then drop those known from earlier runs
+        unique_products = {}
+        for product in all_products:
+            unique_products.setdefault(product.asin, product)
+        counts = {'new': 0, 'changed': 0, 'skipped': len(all_products) - len(unique_products)}
+        if args.index:
+            index = ProductIndex(args.index)
+            try:
+                rows = select_unseen(unique_products, index, args.known, counts)
+            finally:
+                index.close()
+        else:
+            rows = list(unique_products.values())
+        df = products_frame(rows)
 
         df.to_csv('Task 2/data/amazon_products.csv', index=False)
 
-        print("="*70)
-        print(f"✓ SAVED: {len(df)} unique products to Task 2/data/amazon_products.csv")
-        print(f"✓ Categories: {df['Category'].nunique()}")
-        print(f"✓ Subcategories: {df['Subcategory'].nunique()}")
-        print("="*70 + "\n")
+        if rows:
+            print("="*70)
+            print(f"✓ SAVED: {len(df)} unique products to Task 2/data/amazon_products.csv")
+            if args.index:
+                print(f"✓ New: {counts['new']}, price changed: {counts['changed']}, skipped: {counts['skipped']}")
+            print(f"✓ Categories: {df['Category'].nunique()}")
+            print(f"✓ Subcategories: {df['Subcategory'].nunique()}")
+            print("="*70 + "\n")
 
-        print(df.head(20).to_string(index=False))
+            print(df.head(20).to_string(index=False))
+        else:
+            print(f"✗ No new products ({counts['skipped']} skipped)")
     else:
         print("✗ No products scraped!")
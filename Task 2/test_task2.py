@@ -0,0 +1,730 @@
+# Tests for the Task 2 scraper (run with: python -m pytest "Task 2")
+import os            # For fixture paths
+import sys           # For running the script
+import subprocess    # For running the script
+import glob          # For the saved search pages
+import time          # For the throttling window
+import socket        # For the local stand-in server
+import asyncio       # For the async fetch engine
+import threading     # For the response cache test server
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler  # Synchronous stand-in for the cache tests
+from concurrent.futures import ThreadPoolExecutor  # For parsing without a process pool
+import pandas as pd  # For reading written files back
+import pytest
+import aiohttp       # For the async cache path
+from aiohttp import web  # Local HTTP stand-in for amazon.in
+
+import Task2
+from rate_control import RateController
+from http_cache import ResponseCache, CachedResponse, OfflineCacheMiss
+
+
+FIXTURE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+SEARCH_PAGES = sorted(glob.glob(os.path.join(FIXTURE_FOLDER, 'search_*.html')))
+SEARCH_URL = 'https://www.amazon.in/s?k=laptop'
+
+requires_lxml = pytest.mark.skipif('lxml' not in Task2.PARSER_BACKENDS, reason="lxml is not installed")
+
+
+def read_page(path):
+    with open(path, 'rb') as handle:
+        return handle.read()
+
+
+@requires_lxml
+@pytest.mark.parametrize('path', SEARCH_PAGES, ids=os.path.basename)
+def test_lxml_backend_matches_bs4(path):
+    content = read_page(path)
+    expected = Task2.parse_search_page(content, SEARCH_URL, parser='bs4', verbose=False)
+    actual = Task2.parse_search_page(content, SEARCH_URL, parser='lxml', verbose=False)
+    assert expected[0], "fixture yields no products"
+    assert actual == expected
+
+
+@pytest.mark.parametrize('parser', sorted(Task2.PARSER_BACKENDS))
+def test_script_and_style_text_is_ignored(parser):
+    content = read_page(os.path.join(FIXTURE_FOLDER, 'search_edge.html'))
+    products = {product.asin: product for product in Task2.parse_amazon_search(content, SEARCH_URL, parser, False)}
+    assert products['B8'].title == 'FooBarLaptop'
+    assert products['B8'].price == 1299
+    assert products['B8'].rating == 4.1
+    assert products['B8'].reviews == 2345
+    assert products['B9'].title == 'StyledMouse'
+
+
+@requires_lxml
+def test_lxml_backend_keeps_only_result_containers():
+    content = (b'<html><head><script>var big = "HEADER";</script></head><body><div id="nav">NAVIGATION</div>'
+               b'<div class="s-main-slot"><div data-component-type="s-search-result" data-asin="B1"><h2>One</h2></div>'
+               b'<div class="filler">FILLER</div>'
+               b'<div data-component-type="s-search-result" data-asin="B2"><h2>Two</h2></div></div>'
+               b'<a class="s-pagination-item s-pagination-next" href="/s?k=x&amp;page=2">Next</a></body></html>')
+    items, next_href = Task2.lxml_search_page(content)
+    assert [item.get('data-asin') for item in items] == ['B1', 'B2']
+    assert [''.join(item.itertext()) for item in items] == ['One', 'Two']
+    assert next_href == '/s?k=x&page=2'
+    # Everything outside the containers was emptied while parsing
+    document = ''.join(items[0].getroottree().getroot().itertext())
+    assert not any(text in document for text in ('HEADER', 'NAVIGATION', 'FILLER'))
+
+
+def test_benchmark_reports_no_mismatches():
+    results = Task2.benchmark_parsers(SEARCH_PAGES, repeat=1)
+    assert all(mismatches == 0 for _, mismatches in results.values())
+
+
+@pytest.mark.parametrize('output_format', sorted(Task2.SINKS))
+def test_sinks_write_the_given_columns_in_order(tmp_path, output_format):
+    if output_format == 'parquet':
+        pytest.importorskip('pyarrow')
+    products = Task2.parse_amazon_search(read_page(os.path.join(FIXTURE_FOLDER, 'search_laptop.html')), SEARCH_URL,
+                                         verbose=False)
+    frame = Task2.products_frame(products, details=True)
+    columns = ['ASIN', 'Product Title', 'Price']
+    path = str(tmp_path / f'products.{output_format}')
+    sink = Task2.SINKS[output_format](path, columns)
+    sink.write(frame.iloc[:10])
+    sink.write(frame.iloc[10:])
+    sink.close()
+
+    written = pd.read_csv(path) if output_format == 'csv' else pd.read_parquet(path)
+    assert list(written.columns) == columns
+    assert written['ASIN'].tolist() == frame['ASIN'].tolist()
+
+
+# Serve an aiohttp app on a free local port; returns (runner, base URL)
+async def start_server(handler):
+    async def handle(request):
+        return await handler(request)
+
+    app = web.Application()
+    app.router.add_get('/{path:.*}', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    await web.SockSite(runner, sock).start()
+    return runner, f'http://127.0.0.1:{sock.getsockname()[1]}'
+
+
+class SearchStandIn:
+    """
+    Serves fixtures/search_laptop.html for every search after a short delay
+    and 404 for k=missing, tracking how many requests are open at once.
+    """
+
+    def __init__(self, delay=0.05):
+        self.page = read_page(os.path.join(FIXTURE_FOLDER, 'search_laptop.html'))
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+
+    async def __call__(self, request):
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if request.query.get('k') == 'missing':
+                raise web.HTTPNotFound()
+            return web.Response(body=self.page, content_type='text/html')
+        finally:
+            self.in_flight -= 1
+
+
+def test_scrape_amazon_searches_limits_hosts_and_keeps_url_order():
+    stand_in = SearchStandIn()
+    queries = ['book', 'watch', 'missing', 'laptop', 'shoes', 'mouse', 'keyboard', 'monitor']
+
+    async def run():
+        runner, base = await start_server(stand_in)
+        try:
+            with ThreadPoolExecutor(2) as parse_executor:
+                # Pace well above the stand-in's speed so only the host limit caps concurrency
+                rate = RateController(initial_rate=1000, max_rate=1000)
+                return await Task2.scrape_amazon_searches([f'{base}/s?k={query}' for query in queries], max_per_host=2,
+                                                          parse_executor=parse_executor, rate=rate)
+        finally:
+            await runner.cleanup()
+
+    results = asyncio.run(run())
+    assert stand_in.max_in_flight == 2
+    assert stand_in.requests == len(queries)
+    assert len(results) == len(queries)
+    for query, products in zip(queries, results):
+        if query == 'missing':
+            assert products == []
+        else:
+            assert len(products) == 60
+            assert {product.subcategory for product in products} == {query.upper()}
+
+
+def test_scrape_amazon_searches_paces_with_a_new_controller_by_default(monkeypatch):
+    controllers = []
+
+    class RecordingController(RateController):
+        def __init__(self):
+            super().__init__(initial_rate=1000, max_rate=1000)
+            controllers.append(self)
+
+    monkeypatch.setattr(Task2, 'RateController', RecordingController)
+    stand_in = SearchStandIn(delay=0)
+
+    async def run():
+        runner, base = await start_server(stand_in)
+        try:
+            with ThreadPoolExecutor(2) as parse_executor:
+                return base, await Task2.scrape_amazon_searches([f'{base}/s?k=laptop', f'{base}/s?k=book'],
+                                                                parse_executor=parse_executor)
+        finally:
+            await runner.cleanup()
+
+    base, results = asyncio.run(run())
+    assert [len(products) for products in results] == [60, 60]
+    assert len(controllers) == 1
+    assert controllers[0].stats()[base.split('//')[1]]['requests'] == 2
+
+
+class ThrottlingStandIn(SearchStandIn):
+    """
+    Like SearchStandIn, but above max_rate requests in the last second it
+    answers 429, 503 or a robot-check page in turn.
+    """
+
+    CAPTCHA_PAGE = b'<html><form action="/errors/validateCaptcha">Type the characters you see in this image</form></html>'
+
+    def __init__(self, max_rate):
+        super().__init__(delay=0)
+        self.max_rate = max_rate
+        self.times = []
+        self.throttled = 0
+
+    async def __call__(self, request):
+        now = time.monotonic()
+        self.times = [seen for seen in self.times if now - seen < 1.0] + [now]
+        if len(self.times) <= self.max_rate:
+            return await super().__call__(request)
+        self.throttled += 1
+        kind = self.throttled % 3
+        if kind == 1:
+            return web.Response(status=429, text='Too Many Requests')
+        if kind == 2:
+            return web.Response(status=503, text='Service Unavailable')
+        return web.Response(body=self.CAPTCHA_PAGE, content_type='text/html')
+
+
+def test_rate_controller_recovers_from_a_throttling_server():
+    stand_in = ThrottlingStandIn(max_rate=5)
+    queries = ['laptop', 'book', 'watch', 'shoes', 'mouse', 'keyboard', 'monitor', 'webcam', 'headphones', 'laptop+bag']
+    rate = RateController(initial_rate=20, min_rate=2, max_rate=20, max_retries=8, backoff_base=0.1, backoff_max=1.0)
+
+    async def run():
+        runner, base = await start_server(stand_in)
+        try:
+            with ThreadPoolExecutor(2) as parse_executor:
+                urls = [f'{base}/s?k={query}' for query in queries]
+                return base, await Task2.scrape_amazon_searches(urls, parse_executor=parse_executor, rate=rate)
+        finally:
+            await runner.cleanup()
+
+    base, results = asyncio.run(run())
+    assert all(len(products) == 60 for products in results)  # Every page got through in the end
+    stats = rate.stats()[base.split('//')[1]]
+    assert stats['throttled'] == stand_in.throttled > 0
+    assert stats['retries'] >= stats['throttled']
+    assert stats['failures'] == 0
+    assert stats['rate'] < 20
+
+
+def test_rate_controller_backoff_doubles_with_jitter_and_cap():
+    rate = RateController(backoff_base=2.0, backoff_max=10.0)
+    for attempt, ceiling in enumerate([2.0, 4.0, 8.0, 10.0, 10.0]):
+        delays = [rate.backoff(attempt) for _ in range(200)]
+        assert ceiling / 2 <= min(delays) and max(delays) <= ceiling
+
+
+def test_rate_controller_throttled_and_success():
+    rate = RateController(initial_rate=4.0, min_rate=0.5, max_rate=5.0, increase=0.25, decrease=0.5)
+    rate.success('example.com')
+    assert rate.stats()['example.com']['rate'] == 4.25
+    for _ in range(4):
+        rate.success('example.com')
+    assert rate.stats()['example.com']['rate'] == 5.0  # Capped at max_rate
+
+    rate.throttled('example.com')
+    assert rate.stats()['example.com']['rate'] == 2.5
+    assert rate.reserve('example.com') > 0.3  # The next slot is pushed out by 1/rate
+    for _ in range(5):
+        rate.throttled('example.com')
+    stats = rate.stats()['example.com']
+    assert stats['rate'] == 0.5  # Floored at min_rate
+    assert stats['throttled'] == 6
+    assert rate.stats().keys() == {'example.com'}  # Hosts are tracked separately
+
+
+def test_rate_controller_spaces_requests_per_host():
+    rate = RateController(initial_rate=10.0)
+    waits = [rate.reserve('a.example') for _ in range(4)]
+    assert waits[0] == 0
+    assert [round(later - earlier, 2) for earlier, later in zip(waits, waits[1:])] == [0.1, 0.1, 0.1]
+    assert rate.reserve('b.example') == 0  # Another host has its own schedule
+    assert rate.stats()['a.example']['requests'] == 4
+
+
+class PaginatedStandIn:
+    """
+    Serves `pages` result pages of per_page products for every search, each
+    linking to the next with an s-pagination-next link (the last page has
+    none). Pages listed in fail_pages answer 500. Requests are logged as
+    (query, page).
+    """
+
+    def __init__(self, pages=3, per_page=4, fail_pages=()):
+        self.pages = pages
+        self.per_page = per_page
+        self.fail_pages = set(fail_pages)
+        self.log = []
+
+    async def __call__(self, request):
+        query, page = request.query['k'], int(request.query.get('page', 1))
+        self.log.append((query, page))
+        if page in self.fail_pages:
+            return web.Response(status=500, text='Server Error')
+        html = ''.join(f'<div data-component-type="s-search-result" data-asin="{query}-{page}-{idx}">'
+                       f'<h2>{query} product {page}.{idx}</h2></div>' for idx in range(self.per_page))
+        if page < self.pages:
+            html += f'<a class="s-pagination-item s-pagination-next" href="/s?k={query}&amp;page={page + 1}">Next</a>'
+        return web.Response(text=f'<html><body>{html}</body></html>', content_type='text/html')
+
+
+# Stream products from a stand-in; returns (ASINs in arrival order, stand-in log)
+def stream_from(stand_in, queries, **options):
+    async def run():
+        runner, base = await start_server(stand_in)
+        try:
+            with ThreadPoolExecutor(2) as parse_executor:
+                stream = Task2.stream_amazon_products([f'{base}/s?k={query}' for query in queries],
+                                                      parse_executor=parse_executor, **options)
+                return [product.asin async for product in stream]
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(run()), stand_in.log
+
+
+def test_stream_follows_next_links_until_the_last_page():
+    asins, log = stream_from(PaginatedStandIn(pages=3), ['laptop'])
+    assert log == [('laptop', 1), ('laptop', 2), ('laptop', 3)]  # Page 3 has no next link
+    assert asins == [f'laptop-{page}-{idx}' for page in (1, 2, 3) for idx in range(4)]
+
+
+def test_stream_stops_at_max_pages_and_max_products():
+    asins, log = stream_from(PaginatedStandIn(pages=10), ['laptop'], max_pages=2)
+    assert log == [('laptop', 1), ('laptop', 2)]
+    assert len(asins) == 8
+
+    asins, log = stream_from(PaginatedStandIn(pages=10), ['laptop', 'book'], max_products=6)
+    assert sorted(log) == [('book', 1), ('book', 2), ('laptop', 1), ('laptop', 2)]
+    assert sorted(asins) == sorted([f'{query}-1-{idx}' for query in ('laptop', 'book') for idx in range(4)]
+                                   + [f'{query}-2-{idx}' for query in ('laptop', 'book') for idx in range(2)])
+
+
+def test_stream_ends_a_search_at_a_failed_page():
+    asins, log = stream_from(PaginatedStandIn(pages=5, fail_pages=[2]), ['laptop', 'book'])
+    assert sorted(log) == [('book', 1), ('book', 2), ('laptop', 1), ('laptop', 2)]  # No retries without a rate
+    assert sorted(asins) == sorted(f'{query}-1-{idx}' for query in ('laptop', 'book') for idx in range(4))
+
+
+def test_stream_pauses_crawlers_when_the_page_queue_is_full():
+    stand_in = PaginatedStandIn(pages=50)
+
+    async def run():
+        runner, base = await start_server(stand_in)
+        try:
+            with ThreadPoolExecutor(2) as parse_executor:
+                stream = Task2.stream_amazon_products([f'{base}/s?k=laptop'], max_pages=50, parse_executor=parse_executor,
+                                                      max_queued_pages=2)
+                first = await stream.__anext__()
+                await asyncio.sleep(0.5)  # The consumer stalls
+                fetched_while_stalled = len(stand_in.log)
+                rest = [product async for product in stream]
+                return first, fetched_while_stalled, rest
+        finally:
+            await runner.cleanup()
+
+    first, fetched_while_stalled, rest = asyncio.run(run())
+    # Page 1 is being consumed, two pages wait in the queue and the crawler holds one more
+    assert fetched_while_stalled == 4
+    assert len(stand_in.log) == 50
+    assert 1 + len(rest) == 50 * 4
+    assert first.asin == 'laptop-1-0'
+
+
+# Async stream over a list of products, as stream_amazon_products yields them
+async def product_stream(products):
+    for product in products:
+        yield product
+
+
+def save_run(products, output_path, index, known):
+    counts = asyncio.run(Task2.save_product_stream(product_stream(products), str(output_path), 'csv', batch_size=25,
+                                                   index=index, known=known))
+    return counts, pd.read_csv(output_path)
+
+
+def test_product_index_skips_and_updates_across_runs(tmp_path):
+    products = Task2.parse_amazon_search(read_page(os.path.join(FIXTURE_FOLDER, 'search_laptop.html')), SEARCH_URL,
+                                         verbose=False)
+    index = Task2.ProductIndex(str(tmp_path / 'asin_index.sqlite'))
+    try:
+        # First run: everything is new; a repeated ASIN within the run is skipped
+        counts, written = save_run(products + products[:3], tmp_path / 'run1.csv', index, 'skip')
+        assert counts == {'new': 60, 'changed': 0, 'skipped': 3}
+        assert written['ASIN'].tolist() == [product.asin for product in products]
+        assert index.lookup([products[0].asin, 'B000000000']) == {products[0].asin: products[0].price}
+
+        # Second run, same results: nothing is written, but the file still has its header
+        counts, written = save_run(products, tmp_path / 'run2.csv', index, 'skip')
+        assert counts == {'new': 0, 'changed': 0, 'skipped': 60}
+        assert written.empty and list(written.columns) == Task2.PRODUCT_COLUMNS
+
+        # Third run, one price changed: only that product is written and its new price stored
+        products[7].price += 500
+        counts, written = save_run(products, tmp_path / 'run3.csv', index, 'update')
+        assert counts == {'new': 0, 'changed': 1, 'skipped': 59}
+        assert written['ASIN'].tolist() == [products[7].asin]
+        assert written['Price'].tolist() == [products[7].price]
+        assert index.lookup([products[7].asin]) == {products[7].asin: products[7].price}
+    finally:
+        index.close()
+
+
+class SearchPageHandler(BaseHTTPRequestHandler):
+    """Serves fixtures/search_laptop.html for every GET."""
+
+    def do_GET(self):
+        content = read_page(os.path.join(FIXTURE_FOLDER, 'search_laptop.html'))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_index_applies_without_stream(tmp_path):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SearchPageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/s?k=laptop'
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Task2.py')
+    output_path = tmp_path / 'Task 2' / 'data' / 'amazon_products.csv'
+
+    def run(*options):
+        subprocess.run([sys.executable, script, '--index', 'asin_index.sqlite', *options, url], cwd=tmp_path,
+                       check=True, capture_output=True)
+        return pd.read_csv(output_path)
+
+    try:
+        assert len(run()) == 60
+        second = run()  # Same results: every product is known from the first run
+        assert second.empty and list(second.columns) == Task2.PRODUCT_COLUMNS
+        assert run('--known', 'update').empty  # No price changed
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_parse_product_detail_reads_byline_seller_and_aria_histogram(monkeypatch):
+    content = read_page(os.path.join(FIXTURE_FOLDER, 'detail_aria.html'))
+    expected = Task2.ProductDetail('HP', 'Appario Retail Private Ltd', 'In stock', (62, 18, 7, 4, 9))
+    assert Task2.parse_product_detail(content) == expected
+    # The percentages come from the aria-labels; the row text is not needed
+    monkeypatch.setattr(Task2, 'HISTOGRAM_ROW', Task2.re.compile(r'(?!)'))
+    assert Task2.parse_product_detail(content) == expected
+
+
+def test_parse_product_detail_falls_back_to_overview_merchant_and_row_text():
+    detail = Task2.parse_product_detail(read_page(os.path.join(FIXTURE_FOLDER, 'detail_rows.html')))
+    assert detail.brand == 'Lenovo'  # Product overview table, no byline
+    assert detail.seller == 'Cloudtail India'  # Merchant info feature, no seller profile link
+    assert detail.availability == 'Only 3 left in stock - order soon.'
+    assert detail.histogram == (55, 21, 10, None, 14)  # Row text; the 2 star row is missing
+
+
+def test_parse_product_detail_brand_byline_and_missing_fields():
+    content = (b'<html><body><a id="bylineInfo">Brand: Logitech</a>'
+               b'<div id="merchant-info">Ships from and sold by <a href="/seller">RetailEZ Pvt Ltd</a>.</div>'
+               b'</body></html>')
+    assert Task2.parse_product_detail(content) == Task2.ProductDetail('Logitech', 'RetailEZ Pvt Ltd', None, None)
+
+
+class StoreStandIn:
+    """
+    One host serving search and product pages. Every search has `pages`
+    pages of per_page products whose ASINs cycle through `asins` distinct
+    values (so searches repeat products), each linking to its /dp/ page on
+    this host. Product pages wait for `release` (an asyncio.Event) when it
+    is set up, otherwise for `delay`. Tracks requests open at once.
+    """
+
+    def __init__(self, pages=3, per_page=4, asins=6, delay=0.02):
+        self.pages = pages
+        self.per_page = per_page
+        self.asins = asins
+        self.delay = delay
+        self.release = None
+        self.search_log = []
+        self.detail_log = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if request.path.startswith('/dp/'):
+                return await self.detail(request.path[len('/dp/'):])
+            return await self.search(request)
+        finally:
+            self.in_flight -= 1
+
+    async def search(self, request):
+        query, page = request.query['k'], int(request.query.get('page', 1))
+        self.search_log.append((query, page))
+        await asyncio.sleep(self.delay)
+        html = ''
+        for idx in range(self.per_page):
+            asin = f'A{((page - 1) * self.per_page + idx) % self.asins:04d}'
+            html += (f'<div data-component-type="s-search-result" data-asin="{asin}"><h2>Product {asin}</h2>'
+                     f'<a class="a-link-normal" href="http://{request.host}/dp/{asin}">link</a></div>')
+        if page < self.pages:
+            html += f'<a class="s-pagination-next" href="/s?k={query}&amp;page={page + 1}">Next</a>'
+        return web.Response(text=f'<html><body>{html}</body></html>', content_type='text/html')
+
+    async def detail(self, asin):
+        self.detail_log.append(asin)
+        if self.release is not None:
+            await self.release.wait()
+        else:
+            await asyncio.sleep(self.delay)
+        return web.Response(text=f'<html><body><a id="bylineInfo">Brand: Brand {asin}</a></body></html>',
+                            content_type='text/html')
+
+
+# Run stream_to_file with enrich=True against a stand-in; returns (counts, written rows)
+def enrich_run(stand_in, output_path, queries, **options):
+    async def run():
+        runner, base = await start_server(stand_in)
+        try:
+            with ThreadPoolExecutor(2) as parse_executor:
+                return await Task2.stream_to_file([f'{base}/s?k={query}' for query in queries], str(output_path),
+                                                  parse_executor=parse_executor, enrich=True, **options)
+        finally:
+            await runner.cleanup()
+
+    counts = asyncio.run(run())
+    return counts, pd.read_csv(output_path)
+
+
+def test_enrich_fetches_each_product_once_within_the_host_limit(tmp_path):
+    stand_in = StoreStandIn(pages=3, per_page=4, asins=6)
+    counts, written = enrich_run(stand_in, tmp_path / 'products.csv', ['laptop', 'book'], max_per_host=2,
+                                 detail_workers=8)
+    # 24 results, 6 distinct products: each product page is fetched once
+    assert sorted(stand_in.detail_log) == [f'A{idx:04d}' for idx in range(6)]
+    assert len(stand_in.search_log) == 6
+    assert stand_in.max_in_flight == 2  # Search and detail requests share the per-host limit
+    assert sorted(written['ASIN']) == [f'A{idx:04d}' for idx in range(6)]
+    assert (written['Brand'] == 'Brand ' + written['ASIN']).all()
+    assert counts['new'] == 6
+
+
+def test_enrich_skips_products_known_from_earlier_runs(tmp_path):
+    index = Task2.ProductIndex(str(tmp_path / 'asin_index.sqlite'))
+    try:
+        known = [Task2.Product(Task2.Category.GENERAL, 'LAPTOP', 'Known', 100, None, None, 'N/A', f'A{idx:04d}', None)
+                 for idx in range(3)]
+        index.store(known)
+        # Record which threads check the index: the event loop runs in this one
+        lookup_threads = []
+        contains = index.contains
+        index.contains = lambda asin: lookup_threads.append(threading.get_ident()) or contains(asin)
+        stand_in = StoreStandIn(pages=3, per_page=4, asins=6)
+        counts, written = enrich_run(stand_in, tmp_path / 'products.csv', ['laptop'], index=index, known='skip')
+    finally:
+        index.close()
+    assert len(lookup_threads) == 6 and threading.get_ident() not in lookup_threads
+    assert sorted(stand_in.detail_log) == ['A0003', 'A0004', 'A0005']
+    assert sorted(written['ASIN']) == ['A0003', 'A0004', 'A0005']
+    assert written['Brand'].notna().all()
+    assert counts['new'] == 3
+
+
+def test_enrich_stalls_the_search_crawl_when_detail_workers_fall_behind(tmp_path):
+    stand_in = StoreStandIn(pages=100, per_page=4, asins=10 ** 6, delay=0)
+
+    async def run():
+        stand_in.release = asyncio.Event()
+        runner, base = await start_server(stand_in)
+        try:
+            with ThreadPoolExecutor(2) as parse_executor:
+                products = Task2.stream_amazon_products([f'{base}/s?k=laptop'], max_pages=100,
+                                                        parse_executor=parse_executor, max_queued_pages=2)
+                products = Task2.enrich_products(products, workers=2, parse_executor=parse_executor, max_queued=4)
+                save = asyncio.create_task(Task2.save_product_stream(products, str(tmp_path / 'products.csv'),
+                                                                     details=True))
+                await asyncio.sleep(0.5)
+                stalled = len(stand_in.search_log)
+                await asyncio.sleep(0.3)
+                still_stalled = len(stand_in.search_log)
+                stand_in.release.set()
+                return stalled, still_stalled, await save
+        finally:
+            await runner.cleanup()
+
+    stalled, still_stalled, counts = asyncio.run(run())
+    # 2 products in the workers, 4 queued, a few held by the feeder and the page queue
+    assert stalled == still_stalled <= 8
+    assert len(stand_in.search_log) == 100
+    assert counts['new'] == 400
+
+
+class CacheTestHandler(BaseHTTPRequestHandler):
+    """
+    /etag and /modified send validators and answer a matching conditional
+    request with 304; /plain sends none; /missing is a 404. Bodies carry a
+    per-path counter so a re-download is visible. Requests are logged on
+    the server as (method, path, conditional headers).
+    """
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        self.respond(self.rfile.read(int(self.headers['Content-Length'])))
+
+    def respond(self, body=b''):
+        server = self.server
+        conditional = {name: self.headers[name] for name in ('If-None-Match', 'If-Modified-Since') if self.headers[name]}
+        server.log.append((self.command, self.path, conditional))
+        if self.path == '/missing':
+            self.send_response(404)
+            self.end_headers()
+            return
+        if (self.path == '/etag' and conditional.get('If-None-Match') == '"v1"') or \
+                (self.path == '/modified' and 'If-Modified-Since' in conditional):
+            self.send_response(304)
+            self.end_headers()
+            return
+        server.counts[self.path] = server.counts.get(self.path, 0) + 1
+        content = f'{self.path} #{server.counts[self.path]} '.encode() + body
+        self.send_response(200)
+        if self.path == '/etag':
+            self.send_header('ETag', '"v1"')
+        if self.path == '/modified':
+            self.send_header('Last-Modified', 'Wed, 01 Jan 2025 00:00:00 GMT')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def cache_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CacheTestHandler)
+    server.log, server.counts = [], {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_response_cache_serves_fresh_entries_from_disk(tmp_path, cache_server):
+    server, base = cache_server
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), ttl=3600)
+    first = cache.get(f'{base}/plain')
+    second = cache.get(f'{base}/plain')
+    assert not isinstance(first, CachedResponse) and isinstance(second, CachedResponse)
+    assert first.content == second.content == b'/plain #1 '
+    assert len(server.log) == 1
+    assert cache.stats == {'hits': 1, 'revalidated': 0, 'misses': 1}
+    assert cache.fresh('GET', f'{base}/plain') and not cache.fresh('GET', f'{base}/etag')
+    cache.close()
+
+
+@pytest.mark.parametrize('path, header', [('/etag', 'If-None-Match'), ('/modified', 'If-Modified-Since')])
+def test_response_cache_revalidates_stale_entries(tmp_path, cache_server, path, header):
+    server, base = cache_server
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), ttl=3600)
+    cache.get(f'{base}{path}')
+    stale = cache.get(f'{base}{path}', ttl=0)  # Too old: asked again with a validator, answered 304
+    assert isinstance(stale, CachedResponse) and stale.content == f'{path} #1 '.encode()
+    assert list(server.log[1][2]) == [header]
+    assert cache.stats['revalidated'] == 1
+    assert cache.fresh('GET', f'{base}{path}')  # The 304 renewed the entry
+    cache.close()
+
+
+def test_response_cache_refetches_stale_entries_without_validators(tmp_path, cache_server):
+    server, base = cache_server
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), ttl=0)
+    cache.get(f'{base}/plain')
+    assert cache.get(f'{base}/plain').content == b'/plain #2 '
+    assert [conditional for _, _, conditional in server.log] == [{}, {}]
+    assert cache.stats == {'hits': 0, 'revalidated': 0, 'misses': 2}
+    cache.close()
+
+
+def test_response_cache_keys_posts_by_body_and_skips_errors(tmp_path, cache_server):
+    server, base = cache_server
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    assert cache.post(f'{base}/query', data={'data': 'a'}).content == b'/query #1 data=a'
+    assert cache.post(f'{base}/query', data={'data': 'b'}).content == b'/query #2 data=b'
+    assert cache.post(f'{base}/query', data={'data': 'a'}).content == b'/query #1 data=a'
+    assert cache.get(f'{base}/missing').status_code == 404
+    assert cache.get(f'{base}/missing').status_code == 404
+    assert len(server.log) == 4  # The 404 was not stored
+    cache.close()
+
+
+def test_response_cache_offline_mode(tmp_path, cache_server):
+    server, base = cache_server
+    online = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    online.get(f'{base}/etag')
+    online.close()
+    offline = ResponseCache(str(tmp_path / 'cache.sqlite'), ttl=0, offline=True)
+    assert offline.get(f'{base}/etag').content == b'/etag #1 '  # Served however old it is
+    with pytest.raises(OfflineCacheMiss):
+        offline.get(f'{base}/plain')
+    assert len(server.log) == 1
+    offline.close()
+
+
+def test_response_cache_fetch_async(tmp_path, cache_server):
+    server, base = cache_server
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), ttl=3600)
+    # Record which threads touch SQLite: the event loop runs in this one
+    sqlite_threads = []
+    for name in ('lookup', 'store', 'refresh'):
+        method = getattr(cache, name)
+        setattr(cache, name, lambda *args, method=method: sqlite_threads.append(threading.get_ident()) or method(*args))
+
+    async def run():
+        async with aiohttp.ClientSession() as session:
+            bodies = [await cache.fetch_async(session, f'{base}/etag'), await cache.fetch_async(session, f'{base}/etag'),
+                      await cache.fetch_async(session, f'{base}/etag', ttl=0)]
+            with pytest.raises(aiohttp.ClientResponseError):
+                await cache.fetch_async(session, f'{base}/missing')
+            return bodies
+
+    assert asyncio.run(run()) == [b'/etag #1 '] * 3
+    assert [conditional for _, _, conditional in server.log] == [{}, {'If-None-Match': '"v1"'}, {}]
+    assert cache.stats == {'hits': 1, 'revalidated': 1, 'misses': 2}
+    assert sqlite_threads and threading.get_ident() not in sqlite_threads
+    cache.close()
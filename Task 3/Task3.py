@@ -1,13 +1,63 @@
-
 # Import required libraries
 import requests      # For HTTP requests
+import urllib3       # For errors raised while reading a streamed body
 import csv           # For writing CSV files
+import os            # For the module search path
+import sys           # For the module search path
+import argparse      # For command-line options
+import sqlite3       # For the persistent geocode store
+import math          # For tile sizes and distances
+import time          # For timing tiled queries
+from collections import deque  # For the tile work queue
+from urllib.parse import urlsplit, urlencode  # For the rate controller's host key and cache keys
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED  # For concurrent queries
+
+try:
+    import ijson     # Incremental JSON parser for streaming mode (optional)
+except ImportError:
+    ijson = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_cache import ResponseCache, OfflineCacheMiss, DEFAULT_CACHE_PATH, DEFAULT_TTL  # Shared response cache (repository root)
+from rate_control import RateController, is_throttled  # Adaptive per-host pacing (repository root)
+from attraction_index import dedupe_attractions  # Proximity + name near-duplicate merge
+from osm_extract import iter_extract_elements  # Offline .osm / .osm.pbf reader
+
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+OVERPASS_URL = "http://overpass-api.de/api/interpreter"
+SEARCH_RADIUS = 50000  # Metres around the city centre
+EARTH_RADIUS_M = 6_371_000
+
+# Attraction tag filters: (key, Overpass condition), each queried for nodes and ways
+ATTRACTION_FILTERS = [
+    ('tourism', '~"museum|attraction|zoo|theme_park|viewpoint|artwork"'),
+    ('historic', '~"monument|memorial|castle|ruins|archaeological_site"'),
+    ('leisure', '="park"'),
+    ('amenity', '~"place_of_worship|theatre|cinema"'),
+]
+
+# Tiled mode (--tiled)
+OVERPASS_SLOTS = 2            # Concurrent queries; the public Overpass server allows about 2 per IP
+TILE_TIMEOUT = 60             # Server-side [timeout:] of each tile query (seconds)
+TILE_TARGET_ELEMENTS = 2000   # Pending tiles expected to hold more than this are split before querying
+MAX_TILE_DEPTH = 6            # Quadrant splits allowed below the initial 2x2 grid
+
+# Batch mode (--batch)
+TASK_FOLDER = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_GEOCODE_PATH = os.path.join(TASK_FOLDER, 'geocode_cache.sqlite')
+NOMINATIM_RATE = 1.0          # Nominatim usage policy: at most 1 request/second
+BATCH_FIELDS = ['city', 'name', 'type', 'latitude', 'longitude']
+
+# Streaming mode (--stream)
+ATTRACTION_FIELDS = ['name', 'type', 'latitude', 'longitude']
+STREAM_BATCH_SIZE = 1000      # Rows buffered before each write to the sink
+STREAM_TIMEOUT = 180          # Server-side [timeout:] of streamed queries (seconds)
 
 
 # Get city coordinates (latitude, longitude) using Nominatim geocoding API
-def get_city_coordinates(city_name):
-    """Get city coordinates using Nominatim geocoding service."""
-    nominatim_url = "https://nominatim.openstreetmap.org/search"
+def get_city_coordinates(city_name, cache=None):
+    """Get city coordinates using Nominatim geocoding service (through cache, a ResponseCache, when given)."""
     params = {
         'q': city_name,
         'format': 'json',
@@ -18,7 +68,7 @@ def get_city_coordinates(city_name):
     headers = {'User-Agent': 'TouristAttractionsScraper/1.0'}
 
     try:
-        response = requests.get(nominatim_url, params=params, headers=headers, timeout=10)
+        response = (cache or requests).get(NOMINATIM_URL, params=params, headers=headers, timeout=10)
         response.raise_for_status()
         data = response.json()
 
@@ -33,59 +83,199 @@ def get_city_coordinates(city_name):
         return None, None
 
 
-# Fetch tourist attractions for a city using Overpass API and OpenStreetMap
-def fetch_tourist_attractions(city_name):
-    overpass_url = "http://overpass-api.de/api/interpreter"
+# Build an Overpass QL query for every attraction filter inside `area`
+def build_query(area, timeout=None):
+    """area is an Overpass spatial filter: 'around:R,lat,lon' or a 'south,west,north,east' bbox."""
+    header = f"[out:json][timeout:{timeout}];" if timeout else "[out:json];"
+    lines = "".join(f'      {kind}["{key}"{condition}]({area});\n'
+                    for key, condition in ATTRACTION_FILTERS for kind in ('node', 'way'))
+    return f"""
+    {header}
+    (
+{lines}    );
+    out center;
+    """
 
-    # Get city coordinates using Nominatim
-    city_lat, city_lon = get_city_coordinates(city_name)
 
-    if city_lat is None or city_lon is None:
-        return []
+# Turn an Overpass element into an attraction record (None when it has no name or coordinates)
+def element_record(element):
+    tags = element.get('tags', {})
+    name = tags.get('name', 'Unknown')
+    # Determine type of attraction
+    tourism_type = (tags.get('tourism') or tags.get('historic') or
+                    tags.get('leisure') or tags.get('amenity') or 'Unknown')
+    # Get coordinates
+    lat = element.get('lat') or element.get('center', {}).get('lat')
+    lon = element.get('lon') or element.get('center', {}).get('lon')
 
-    print(f"Found {city_name} at coordinates: {city_lat}, {city_lon}")
+    # Only keep if name and coordinates are present
+    if lat and lon and name != 'Unknown':
+        return {
+            'name': name,
+            'type': tourism_type,
+            'latitude': lat,
+            'longitude': lon
+        }
+    return None
 
-    # Overpass QL query to find various types of attractions within 50km
-    query = f"""
-    [out:json];
-    (
-      node["tourism"~"museum|attraction|zoo|theme_park|viewpoint|artwork"](around:50000,{city_lat},{city_lon});
-      way["tourism"~"museum|attraction|zoo|theme_park|viewpoint|artwork"](around:50000,{city_lat},{city_lon});
-      node["historic"~"monument|memorial|castle|ruins|archaeological_site"](around:50000,{city_lat},{city_lon});
-      way["historic"~"monument|memorial|castle|ruins|archaeological_site"](around:50000,{city_lat},{city_lon});
-      node["leisure"="park"](around:50000,{city_lat},{city_lon});
-      way["leisure"="park"](around:50000,{city_lat},{city_lon});
-      node["amenity"~"place_of_worship|theatre|cinema"](around:50000,{city_lat},{city_lon});
-      way["amenity"~"place_of_worship|theatre|cinema"](around:50000,{city_lat},{city_lon});
-    );
-    out center;
+
+# Great-circle distance in metres
+def haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+# Split a (south, west, north, east) tile into its four quadrants
+def split_tile(tile):
+    south, west, north, east = tile
+    mid_lat, mid_lon = (south + north) / 2, (west + east) / 2
+    return [(south, west, mid_lat, mid_lon), (south, mid_lon, mid_lat, east),
+            (mid_lat, west, north, mid_lon), (mid_lat, mid_lon, north, east)]
+
+
+# Area of a tile in km²
+def tile_area_km2(tile):
+    south, west, north, east = tile
+    height = (north - south) * 111.32
+    width = (east - west) * 111.32 * math.cos(math.radians((south + north) / 2))
+    return height * width
+
+
+# Query one bbox tile; returns (elements, None) or (None, reason) where reason is 'split', 'retry' or 'fail'
+def query_tile(tile, cache, rate, attempt=0):
     """
+    'split': the response timed out (ReadTimeout) or Overpass stopped the
+    query (runtime error remark), so smaller tiles may succeed. 'retry':
+    throttled, a server or connection error (including ConnectTimeout,
+    which says nothing about the query's size), or a body that is not JSON. 'fail': any other 4xx,
+    which the same query would get again, or no cached response in offline
+    mode (which a retry cannot change).
+    """
+    query = build_query(','.join(f'{value:.6f}' for value in tile), TILE_TIMEOUT)
+    host = urlsplit(OVERPASS_URL).netloc
+    if attempt:
+        rate.retried(host)
+        time.sleep(rate.backoff(attempt - 1))
+    rate.wait(host)
+    try:
+        response = (cache or requests).post(OVERPASS_URL, data={'data': query}, timeout=TILE_TIMEOUT + 15)
+    except requests.exceptions.ReadTimeout:
+        return None, 'split'
+    except OfflineCacheMiss as e:  # A ConnectionError, but not a transient one
+        print(f"  Tile {tile}: {e}")
+        return None, 'fail'
+    except requests.exceptions.RequestException as e:
+        print(f"  Tile {tile}: {str(e)[:60]}")
+        return None, 'retry'
+
+    if is_throttled(response.status_code) or response.status_code == 504:  # Out of slots / server busy
+        rate.throttled(host)
+        return None, 'retry'
+    if response.status_code >= 400:
+        print(f"  Tile {tile}: HTTP {response.status_code}")
+        return None, 'fail' if response.status_code < 500 else 'retry'
+
+    try:
+        data = response.json()
+    except ValueError:  # HTML error page or truncated body
+        print(f"  Tile {tile}: response is not JSON")
+        if cache is not None:
+            cache.forget('POST', OVERPASS_URL, urlencode({'data': query}))
+        return None, 'retry'
+    if 'runtime error' in data.get('remark', ''):  # Timed out or out of memory: results are partial
+        if cache is not None:
+            cache.forget('POST', OVERPASS_URL, urlencode({'data': query}))
+        return None, 'split'
+    rate.success(host)
+    return data['elements'], None
+
+
+def fetch_attractions_tiled(city_lat, city_lon, radius=SEARCH_RADIUS, cache=None, slots=OVERPASS_SLOTS, rate=None):
+    """
+    Fetch attractions within radius metres of a point as a grid of bbox
+    tiles queried concurrently (at most `slots` at once, paced by rate).
+    Pending tiles are split into quadrants when the density seen so far
+    predicts more than TILE_TARGET_ELEMENTS in them; tiles that time out
+    or hit Overpass limits are split and re-queued (down to
+    MAX_TILE_DEPTH), throttled tiles are retried after a backoff and tiles
+    rejected with a client error (4xx) are given up at once.
+    Results are merged by OSM type/id and clipped to the radius.
+    """
+    if rate is None:
+        rate = RateController(initial_rate=1.0, max_rate=float(slots))
+    lat_span = radius / 111_320
+    lon_span = radius / (111_320 * math.cos(math.radians(city_lat)))
+    region = (city_lat - lat_span, city_lon - lon_span, city_lat + lat_span, city_lon + lon_span)
+    pending = deque((tile, 1, 0) for tile in split_tile(region))  # (tile, depth, attempts)
+
+    elements = {}
+    seen_elements = 0  # Elements returned, duplicates included, for the density estimate
+    seen_area = 0.0
+    failed = 0
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=slots) as executor:
+        running = {}
+        while pending or running:
+            while pending and len(running) < slots:
+                tile, depth, attempts = pending.popleft()
+                expected = seen_elements / seen_area * tile_area_km2(tile) if seen_area else 0
+                if expected > TILE_TARGET_ELEMENTS and depth < MAX_TILE_DEPTH:
+                    pending.extendleft((child, depth + 1, 0) for child in split_tile(tile))
+                    continue
+                running[executor.submit(query_tile, tile, cache, rate, attempts)] = (tile, depth, attempts)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                tile, depth, attempts = running.pop(future)
+                tile_elements, reason = future.result()
+                if tile_elements is not None:
+                    for element in tile_elements:
+                        elements[(element['type'], element['id'])] = element
+                    seen_elements += len(tile_elements)
+                    seen_area += tile_area_km2(tile)
+                elif reason == 'split' and depth < MAX_TILE_DEPTH:
+                    print(f"  Tile {tile} failed, splitting (depth {depth + 1})")
+                    pending.extend((child, depth + 1, 0) for child in split_tile(tile))
+                elif reason != 'fail' and attempts < rate.max_retries:
+                    pending.append((tile, depth, attempts + 1))
+                else:
+                    failed += 1
+                    rate.failed(urlsplit(OVERPASS_URL).netloc)
+                    print(f"  ✗ Tile {tile} gave up")
+
+    attractions = []
+    for element in elements.values():
+        record = element_record(element)
+        if record and haversine_m(city_lat, city_lon, record['latitude'], record['longitude']) <= radius:
+            attractions.append(record)
+    print(f"Tiled query: {len(elements)} unique elements, {len(attractions)} attractions, "
+          f"{failed} failed tiles, {time.time() - started:.1f}s")
+    return attractions
+
+
+# Fetch attractions around a point: one union query, or bbox tiles with tiled=True
+def fetch_attractions_around(city_lat, city_lon, cache=None, tiled=False, radius=SEARCH_RADIUS,
+                             slots=OVERPASS_SLOTS, rate=None):
+    if tiled:
+        return fetch_attractions_tiled(city_lat, city_lon, radius, cache, slots, rate)
+
+    # Overpass QL query to find various types of attractions within the radius
+    query = build_query(f"around:{radius},{city_lat},{city_lon}")
 
     try:
+        if rate is not None:
+            rate.wait(urlsplit(OVERPASS_URL).netloc)
         # Send POST request to Overpass API
-        response = requests.post(overpass_url, data={'data': query}, timeout=30)
+        response = (cache or requests).post(OVERPASS_URL, data={'data': query}, timeout=30)
         response.raise_for_status()
         data = response.json()
 
         attractions = []
         for element in data['elements']:
-            tags = element.get('tags', {})
-            name = tags.get('name', 'Unknown')
-            # Determine type of attraction
-            tourism_type = (tags.get('tourism') or tags.get('historic') or
-                          tags.get('leisure') or tags.get('amenity') or 'Unknown')
-            # Get coordinates
-            lat = element.get('lat') or element.get('center', {}).get('lat')
-            lon = element.get('lon') or element.get('center', {}).get('lon')
-
-            # Only add if name and coordinates are present
-            if lat and lon and name != 'Unknown':
-                attractions.append({
-                    'name': name,
-                    'type': tourism_type,
-                    'latitude': lat,
-                    'longitude': lon
-                })
+            record = element_record(element)
+            if record:
+                attractions.append(record)
 
         return attractions
 
@@ -97,6 +287,258 @@ def fetch_tourist_attractions(city_name):
         return []
 
 
+# Fetch tourist attractions for a city using Overpass API and OpenStreetMap
+def fetch_tourist_attractions(city_name, cache=None, tiled=False, radius=SEARCH_RADIUS, slots=OVERPASS_SLOTS):
+    """
+    One union query around the city centre, or with tiled=True a grid of
+    concurrent bbox queries (fetch_attractions_tiled) for large or dense
+    regions.
+    """
+    # Get city coordinates using Nominatim
+    city_lat, city_lon = get_city_coordinates(city_name, cache)
+
+    if city_lat is None or city_lon is None:
+        return []
+
+    print(f"Found {city_name} at coordinates: {city_lat}, {city_lon}")
+    return fetch_attractions_around(city_lat, city_lon, cache, tiled, radius, slots)
+
+
+# Key of a city in the geocode store: trimmed and lower-cased, so "Surat" and "surat " are one city
+def city_key(city_name):
+    return city_name.strip().lower()
+
+
+class GeocodeCache:
+    """
+    Persistent SQLite store of city coordinates from earlier runs, keyed by
+    city_key. Coordinates never expire.
+    """
+
+    def __init__(self, path=DEFAULT_GEOCODE_PATH):
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS geocodes (city TEXT PRIMARY KEY, lat REAL, lon REAL, resolved_at REAL)'
+            ' WITHOUT ROWID'
+        )
+        self.connection.commit()
+
+    # (lat, lon) of a city, or None when it was never resolved
+    def lookup(self, city_name):
+        return self.connection.execute(
+            'SELECT lat, lon FROM geocodes WHERE city = ?', (city_key(city_name),)
+        ).fetchone()
+
+    def store(self, city_name, lat, lon):
+        self.connection.execute('INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?)',
+                                (city_key(city_name), lat, lon, time.time()))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+# Write one city's attractions to the batch CSV; returns how many
+def write_city_rows(writer, city_name, attractions):
+    writer.writerows({'city': city_name, **attraction} for attraction in attractions)
+    print(f"  ✓ {city_name}: {len(attractions)} attractions")
+    return len(attractions)
+
+
+def harvest_cities(city_names, output_path, geocodes, cache=None, tiled=False, radius=SEARCH_RADIUS,
+                   slots=OVERPASS_SLOTS):
+    """
+    Fetch attractions for many cities into one CSV (BATCH_FIELDS, tagged
+    with the city). Coordinates come from the geocode store; misses go to
+    Nominatim no faster than NOMINATIM_RATE requests/second. Each city's
+    Overpass query starts as soon as it is geocoded, on a pool of `slots`
+    workers, while later cities are still being geocoded. Rows are written
+    as each city finishes. Returns {city: attraction count}.
+    """
+    nominatim = RateController(initial_rate=NOMINATIM_RATE, min_rate=NOMINATIM_RATE / 10, max_rate=NOMINATIM_RATE)
+    overpass = RateController(initial_rate=1.0, max_rate=float(slots))
+    nominatim_host = urlsplit(NOMINATIM_URL).netloc
+    counts = {}
+    geocode_hits = 0
+
+    with open(output_path, 'w', newline='', encoding='utf-8') as csvfile, \
+            ThreadPoolExecutor(max_workers=slots) as executor:
+        writer = csv.DictWriter(csvfile, fieldnames=BATCH_FIELDS)
+        writer.writeheader()
+        futures = {}
+        for city_name in city_names:
+            coordinates = geocodes.lookup(city_name)
+            if coordinates is None:
+                nominatim.wait(nominatim_host)  # Strict pace on cache misses only
+                coordinates = get_city_coordinates(city_name, cache)
+                if coordinates[0] is None:
+                    nominatim.failed(nominatim_host)
+                    print(f"  ✗ {city_name}: no coordinates")
+                    counts[city_name] = 0
+                    continue
+                geocodes.store(city_name, *coordinates)
+            else:
+                geocode_hits += 1
+            # Tiled cities query one tile at a time so the pool as a whole stays within `slots`
+            futures[executor.submit(fetch_attractions_around, *coordinates, cache, tiled, radius, 1, overpass)] = \
+                city_name
+
+            # Write cities that finished while geocoding went on
+            for future in [future for future in futures if future.done()]:
+                city_done = futures.pop(future)
+                counts[city_done] = write_city_rows(writer, city_done, future.result())
+                csvfile.flush()
+
+        for future in as_completed(futures):
+            counts[futures[future]] = write_city_rows(writer, futures[future], future.result())
+
+    print(f"Geocoding: {geocode_hits} cached, {len(city_names) - geocode_hits} looked up")
+    return counts
+
+
+class CsvSink:
+    """Appends batches of attraction rows to a UTF-8 CSV file."""
+
+    def __init__(self, output_path, fields=ATTRACTION_FIELDS):
+        self.handle = open(output_path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.handle, fieldnames=fields)
+        self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.handle.close()
+
+
+class ParquetSink:
+    """Writes each batch of attraction rows as a Parquet row group (pyarrow); coordinates are doubles."""
+
+    TYPES = {'latitude': 'float64', 'longitude': 'float64'}
+
+    def __init__(self, output_path, fields=ATTRACTION_FIELDS):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.pa = pa
+        self.schema = pa.schema([
+            (name, pa.dictionary(pa.int32(), pa.string()) if name in ('city', 'type')
+             else pa.type_for_alias(self.TYPES.get(name, 'string')))
+            for name in fields
+        ])
+        self.writer = pq.ParquetWriter(output_path, self.schema)
+
+    def write(self, rows):
+        if rows:
+            self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+# Available output formats for streaming mode
+SINKS = {
+    'csv': CsvSink,
+    'parquet': ParquetSink,
+}
+
+
+# Write records to a sink in batches of batch_size; returns how many
+def write_records(records, sink, batch_size=STREAM_BATCH_SIZE):
+    rows = []
+    written = 0
+    for record in records:
+        rows.append(record)
+        if len(rows) >= batch_size:
+            sink.write(rows)
+            written += len(rows)
+            rows = []
+    sink.write(rows)
+    return written + len(rows)
+
+
+# Attraction records from a local OSM extract (offline alternative to the Overpass query)
+def fetch_attractions_from_extract(path, city_lat=None, city_lon=None, radius=SEARCH_RADIUS):
+    """
+    Yields the records the Overpass query would return, read in one pass
+    over path (.osm, .osm.gz, .osm.bz2 or, with pyosmium, .osm.pbf) with
+    the same ATTRACTION_FILTERS. Way positions are the centre of their
+    bounding box, like Overpass "out center". Given a centre point, records
+    farther than radius metres are skipped; otherwise the whole extract is
+    returned.
+    """
+    for element in iter_extract_elements(path, ATTRACTION_FILTERS):
+        record = element_record(element)
+        if record is None:
+            continue
+        if city_lat is not None and haversine_m(city_lat, city_lon, record['latitude'], record['longitude']) > radius:
+            continue
+        yield record
+
+
+# Yield the objects of a JSON document's top-level "elements" array as they are parsed
+def iter_overpass_elements(stream, remarks):
+    """
+    stream is a binary file-like object. Only one element is held in memory
+    at a time. A top-level "remark" (Overpass reports timeouts there) is
+    appended to remarks.
+    """
+    builder = None
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == 'elements.item' and event == 'end_map':
+                yield builder.value
+                builder = None
+        elif prefix == 'elements.item' and event == 'start_map':
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+        elif prefix == 'remark' and event == 'string':
+            remarks.append(value)
+
+
+def stream_attractions(city_lat, city_lon, sink, radius=SEARCH_RADIUS, batch_size=STREAM_BATCH_SIZE):
+    """
+    Run the attractions query around a point and write the records to sink
+    while the response is still arriving: elements are parsed one at a
+    time with ijson, projected with element_record and written in batches
+    of batch_size, so memory does not grow with the result size. There is
+    no cache path: the response cache stores whole bodies, which would undo
+    the streaming. Returns the number of rows written, or None when the
+    request fails or the body is not valid JSON (rows written before the
+    error stay in the sink).
+    """
+    if ijson is None:
+        raise ImportError("Streaming mode requires ijson (pip install ijson)")
+    query = build_query(f"around:{radius},{city_lat},{city_lon}", STREAM_TIMEOUT)
+
+    response = None
+    remarks = []
+    try:
+        response = requests.post(OVERPASS_URL, data={'data': query}, timeout=STREAM_TIMEOUT + 30, stream=True)
+        response.raise_for_status()
+        response.raw.decode_content = True  # Undo gzip transfer encoding while streaming
+        records = (element_record(element) for element in iter_overpass_elements(response.raw, remarks))
+        written = write_records((record for record in records if record), sink, batch_size)
+    except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+        # urllib3 errors come from reading response.raw directly
+        print(f"Error fetching attractions data: {e}")
+        return None
+    except ijson.JSONError as e:
+        print(f"Error parsing attractions data: {e}")
+        return None
+    finally:
+        if response is not None:
+            response.close()
+
+    if any('runtime error' in remark for remark in remarks):
+        print(f"⚠ Overpass stopped early, results are partial: {remarks[0][:80]}")
+    return written
+
+
 # Save the list of attractions to a CSV file
 def save_to_csv(data, city_name):
     if not data:
@@ -117,9 +559,121 @@ def save_to_csv(data, city_name):
 
 # Main execution block
 if __name__ == "__main__":
-    city = "Surat"
-    print(f"Fetching tourist attractions for {city}...")
-    attractions = fetch_tourist_attractions(city)
+    parser = argparse.ArgumentParser(description="Fetch tourist attractions for a city from OpenStreetMap")
+    parser.add_argument('city', nargs='?', default="Surat", help="city name (default: Surat)")
+    parser.add_argument('--radius', type=float, default=SEARCH_RADIUS / 1000,
+                        help=f"search radius around the city centre in km (default: {SEARCH_RADIUS // 1000})")
+    parser.add_argument('--tiled', action='store_true',
+                        help="split the area into bbox tiles queried concurrently (for large or dense regions); "
+                             "not with --stream or --extract")
+    parser.add_argument('--slots', type=int, default=OVERPASS_SLOTS,
+                        help=f"concurrent Overpass queries in tiled and batch mode (default: {OVERPASS_SLOTS})")
+    parser.add_argument('--dedupe', action='store_true',
+                        help="merge near-duplicates (similar names within 150 m, e.g. a node and a way of one temple); "
+                             "not with --stream or --batch")
+    parser.add_argument('--stream', action='store_true',
+                        help="parse the Overpass response incrementally (ijson) and write rows as they arrive")
+    parser.add_argument('--format', dest='output_format', choices=sorted(SINKS), default='csv',
+                        help="output format for --stream (default: csv)")
+    parser.add_argument('--extract', metavar='PATH',
+                        help="read attractions from a local .osm/.osm.pbf extract instead of the Overpass API")
+    parser.add_argument('--center', nargs=2, type=float, metavar=('LAT', 'LON'),
+                        help="centre point for --extract (default: the city from the geocode store or Nominatim)")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="harvest every city listed in FILE (one per line) into one city-tagged CSV")
+    parser.add_argument('--output', help="output path for --batch / --stream (default: tourist_attractions_<name>.csv)")
+    parser.add_argument('--geocode-cache', default=DEFAULT_GEOCODE_PATH,
+                        help=f"persistent city coordinate store for --batch (default: {DEFAULT_GEOCODE_PATH})")
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_PATH,
+                        help=f"cache Nominatim/Overpass responses on disk (default path: {DEFAULT_CACHE_PATH})")
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL,
+                        help=f"seconds a cached response is used before revalidation (default: {DEFAULT_TTL})")
+    parser.add_argument('--offline', action='store_true',
+                        help="serve every response from the cache and never touch the network")
+    args = parser.parse_args()
+    if args.dedupe and (args.stream or args.batch):
+        parser.error("--dedupe works on one city's records in memory and cannot be combined with --stream or --batch")
+    if args.tiled and (args.stream or args.extract):
+        parser.error("--tiled splits Overpass queries and cannot be combined with --stream or --extract")
+    if args.batch and (args.stream or args.extract):
+        parser.error("--batch always queries Overpass into one CSV and cannot be combined with --stream or --extract")
+    if args.stream and not args.extract and (args.cache or args.offline):
+        parser.error("--stream reads the Overpass response as it arrives and cannot be combined with --cache or --offline")
+
+    cache = None
+    if args.cache or args.offline:
+        cache = ResponseCache(args.cache or DEFAULT_CACHE_PATH, ttl=args.cache_ttl, offline=args.offline)
+
+    if args.batch:
+        with open(args.batch, encoding='utf-8') as handle:
+            # One entry per geocode key, keeping the first spelling of each city
+            city_names = {}
+            for line in handle:
+                if line.strip():
+                    city_names.setdefault(city_key(line), line.strip())
+            city_names = list(city_names.values())
+        output_path = args.output or f"tourist_attractions_{os.path.splitext(os.path.basename(args.batch))[0]}.csv"
+        print(f"Fetching tourist attractions for {len(city_names)} cities...")
+        geocodes = GeocodeCache(args.geocode_cache)
+        try:
+            counts = harvest_cities(city_names, output_path, geocodes, cache, args.tiled,
+                                    int(args.radius * 1000), args.slots)
+        finally:
+            geocodes.close()
+        print(f"✓ Saved {sum(counts.values())} attractions for "
+              f"{sum(1 for count in counts.values() if count)}/{len(city_names)} cities to {output_path}")
+        sys.exit(0)
+
+    city = args.city
+    if args.extract:
+        if args.center:
+            city_lat, city_lon = args.center
+        else:
+            geocodes = GeocodeCache(args.geocode_cache)
+            try:
+                city_lat, city_lon = geocodes.lookup(city) or get_city_coordinates(city, cache)
+            finally:
+                geocodes.close()
+        if city_lat is None:
+            print(f"No coordinates for {city}: reading every attraction in {args.extract}")
+        else:
+            print(f"Reading attractions within {args.radius:g} km of {city} ({city_lat}, {city_lon}) "
+                  f"from {args.extract}...")
+        records = fetch_attractions_from_extract(args.extract, city_lat, city_lon, int(args.radius * 1000))
+        if args.stream:
+            output_path = args.output or f"tourist_attractions_{city.replace(' ', '_')}.{args.output_format}"
+            sink = SINKS[args.output_format](output_path)
+            try:
+                count = write_records(records, sink)
+            finally:
+                sink.close()
+            print(f"✓ Saved {count} attractions to {output_path}")
+            sys.exit(0)
+        attractions = list(records)
+    elif args.stream:
+        output_path = args.output or f"tourist_attractions_{city.replace(' ', '_')}.{args.output_format}"
+        city_lat, city_lon = get_city_coordinates(city, cache)
+        if city_lat is None:
+            sys.exit(1)
+        print(f"Streaming tourist attractions for {city} ({city_lat}, {city_lon})...")
+        sink = SINKS[args.output_format](output_path)
+        try:
+            count = stream_attractions(city_lat, city_lon, sink, int(args.radius * 1000))
+        finally:
+            sink.close()
+        if count is None:
+            print(f"✗ Streaming failed, {output_path} is incomplete")
+            sys.exit(1)
+        print(f"✓ Saved {count} attractions to {output_path}")
+        sys.exit(0)
+    else:
+        print(f"Fetching tourist attractions for {city}...")
+        attractions = fetch_tourist_attractions(city, cache, args.tiled, int(args.radius * 1000), args.slots)
+
+    if attractions and args.dedupe:
+        unique = dedupe_attractions(attractions)
+        print(f"Merged {len(attractions) - len(unique)} near-duplicate attractions")
+        attractions = unique
 
     if attractions:
         print(f"Found {len(attractions)} attractions")
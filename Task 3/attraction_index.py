@@ -0,0 +1,161 @@
+# Spatial index and proximity queries over attraction records (fetch_tourist_attractions output)
+import re            # For name normalization
+import difflib       # For name similarity
+import numpy as np   # For vectorized distances and the cell grid
+
+
+EARTH_RADIUS_M = 6_371_000
+DEFAULT_CELL_KM = 1.0         # Grid cell size of AttractionIndex
+DEDUP_RADIUS_M = 150          # Records closer than this are duplicate candidates
+NAME_SIMILARITY = 0.85        # Minimum difflib ratio of normalized names for a duplicate
+KM_PER_DEGREE = 111.32
+
+# Cell keys pack (row, column) into one int64: row * COLUMN_SPAN + column + COLUMN_OFFSET
+COLUMN_OFFSET = 2 ** 24
+COLUMN_SPAN = 2 ** 25
+
+
+# Great-circle distance in metres; works element-wise on NumPy arrays
+def haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class AttractionIndex:
+    """
+    In-memory grid index over attraction records (dicts with latitude and
+    longitude). Points are bucketed into cells at least cell_km wide and
+    tall (columns are widened for the highest latitude in the data) and kept
+    sorted by cell key, so a query touches only the cells around it: one
+    binary search per row of cells, then a vectorized haversine over the
+    candidates. Building it is a single O(n log n) sort.
+    """
+
+    def __init__(self, attractions, cell_km=DEFAULT_CELL_KM):
+        self.records = list(attractions)
+        self.lat = np.array([float(record['latitude']) for record in self.records], dtype=np.float64)
+        self.lon = np.array([float(record['longitude']) for record in self.records], dtype=np.float64)
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        max_lat = min(float(np.abs(self.lat).max()) if len(self.lat) else 0.0, 89.0)
+        self.column_deg = self.cell_deg / np.cos(np.radians(max_lat))
+        self.rows = np.floor(self.lat / self.cell_deg).astype(np.int64)
+        self.columns = np.floor(self.lon / self.column_deg).astype(np.int64)
+        keys = self.rows * COLUMN_SPAN + self.columns + COLUMN_OFFSET
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+    def __len__(self):
+        return len(self.records)
+
+    # Indices of the points in the cells covering a radius around a point
+    def _candidates(self, lat, lon, radius_m):
+        lat_span = radius_m / 1000 / KM_PER_DEGREE
+        lon_span = lat_span / max(np.cos(np.radians(min(abs(lat) + lat_span, 89.9))), 1e-6)
+        row_range = np.arange(np.floor((lat - lat_span) / self.cell_deg), np.floor((lat + lat_span) / self.cell_deg) + 1,
+                              dtype=np.int64)
+        first_column = int(np.floor((lon - lon_span) / self.column_deg))
+        last_column = int(np.floor((lon + lon_span) / self.column_deg))
+        # Columns of one row are contiguous in key order: one slice per row
+        starts = np.searchsorted(self.sorted_keys, row_range * COLUMN_SPAN + first_column + COLUMN_OFFSET, 'left')
+        ends = np.searchsorted(self.sorted_keys, row_range * COLUMN_SPAN + last_column + COLUMN_OFFSET, 'right')
+        if not len(starts):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.order[start:end] for start, end in zip(starts, ends)])
+
+    # (indices, distances in metres) of the points within radius_m, nearest first
+    def query_radius(self, lat, lon, radius_m):
+        candidates = self._candidates(lat, lon, radius_m)
+        distances = haversine_m(lat, lon, self.lat[candidates], self.lon[candidates])
+        keep = distances <= radius_m
+        candidates, distances = candidates[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return candidates[order], distances[order]
+
+    # (indices, distances in metres) of the k nearest points, nearest first
+    def query_nearest(self, lat, lon, k):
+        k = min(k, len(self))
+        radius_m = self.cell_deg * KM_PER_DEGREE * 1000
+        while True:
+            indices, distances = self.query_radius(lat, lon, radius_m)
+            # Every point within radius_m is found, so once there are k of them they are the k nearest
+            if len(indices) >= k or radius_m > np.pi * EARTH_RADIUS_M:
+                return indices[:k], distances[:k]
+            radius_m *= 2
+
+    # Records within radius_m of a point, nearest first, each with its distance_m
+    def within(self, lat, lon, radius_m):
+        indices, distances = self.query_radius(lat, lon, radius_m)
+        return [{**self.records[index], 'distance_m': round(float(distance), 1)}
+                for index, distance in zip(indices, distances)]
+
+    # The k records nearest to a point, each with its distance_m
+    def nearest(self, lat, lon, k=10):
+        indices, distances = self.query_nearest(lat, lon, k)
+        return [{**self.records[index], 'distance_m': round(float(distance), 1)}
+                for index, distance in zip(indices, distances)]
+
+
+# Lower-case a name and keep only letters, digits and single spaces
+def normalize_name(name):
+    return ' '.join(re.sub(r'[^\w\s]', ' ', str(name).lower()).split())
+
+
+# True when two normalized names are the same place spelled alike ("Gate 1" and "Gate 2" are not)
+def similar_names(first, second, min_similarity=NAME_SIMILARITY):
+    if first == second:
+        return True
+    if not first or not second or re.findall(r'\d+', first) != re.findall(r'\d+', second):
+        return False
+    return difflib.SequenceMatcher(None, first, second).ratio() >= min_similarity
+
+
+def dedupe_attractions(attractions, radius_m=DEDUP_RADIUS_M, min_similarity=NAME_SIMILARITY):
+    """
+    Merge records that lie within radius_m of each other and have similar
+    names (e.g. a temple mapped as both a node and a way). Points are
+    bucketed into cells of radius_m, so only pairs in the same or adjacent
+    cells are compared: O(n log n) for the sort plus work proportional to
+    local density, instead of all n² pairs. Near-duplicate groups are
+    joined transitively; the first record of each group is kept, in input
+    order.
+    """
+    attractions = list(attractions)
+    if not attractions:
+        return []
+    index = AttractionIndex(attractions, cell_km=radius_m / 1000)
+    names = [normalize_name(record['name']) for record in attractions]
+    parent = list(range(len(attractions)))
+
+    def find(item):
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    # Members of each occupied cell
+    cell_keys = index.sorted_keys
+    boundaries = np.flatnonzero(np.diff(cell_keys)) + 1
+    cells = dict(zip(cell_keys[np.concatenate(([0], boundaries))].tolist(),
+                     np.split(index.order, boundaries)))
+
+    # Compare each cell with itself and the four neighbours "after" it, so every adjacent pair is seen once
+    neighbour_offsets = [0, 1, COLUMN_SPAN - 1, COLUMN_SPAN, COLUMN_SPAN + 1]
+    for key, members in cells.items():
+        for offset in neighbour_offsets:
+            others = cells.get(key + offset)
+            if others is None:
+                continue
+            distances = haversine_m(index.lat[members][:, None], index.lon[members][:, None],
+                                    index.lat[others][None, :], index.lon[others][None, :])
+            close = distances <= radius_m
+            if offset == 0:
+                close = np.triu(close, k=1)
+            for first, second in zip(*np.nonzero(close)):
+                first, second = int(members[first]), int(others[second])
+                if similar_names(names[first], names[second], min_similarity):
+                    root_first, root_second = find(first), find(second)
+                    if root_first != root_second:
+                        parent[max(root_first, root_second)] = min(root_first, root_second)
+
+    return [record for position, record in enumerate(attractions) if find(position) == position]
@@ -0,0 +1,191 @@
+# Offline attraction source: reads an OpenStreetMap extract (.osm, .osm.gz, .osm.bz2, .osm.pbf) instead of Overpass
+import re            # For the Overpass-style tag conditions
+import bz2           # For compressed .osm extracts
+import gzip          # For compressed .osm extracts
+from array import array  # Compact node coordinate buffers
+import xml.etree.ElementTree as ET  # Streaming XML parser
+import numpy as np   # For the node coordinate store
+
+try:
+    import osmium    # pyosmium, needed for .osm.pbf extracts (optional)
+except ImportError:
+    osmium = None
+
+
+NODE_CHUNK = 1_000_000        # Node coordinates buffered before they are packed into arrays
+
+
+# Build a tag predicate from (key, Overpass condition) filters such as ('leisure', '="park"')
+def tag_matcher(filters):
+    """
+    '~"a|b"' is an unanchored regular expression and '="v"' an exact value,
+    as in Overpass QL. The predicate is true when any filter matches.
+    """
+    tests = []
+    for key, condition in filters:
+        operator, value = condition[0], condition[1:].strip('"')
+        if operator == '~':
+            pattern = re.compile(value)
+            tests.append(lambda tags, key=key, pattern=pattern: key in tags and pattern.search(tags[key]) is not None)
+        else:
+            tests.append(lambda tags, key=key, value=value: tags.get(key) == value)
+    return lambda tags: any(test(tags) for test in tests)
+
+
+class NodeCoordinates:
+    """
+    Coordinates of the nodes read so far, for way centres. Nodes are
+    buffered, packed into int64/float64 chunks (24 bytes per node) and
+    merged into one sorted array at the first lookup, which is a binary
+    search. With keep (a sorted int64 array of node ids) each chunk is
+    filtered while it is packed, so only those nodes stay in memory.
+    """
+
+    def __init__(self, keep=None):
+        self.keep = keep
+        self.buffer_ids, self.buffer_lat, self.buffer_lon = array('q'), array('d'), array('d')
+        self.chunks = []
+        self.ids = np.empty(0, dtype=np.int64)
+        self.lat = np.empty(0, dtype=np.float64)
+        self.lon = np.empty(0, dtype=np.float64)
+
+    def add(self, node_id, lat, lon):
+        self.buffer_ids.append(node_id)
+        self.buffer_lat.append(lat)
+        self.buffer_lon.append(lon)
+        if len(self.buffer_ids) >= NODE_CHUNK:
+            self.pack()
+
+    # Move the buffer into a NumPy chunk, dropping nodes outside keep
+    def pack(self):
+        if self.buffer_ids:
+            chunk = (np.frombuffer(self.buffer_ids, dtype=np.int64), np.frombuffer(self.buffer_lat),
+                     np.frombuffer(self.buffer_lon))
+            if self.keep is not None:
+                kept = np.isin(chunk[0], self.keep, assume_unique=True)
+                chunk = tuple(values[kept] for values in chunk)
+            self.chunks.append(chunk)
+            self.buffer_ids, self.buffer_lat, self.buffer_lon = array('q'), array('d'), array('d')
+
+    # Merge pending chunks into the sorted arrays
+    def merge(self):
+        self.pack()
+        if not self.chunks:
+            return
+        ids = np.concatenate([self.ids] + [chunk[0] for chunk in self.chunks])
+        lat = np.concatenate([self.lat] + [chunk[1] for chunk in self.chunks])
+        lon = np.concatenate([self.lon] + [chunk[2] for chunk in self.chunks])
+        self.chunks = []
+        order = np.argsort(ids, kind='stable')  # Extracts are sorted by id, so this is nearly free
+        self.ids, self.lat, self.lon = ids[order], lat[order], lon[order]
+
+    # Centre of the bounding box of the known nodes (like Overpass "out center"), or None
+    def center(self, node_ids):
+        self.merge()
+        if not len(self.ids):
+            return None
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.ids, node_ids), len(self.ids) - 1)
+        found = positions[self.ids[positions] == node_ids]
+        if not len(found):
+            return None  # Way clipped away by the extract boundary
+        lat, lon = self.lat[found], self.lon[found]
+        return {'lat': float(lat.min() + lat.max()) / 2, 'lon': float(lon.min() + lon.max()) / 2}
+
+
+# Open a plain, gzip or bzip2 .osm file
+def open_osm_xml(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    return open(path, 'rb')
+
+
+# (element, tags, node refs) for each node, way and relation of an OSM XML extract
+def iter_osm_xml_elements(path):
+    """
+    One pass with iterparse. Each element is cleared once the caller moves
+    on, so memory does not grow with the extract.
+    """
+    with open_osm_xml(path) as handle:
+        context = ET.iterparse(handle, events=('start', 'end'))
+        _, root = next(context)
+        tags, node_refs = {}, []
+        for event, element in context:
+            if event == 'start':
+                if element.tag in ('node', 'way', 'relation'):
+                    tags, node_refs = {}, []
+                continue
+            if element.tag == 'tag':
+                tags[element.get('k')] = element.get('v')
+            elif element.tag == 'nd':
+                node_refs.append(int(element.get('ref')))
+            elif element.tag in ('node', 'way', 'relation'):
+                yield element, tags, node_refs
+                root.clear()  # Drop the finished element and its children
+
+
+# Sorted ids of the nodes referenced by matching ways
+def matching_way_refs(path, matches):
+    refs = array('q')
+    for element, tags, node_refs in iter_osm_xml_elements(path):
+        if element.tag == 'way' and tags and matches(tags):
+            refs.extend(node_refs)
+    return np.unique(np.frombuffer(refs, dtype=np.int64))
+
+
+# Matching elements of an OSM XML extract, in Overpass JSON shape
+def iter_osm_xml(path, matches):
+    """
+    Two passes. Ways come after the nodes they reference, so the first
+    pass collects the node ids of matching ways, and the second keeps only
+    those nodes' coordinates (NodeCoordinates) while it yields the matches.
+    Memory grows with the matching ways rather than the extract, at the
+    cost of parsing the file twice; pyosmium reads .osm.pbf in one pass.
+    """
+    coordinates = NodeCoordinates(keep=matching_way_refs(path, matches))
+    for element, tags, node_refs in iter_osm_xml_elements(path):
+        if element.tag == 'node':
+            lat, lon = float(element.get('lat')), float(element.get('lon'))
+            coordinates.add(int(element.get('id')), lat, lon)
+            if tags and matches(tags):
+                yield {'type': 'node', 'id': int(element.get('id')), 'lat': lat, 'lon': lon, 'tags': tags}
+        elif element.tag == 'way' and tags and matches(tags):
+            center = coordinates.center(node_refs)
+            if center is not None:
+                yield {'type': 'way', 'id': int(element.get('id')), 'center': center, 'tags': tags}
+
+
+# Matching elements of an extract read with pyosmium (.osm.pbf and any format libosmium reads)
+def iter_osm_osmium(path, matches):
+    """
+    One pass with osmium.FileProcessor; libosmium keeps the node locations
+    and fills in the way node coordinates.
+    """
+    if osmium is None:
+        raise ImportError(".osm.pbf extracts require pyosmium (pip install osmium)")
+    for element in osmium.FileProcessor(path, osmium.osm.NODE | osmium.osm.WAY).with_locations():
+        if not len(element.tags):
+            continue
+        tags = dict(element.tags)
+        if not matches(tags):
+            continue
+        if element.is_node():
+            yield {'type': 'node', 'id': element.id, 'lat': element.location.lat, 'lon': element.location.lon,
+                   'tags': tags}
+        else:
+            locations = [node.location for node in element.nodes if node.location.valid()]
+            if locations:
+                lat = [location.lat for location in locations]
+                lon = [location.lon for location in locations]
+                yield {'type': 'way', 'id': element.id, 'tags': tags,
+                       'center': {'lat': (min(lat) + max(lat)) / 2, 'lon': (min(lon) + max(lon)) / 2}}
+
+
+# Matching elements of an extract, picking the reader from the file name
+def iter_extract_elements(path, filters):
+    matches = tag_matcher(filters)
+    if path.endswith('.pbf') or (osmium is not None and not re.search(r'\.osm(\.gz|\.bz2)?$', path)):
+        return iter_osm_osmium(path, matches)
+    return iter_osm_xml(path, matches)
@@ -0,0 +1,404 @@
+# Tests for the Task 3 streaming and offline modes (run with: python -m pytest "Task 3")
+import io            # For fake response bodies
+import os            # For fixture paths
+import sys           # For running the script
+import bz2           # For compressed extracts
+import gzip          # For compressed extracts
+import json          # For Overpass response bodies
+import re            # For the bbox of stubbed Overpass queries
+import csv           # For reading batch output
+import time          # For Nominatim pacing
+import subprocess    # For command-line checks
+from urllib.parse import parse_qs  # For cached Overpass request bodies
+import numpy as np   # For brute-force distances
+import pytest
+import requests      # For HTTP errors
+
+import Task3
+import osm_extract
+from http_cache import CachedResponse, ResponseCache
+from rate_control import RateController
+from attraction_index import AttractionIndex, dedupe_attractions, haversine_m
+
+
+TASK_FOLDER = os.path.dirname(os.path.abspath(__file__))
+EXTRACT_PATH = os.path.join(TASK_FOLDER, 'fixtures', 'surat_extract.osm')
+SURAT = (21.1702, 72.8311)
+
+OVERPASS_BODY = json.dumps({
+    'version': 0.6,
+    'elements': [
+        {'type': 'node', 'id': 1, 'lat': 21.1702, 'lon': 72.8311, 'tags': {'name': 'Science Centre', 'tourism': 'museum'}},
+        {'type': 'node', 'id': 2, 'lat': 21.19, 'lon': 72.82, 'tags': {'tourism': 'artwork'}},  # No name: skipped
+        {'type': 'way', 'id': 3, 'center': {'lat': 21.2, 'lon': 72.8}, 'tags': {'name': 'Gopi Talav', 'leisure': 'park'}},
+    ],
+}).encode('utf-8')
+
+
+class ListSink:
+    """Collects written rows in memory."""
+
+    def __init__(self):
+        self.rows = []
+
+    def write(self, rows):
+        self.rows += rows
+
+
+class StubResponse:
+    """A live streamed response whose raw body is content."""
+
+    def __init__(self, content, status_code=200):
+        self.raw = io.BytesIO(content)
+        self.status_code = status_code
+        self.closed = False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {Task3.OVERPASS_URL}")
+
+    def close(self):
+        self.closed = True
+
+
+def test_stream_attractions_writes_records(monkeypatch):
+    pytest.importorskip('ijson')
+    sink = ListSink()
+    monkeypatch.setattr(Task3.requests, 'post', lambda *args, **kwargs: StubResponse(OVERPASS_BODY))
+    assert Task3.stream_attractions(21.17, 72.83, sink, batch_size=1) == 2
+    assert [row['name'] for row in sink.rows] == ['Science Centre', 'Gopi Talav']
+    assert sink.rows[1] == {'name': 'Gopi Talav', 'type': 'park', 'latitude': 21.2, 'longitude': 72.8}
+
+
+def test_stream_attractions_reports_truncated_body(capsys, monkeypatch):
+    pytest.importorskip('ijson')
+    sink = ListSink()
+    monkeypatch.setattr(Task3.requests, 'post', lambda *args, **kwargs: StubResponse(OVERPASS_BODY[:200]))
+    assert Task3.stream_attractions(21.17, 72.83, sink) is None
+    assert 'Error parsing attractions data' in capsys.readouterr().out
+
+
+def test_stream_attractions_reports_http_error(capsys, monkeypatch):
+    pytest.importorskip('ijson')
+    monkeypatch.setattr(Task3.requests, 'post', lambda *args, **kwargs: StubResponse(b'Gateway Timeout', 504))
+    assert Task3.stream_attractions(21.17, 72.83, ListSink()) is None
+    assert '504 Error' in capsys.readouterr().out
+
+    def refuse(*args, **kwargs):
+        raise requests.exceptions.ConnectionError('connection refused')
+
+    monkeypatch.setattr(Task3.requests, 'post', refuse)
+    assert Task3.stream_attractions(21.17, 72.83, ListSink()) is None
+    assert 'connection refused' in capsys.readouterr().out
+
+
+def test_stream_attractions_closes_live_response(monkeypatch):
+    pytest.importorskip('ijson')
+    response = StubResponse(OVERPASS_BODY[:-10])
+    monkeypatch.setattr(Task3.requests, 'post', lambda *args, **kwargs: response)
+    assert Task3.stream_attractions(21.17, 72.83, ListSink()) is None
+    assert response.closed
+
+
+def test_fetch_attractions_from_extract_reads_whole_extract():
+    records = list(Task3.fetch_attractions_from_extract(EXTRACT_PATH))
+    # Unnamed, untagged-as-attraction and clipped elements and relations are skipped
+    assert [record['name'] for record in records] == [
+        'Science Centre', 'Far Fort', 'Ambika Niketan Temple', 'Sardar Smruti', 'Gopi Talav',
+    ]
+    assert records[0] == {'name': 'Science Centre', 'type': 'museum', 'latitude': 21.1702, 'longitude': 72.8311}
+    assert records[3]['type'] == 'attraction'  # tourism is preferred over historic, as for Overpass results
+    # A way is placed at the centre of its bounding box
+    assert records[4]['type'] == 'park'
+    assert records[4]['latitude'] == pytest.approx(21.202)
+    assert records[4]['longitude'] == pytest.approx(72.803)
+
+
+def test_fetch_attractions_from_extract_filters_by_radius():
+    names = [record['name'] for record in Task3.fetch_attractions_from_extract(EXTRACT_PATH, *SURAT, radius=5000)]
+    assert names == ['Science Centre', 'Ambika Niketan Temple', 'Sardar Smruti', 'Gopi Talav']
+    names = [record['name'] for record in Task3.fetch_attractions_from_extract(EXTRACT_PATH, *SURAT, radius=3000)]
+    assert names == ['Science Centre', 'Ambika Niketan Temple', 'Sardar Smruti']
+
+
+def test_fetch_attractions_from_extract_keeps_only_way_nodes(monkeypatch):
+    stores = []
+
+    class RecordingCoordinates(osm_extract.NodeCoordinates):
+        def __init__(self, keep=None):
+            super().__init__(keep)
+            stores.append(self)
+
+    monkeypatch.setattr(osm_extract, 'NodeCoordinates', RecordingCoordinates)
+    monkeypatch.setattr(osm_extract, 'NODE_CHUNK', 3)  # Filter across several packed chunks
+    records = list(Task3.fetch_attractions_from_extract(EXTRACT_PATH))
+    # Of the extract's 10 nodes, only those of Gopi Talav (the matching way that is not clipped) are kept
+    stores[0].merge()
+    assert stores[0].ids.tolist() == [10, 11, 12, 13]
+    assert records[-1]['name'] == 'Gopi Talav'
+
+
+@pytest.mark.parametrize('suffix, compress', [('.osm.gz', gzip.compress), ('.osm.bz2', bz2.compress)])
+def test_fetch_attractions_from_compressed_extract(tmp_path, suffix, compress):
+    with open(EXTRACT_PATH, 'rb') as handle:
+        path = tmp_path / f'surat_extract{suffix}'
+        path.write_bytes(compress(handle.read()))
+    assert list(Task3.fetch_attractions_from_extract(str(path))) == \
+        list(Task3.fetch_attractions_from_extract(EXTRACT_PATH))
+
+
+# Options that would be silently ignored together are rejected before anything runs
+@pytest.mark.parametrize('options', [
+    ['--dedupe', '--stream'], ['--dedupe', '--batch', 'cities.txt'], ['--tiled', '--stream'],
+    ['--tiled', '--extract', EXTRACT_PATH], ['--batch', 'cities.txt', '--stream'],
+    ['--stream', '--cache'], ['--stream', '--offline'],
+    ['--batch', 'cities.txt', '--extract', EXTRACT_PATH],
+])
+def test_conflicting_options_are_rejected(tmp_path, options):
+    command = [sys.executable, os.path.join(TASK_FOLDER, 'Task3.py')] + options
+    result = subprocess.run(command, capture_output=True, text=True, cwd=tmp_path)
+    assert result.returncode == 2
+    assert 'cannot be combined' in result.stderr
+
+
+# Elements of the stubbed Overpass server: a 7x7 grid of nodes around Surat, a node outside the
+# radius, and a large way that every tile intersects (node 50 and way 50 are different elements)
+TILED_ELEMENTS = [
+    {'type': 'node', 'id': row * 7 + column, 'lat': SURAT[0] - 0.03 + row * 0.01, 'lon': SURAT[1] - 0.03 + column * 0.01,
+     'tags': {'name': f'Point {row}-{column}', 'tourism': 'artwork'}}
+    for row in range(7) for column in range(7)
+] + [
+    {'type': 'node', 'id': 50, 'lat': SURAT[0] + 0.044, 'lon': SURAT[1] + 0.046, 'tags': {'name': 'Corner', 'leisure': 'park'}},
+    {'type': 'way', 'id': 50, 'center': {'lat': SURAT[0], 'lon': SURAT[1] + 0.001},
+     'tags': {'name': 'Tapi Riverfront', 'leisure': 'park'}},
+]
+
+
+class StubOverpass:
+    """
+    Stands in for requests.post in tiled mode. Tiles larger than
+    split_above km² answer with a runtime error remark (or raise error,
+    when set), each tile in throttle_once gets one 429 first, and every
+    other query returns the nodes inside its bbox plus way 50. status or
+    body, when set, answer every query instead.
+    """
+
+    def __init__(self, split_above=float('inf'), throttle_once=0, status=None, body=None, error=None):
+        self.split_above = split_above
+        self.throttle_once = throttle_once
+        self.status = status
+        self.body = body
+        self.error = error
+        self.tiles = []
+        self.throttled = set()
+
+    def __call__(self, url, data, timeout):
+        tile = tuple(float(value) for value in re.search(r'\((-?[\d.]+),(-?[\d.]+),(-?[\d.]+),(-?[\d.]+)\)',
+                                                         data['data']).groups())
+        self.tiles.append(tile)
+        if self.status is not None or self.body is not None:
+            return CachedResponse(url, self.status or 200, {}, self.body or b'{"elements": []}')
+        if Task3.tile_area_km2(tile) > self.split_above:
+            if self.error is not None:
+                raise self.error
+            return CachedResponse(url, 200, {}, json.dumps({'remark': 'runtime error: timed out', 'elements': []}).encode())
+        if len(self.throttled) < self.throttle_once and tile not in self.throttled:
+            self.throttled.add(tile)
+            return CachedResponse(url, 429, {}, b'Too Many Requests')
+        south, west, north, east = tile
+        elements = [element for element in TILED_ELEMENTS if element['type'] == 'way'
+                    or (south <= element['lat'] < north and west <= element['lon'] < east)]
+        return CachedResponse(url, 200, {}, json.dumps({'elements': elements}).encode())
+
+
+def fast_rate():
+    return RateController(initial_rate=1000, max_rate=1000, max_retries=2, backoff_base=0.001)
+
+
+def test_fetch_attractions_tiled_splits_requeues_and_merges(monkeypatch):
+    overpass = StubOverpass(split_above=20, throttle_once=2)
+    monkeypatch.setattr(Task3.requests, 'post', overpass)
+    records = Task3.fetch_attractions_tiled(*SURAT, radius=5000, slots=2, rate=fast_rate())
+
+    # The four 25 km² tiles are split into 16 quadrants; two of those are throttled once and retried
+    assert sum(Task3.tile_area_km2(tile) > 20 for tile in overpass.tiles) == 4
+    assert len(set(overpass.tiles)) == 4 + 16
+    assert len(overpass.tiles) == 4 + 16 + 2
+    # Way 50 comes back from every quadrant but is kept once; node 50 is outside the radius
+    names = sorted(record['name'] for record in records)
+    assert names == sorted([f'Point {row}-{column}' for row in range(7) for column in range(7)] + ['Tapi Riverfront'])
+
+
+def test_fetch_attractions_tiled_matches_single_query(monkeypatch):
+    monkeypatch.setattr(Task3.requests, 'post', StubOverpass())
+    tiled = Task3.fetch_attractions_tiled(*SURAT, radius=5000, slots=3, rate=fast_rate())
+    single = [record for record in map(Task3.element_record, TILED_ELEMENTS)
+              if Task3.haversine_m(*SURAT, record['latitude'], record['longitude']) <= 5000]
+    key = lambda record: record['name']
+    assert sorted(tiled, key=key) == sorted(single, key=key)
+
+
+def test_fetch_attractions_tiled_gives_up_client_errors_at_once(monkeypatch):
+    overpass = StubOverpass(status=400, body=b'Error: line 2: parse error')
+    monkeypatch.setattr(Task3.requests, 'post', overpass)
+    rate = fast_rate()
+    assert Task3.fetch_attractions_tiled(*SURAT, radius=5000, rate=rate) == []
+    assert len(overpass.tiles) == 4  # No splitting and no retries
+    assert rate.stats()[Task3.urlsplit(Task3.OVERPASS_URL).netloc]['failures'] == 4
+
+
+def test_fetch_attractions_tiled_retries_non_json_bodies(monkeypatch):
+    overpass = StubOverpass(body=b'<html><body>Service unavailable</body></html>')
+    monkeypatch.setattr(Task3.requests, 'post', overpass)
+    assert Task3.fetch_attractions_tiled(*SURAT, radius=5000, rate=fast_rate()) == []
+    assert len(overpass.tiles) == 4 * 3  # First try and max_retries retries per tile, no splitting
+
+
+def test_fetch_attractions_tiled_splits_read_timeouts_and_retries_connect_timeouts(monkeypatch):
+    overpass = StubOverpass(split_above=0, error=requests.exceptions.ConnectTimeout('connect timed out'))
+    monkeypatch.setattr(Task3.requests, 'post', overpass)
+    assert Task3.fetch_attractions_tiled(*SURAT, radius=5000, rate=fast_rate()) == []
+    assert len(overpass.tiles) == 4 * 3  # Retried like any connection error, never split
+    assert len(set(overpass.tiles)) == 4
+
+    # The four 25 km² tiles time out reading the response and are split; their quadrants answer
+    overpass = StubOverpass(split_above=20, error=requests.exceptions.ReadTimeout('read timed out'))
+    monkeypatch.setattr(Task3.requests, 'post', overpass)
+    records = Task3.fetch_attractions_tiled(*SURAT, radius=5000, rate=fast_rate())
+    assert len(overpass.tiles) == 4 + 16
+    assert len(records) == 7 * 7 + 1
+
+
+def test_fetch_attractions_tiled_fails_offline_misses_at_once(tmp_path, monkeypatch):
+    online = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    monkeypatch.setattr('requests.Session.send', lambda session, prepared, **kwargs: StubOverpass()(
+        prepared.url, {'data': parse_qs(prepared.body)['data'][0]}, None))
+    expected = Task3.fetch_attractions_tiled(*SURAT, radius=5000, cache=online, rate=fast_rate())
+    online.close()
+    assert expected
+
+    def refuse(*args, **kwargs):
+        raise AssertionError("offline mode touched the network")
+
+    monkeypatch.setattr('requests.Session.send', refuse)
+    offline = ResponseCache(str(tmp_path / 'cache.sqlite'), offline=True)
+    replayed = Task3.fetch_attractions_tiled(*SURAT, radius=5000, cache=offline, rate=fast_rate())
+    key = lambda record: record['name']  # Tiles finish in any order
+    assert sorted(replayed, key=key) == sorted(expected, key=key)
+
+    # A region that was never cached: every tile fails without a retry or a backoff sleep
+    rate = RateController(initial_rate=1000, max_rate=1000, max_retries=4, backoff_base=30)
+    start = time.monotonic()
+    assert Task3.fetch_attractions_tiled(21.5, 73.0, radius=5000, cache=offline, rate=rate) == []
+    assert time.monotonic() - start < 5
+    stats = rate.stats()[Task3.urlsplit(Task3.OVERPASS_URL).netloc]
+    assert stats['retries'] == 0 and stats['failures'] == 4
+    offline.close()
+
+
+CITY_COORDINATES = {'Surat': (21.17, 72.83), 'Ahmedabad': (23.02, 72.57), 'Vadodara': (22.31, 73.18),
+                    'Rajkot': (22.30, 70.80)}
+
+
+def test_harvest_cities_uses_geocode_store_and_paces_misses(tmp_path, monkeypatch):
+    geocodes = Task3.GeocodeCache(str(tmp_path / 'geocodes.sqlite'))
+    geocodes.store('Surat', *CITY_COORDINATES['Surat'])
+    geocodes.store('ahmedabad', *CITY_COORDINATES['Ahmedabad'])
+    lookups = []
+
+    def get_city_coordinates(city_name, cache=None):
+        lookups.append((city_name, time.monotonic()))
+        return CITY_COORDINATES.get(city_name, (None, None))
+
+    # Two attractions per city, named after the city's latitude
+    def fetch_attractions_around(lat, lon, *args):
+        return [{'name': f'{lat} {kind}', 'type': kind, 'latitude': lat, 'longitude': lon} for kind in ('museum', 'park')]
+
+    monkeypatch.setattr(Task3, 'get_city_coordinates', get_city_coordinates)
+    monkeypatch.setattr(Task3, 'fetch_attractions_around', fetch_attractions_around)
+    output_path = tmp_path / 'cities.csv'
+    try:
+        counts = Task3.harvest_cities(['Surat', 'Vadodara', 'Ahmedabad', 'Nowhere', 'Rajkot'], str(output_path), geocodes)
+        # Only misses reach Nominatim, no faster than NOMINATIM_RATE
+        assert [city for city, _ in lookups] == ['Vadodara', 'Nowhere', 'Rajkot']
+        gaps = [later - earlier for (_, earlier), (_, later) in zip(lookups, lookups[1:])]
+        assert min(gaps) >= 0.95 / Task3.NOMINATIM_RATE
+        # Resolved misses are stored for the next run
+        assert geocodes.lookup(' VADODARA') == CITY_COORDINATES['Vadodara']
+        assert geocodes.lookup('Nowhere') is None
+    finally:
+        geocodes.close()
+
+    assert counts == {'Surat': 2, 'Vadodara': 2, 'Ahmedabad': 2, 'Nowhere': 0, 'Rajkot': 2}
+    with open(output_path, newline='', encoding='utf-8') as handle:
+        rows = list(csv.DictReader(handle))
+    assert list(rows[0]) == Task3.BATCH_FIELDS
+    assert len(rows) == 8
+    for row in rows:
+        assert float(row['latitude']) == CITY_COORDINATES[row['city']][0]
+
+
+# Random attraction records around Surat, with some clustered on one spot
+def random_attractions(count, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = np.concatenate([rng.uniform(20.9, 21.4, count - 50), np.full(50, 21.2)])
+    lon = np.concatenate([rng.uniform(72.6, 73.1, count - 50), rng.uniform(72.8, 72.8001, 50)])
+    return [{'name': f'Place {idx}', 'type': 'artwork', 'latitude': float(lat[idx]), 'longitude': float(lon[idx])}
+            for idx in range(count)]
+
+
+@pytest.mark.parametrize('cell_km', [0.2, 1.0, 5.0])
+def test_attraction_index_matches_brute_force(cell_km):
+    records = random_attractions(3000)
+    index = AttractionIndex(records, cell_km=cell_km)
+    lat = np.array([record['latitude'] for record in records])
+    lon = np.array([record['longitude'] for record in records])
+    rng = np.random.default_rng(1)
+    for query_lat, query_lon in zip(rng.uniform(20.8, 21.5, 20), rng.uniform(72.5, 73.2, 20)):
+        distances = haversine_m(query_lat, query_lon, lat, lon)
+        for radius_m in (300, 2000, 15000):
+            indices, found = index.query_radius(query_lat, query_lon, radius_m)
+            assert sorted(indices.tolist()) == np.flatnonzero(distances <= radius_m).tolist()
+            assert np.all(np.diff(found) >= 0)  # Nearest first
+        for k in (1, 10, 200):
+            indices, found = index.query_nearest(query_lat, query_lon, k)
+            np.testing.assert_allclose(found, np.sort(distances)[:k])
+            np.testing.assert_allclose(distances[indices], found)
+
+
+def test_attraction_index_within_and_nearest_records():
+    records = random_attractions(500)
+    index = AttractionIndex(records)
+    nearest = index.nearest(21.2, 72.8, k=3)
+    assert len(nearest) == 3 and all(record['distance_m'] < 20 for record in nearest)
+    assert {key: nearest[0][key] for key in records[0]} in records
+    assert all(record['distance_m'] <= 1000 for record in index.within(21.2, 72.8, 1000))
+
+
+def test_attraction_index_empty():
+    index = AttractionIndex([])
+    assert len(index) == 0
+    assert index.within(21.17, 72.83, 5000) == []
+    assert index.nearest(21.17, 72.83, k=5) == []
+    assert dedupe_attractions([]) == []
+
+
+def test_dedupe_attractions_merges_node_and_way():
+    records = [
+        {'name': 'Ambika Niketan Temple', 'type': 'place_of_worship', 'latitude': 21.1650, 'longitude': 72.8100},
+        {'name': 'Science Centre', 'type': 'museum', 'latitude': 21.1702, 'longitude': 72.8311},
+        # The same temple mapped as a way: its centre is ~60 m away and the name is spelled differently
+        {'name': 'Ambika Niketan temple.', 'type': 'place_of_worship', 'latitude': 21.1655, 'longitude': 72.8102},
+        # Same name, but 2 km away: a different place
+        {'name': 'Ambika Niketan Temple', 'type': 'place_of_worship', 'latitude': 21.1830, 'longitude': 72.8100},
+    ]
+    assert dedupe_attractions(records) == [records[0], records[1], records[3]]
+
+
+def test_dedupe_attractions_keeps_numbered_places_apart():
+    records = [
+        {'name': 'Gate 1', 'type': 'attraction', 'latitude': 21.2000, 'longitude': 72.8000},
+        {'name': 'Gate 2', 'type': 'attraction', 'latitude': 21.2003, 'longitude': 72.8003},
+        {'name': 'Gate 1', 'type': 'attraction', 'latitude': 21.2001, 'longitude': 72.8001},
+    ]
+    assert dedupe_attractions(records) == records[:2]
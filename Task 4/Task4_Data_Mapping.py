@@ -1,201 +1,1132 @@
-
 # Import required libraries
 import pandas as pd  # For data manipulation
+import numpy as np   # For vectorized rule selection
 import re            # For regular expressions
 import os            # For file and directory operations
+import argparse      # For command-line options
+import time          # For shard timing
+import hashlib       # For the rule-set version
+import sqlite3       # For the persistent mapping cache
+import json          # For rule statistics reports
+from collections import deque  # For ordered in-flight shards
+from concurrent.futures import ProcessPoolExecutor, as_completed  # For multi-process mapping
+from openpyxl import Workbook, load_workbook  # For streaming Excel read/write
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC  # Cell types pd.read_excel converts
+
+
+# Rows per chunk when streaming large position files (see --chunk-size)
+DEFAULT_CHUNK_SIZE = 50000
+
+
+# Ordered mapping rules: (Category, Sub-Category, conditions)
+# A rule fires when every condition matches; the first rule that fires wins.
+# Each condition is {field: [terms]} and matches if any term is a substring
+# of any listed field ('keyword' or 'url', both lower-cased).
+LOCATION_TERMS = ['near me', 'nearby', 'close to', 'around me', 'in my area']
+FOOD_TERMS = ['restaurant', 'food', 'pizza', 'burger', 'biryani', 'chinese', 'italian', 'cafe', 'dining']
+BIGBASKET = {'url': ['bigbasket'], 'keyword': ['big basket']}
+DELIVERY = {'keyword': ['delivery', 'order']}
+
+MAPPING_RULES = [
+    # Fresh produce (most specific product categories first)
+    ('E-commerce', 'Fresh Produce', [{'keyword': ['vegetable', 'fruit', 'greens', 'potato', 'onion', 'tomato', 'broccoli', 'carrot', 'cucumber', 'spinach', 'ash gourd']}]),
+    ('E-commerce', 'Fresh Meat & Seafood', [{'keyword': ['fish', 'meat', 'poultry', 'seafood', 'salmon', 'chicken', 'mutton', 'rohu']}]),
+    ('E-commerce', 'Fresh Flowers & Plants', [{'keyword': ['flower', 'bouquet', 'plants', 'jasmine', 'rose', 'lily']}]),
+    ('E-commerce', 'Dairy Products', [{'keyword': ['milk', 'dairy', 'cheese', 'butter', 'yogurt', 'curd']}]),
+    ('E-commerce', 'Bakery Items', [{'keyword': ['bread', 'bakery', 'cake', 'pastry', 'cookie', 'ice cream', 'dessert']}]),
+    ('E-commerce', 'Snacks & Sweets', [{'keyword': ['snack', 'chips', 'chocolate', 'cookies', 'namkeen']}]),
+    ('E-commerce', 'Grains & Cereals', [{'keyword': ['rice', 'wheat', 'grain', 'flour', 'atta', 'maida']}]),
+    ('E-commerce', 'Cooking Essentials', [{'keyword': ['oil', 'ghee', 'butter', 'sugar', 'salt', 'spice', 'masala']}]),
+    ('E-commerce', 'Beverages', [{'keyword': ['tea', 'coffee', 'juice', 'soda', 'drink', 'water']}]),
+    ('E-commerce', 'Household Items', [{'keyword': ['cleaning', 'detergent', 'soap', 'stationery', 'pen', 'paper']}]),
+
+    # Location-based searches (e.g., "near me")
+    ('Food & Dining', 'Local Restaurants', [{'keyword': LOCATION_TERMS}, {'keyword': ['restaurant', 'food', 'swiggy']}]),
+    ('E-commerce', 'Local Grocery Stores', [{'keyword': LOCATION_TERMS}, {'keyword': ['grocery', 'vegetable', 'fruit', 'bigbasket', 'supermarket', 'store', 'stationery', 'chicken']}]),
+    ('Local Services', 'Nearby Services', [{'keyword': LOCATION_TERMS}]),
+
+    # Swiggy specific mappings (food delivery)
+    ('E-commerce', 'Instant Grocery', [{'url': ['swiggy']}, {'url': ['instamart'], 'keyword': ['instamart']}]),
+    ('Business Services', 'Food Delivery Partnership', [{'url': ['swiggy']}, {'url': ['partner'], 'keyword': ['partner']}]),
+    ('Customer Service', 'Food Delivery Support', [{'url': ['swiggy']}, {'keyword': ['customer care', 'support', 'help', 'contact']}]),
+    ('Food & Dining', 'Food Delivery', [{'url': ['swiggy']}, {'keyword': ['restaurant', 'food', 'delivery', 'order']}]),
+    ('Food & Dining', 'Restaurant Discovery', [{'url': ['swiggy']}]),
+
+    # Food/restaurant related keywords
+    ('Food & Dining', 'Restaurants', [{'keyword': FOOD_TERMS}]),
+    ('Food & Dining', 'Vegetarian Restaurants', [{'keyword': ['vegetarian', 'veg', 'vegan']}]),
+    ('Food & Dining', 'Non-Vegetarian Restaurants', [{'keyword': ['non veg', 'chicken', 'meat']}]),
+    ('Food & Dining', 'Bars & Pubs', [{'keyword': ['bar', 'pub']}]),
+
+    # BigBasket specific mappings (grocery/e-commerce)
+    ('Business Services', 'E-commerce Partnership', [BIGBASKET, {'keyword': ['partner', 'seller', 'vendor', 'business']}]),
+    ('Customer Service', 'E-commerce Support', [BIGBASKET, {'keyword': ['care', 'support', 'help', 'contact']}]),
+    ('E-commerce', 'Grocery Delivery', [BIGBASKET]),
+
+    # Delivery services
+    ('Food & Dining', 'Food Delivery', [DELIVERY, {'keyword': ['food', 'restaurant', 'swiggy']}]),
+    ('E-commerce', 'Grocery Delivery', [DELIVERY, {'keyword': ['grocery', 'bigbasket']}]),
+    ('Delivery Services', 'General Delivery', [DELIVERY]),
+
+    # Grocery/shopping related general
+    ('E-commerce', 'Grocery Shopping', [{'keyword': ['grocery', 'supermarket', 'store', 'shopping']}]),
+
+    # URL-based categorization for specific domains
+    ('Food & Dining', 'Online Food Ordering', [{'url': ['swiggy.com']}]),
+    ('E-commerce', 'Online Grocery', [{'url': ['bigbasket.com']}]),
+
+    # Generic fallbacks for online shopping
+    ('E-commerce', 'Online Shopping', [{'keyword': ['online', 'shopping', 'buy', 'purchase']}]),
+]
+
+# Default categories based on keyword intent when no rule fires
+SHORT_QUERY_FALLBACK = ('Brand Search', 'Direct Navigation')  # Brand or short queries (<= 2 words)
+LONG_QUERY_FALLBACK = ('General Search', 'Information Search')
+
+
+# Build a regex matching the longest of `terms` at a position. The terms are
+# factored into a trie (shared prefixes become nested groups) so the regex
+# engine only follows the single branch for the next character.
+def trie_pattern(terms):
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = {}  # End-of-term marker
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy optional group: prefer the longer term, fall back to this one
+        return f'(?:{pattern})?' if '' in node else pattern
+
+    return build(trie)
+
+
+# OR together an iterable of bitmasks
+def sum_masks(masks):
+    total = 0
+    for mask in masks:
+        total |= mask
+    return total
+
+
+# Compile MAPPING_RULES once into a multi-pattern matcher.
+# Every distinct condition gets one bit. The keyword is scanned by a single
+# trie regex that reports the longest term starting at every position; because
+# any other term starting there must be a prefix of it, each term's mask also
+# carries the bits of its prefix terms. A row is thus reduced to one condition
+# bitmask, and the first rule whose bits are all set wins. Winners are cached
+# per bitmask since only a handful of distinct masks occur in practice.
+def compile_rules(rules):
+    condition_bits = {}
+    distinct_conditions = []  # (bit, condition) pairs
+    term_masks = {'keyword': {}, 'url': {}}
+    rule_masks = []
+
+    for category, subcategory, conditions in rules:
+        rule_mask = 0
+        for condition in conditions:
+            key = tuple(sorted((field, tuple(terms)) for field, terms in condition.items()))
+            if key not in condition_bits:
+                condition_bits[key] = 1 << len(condition_bits)
+                distinct_conditions.append((condition_bits[key], condition))
+                for field, terms in condition.items():
+                    for term in terms:
+                        term_masks[field][term] = term_masks[field].get(term, 0) | condition_bits[key]
+            rule_mask |= condition_bits[key]
+        rule_masks.append((rule_mask, category, subcategory))
+
+    # Fold prefix terms into each keyword term's mask (e.g. 'cookies' implies 'cookie')
+    keyword_masks = term_masks['keyword']
+    term_masks['keyword'] = {
+        term: sum_masks(mask for other, mask in keyword_masks.items() if term.startswith(other))
+        for term in keyword_masks
+    }
+
+    return {
+        'keyword_scanner': re.compile(f'(?=({trie_pattern(keyword_masks)}))').finditer,
+        'term_masks': term_masks,
+        'conditions': distinct_conditions,
+        'rule_masks': rule_masks,
+        'winners': {},  # condition bitmask -> index of first matching rule (or None)
+    }
+
+
+COMPILED_RULES = compile_rules(MAPPING_RULES)
+
+
+# Reduce a lower-cased keyword/URL pair to the bitmask of conditions it satisfies
+def condition_mask(keyword_lower, url_lower, compiled=COMPILED_RULES):
+    mask = 0
+    keyword_masks = compiled['term_masks']['keyword']
+    for match in compiled['keyword_scanner'](keyword_lower):
+        mask |= keyword_masks[match.group(1)]
+    # URLs are long but only have a few terms, so plain substring checks
+    # beat scanning every character position
+    for term, term_mask in compiled['term_masks']['url'].items():
+        if term in url_lower:
+            mask |= term_mask
+    return mask
+
+
+# Find the index of the first rule fully satisfied by a condition bitmask
+def first_matching_rule(mask, compiled=COMPILED_RULES):
+    winners = compiled['winners']
+    if mask not in winners:
+        winners[mask] = next(
+            (idx for idx, (rule_mask, _, _) in enumerate(compiled['rule_masks']) if rule_mask & mask == rule_mask),
+            None,
+        )
+    return winners[mask]
 
 
 # Map a keyword and URL to a Category and Sub-Category based on business rules
 def map_category_subcategory(keyword, url):
     """
     Map keyword and URL to Category and Sub-Category based on guidelines.
-    Uses keyword analysis, URL patterns, and business logic.
+    Uses the compiled MAPPING_RULES (first match wins), falling back to a
+    Brand/General Search split on query length.
     """
     keyword_lower = keyword.lower() if keyword else ""
     url_lower = url.lower() if url else ""
 
-    # Check for specific product categories (most specific)
-    # Fresh produce
-    if any(fresh in keyword_lower for fresh in ['vegetable', 'fruit', 'greens', 'potato', 'onion', 'tomato', 'broccoli', 'carrot', 'cucumber', 'spinach', 'ash gourd']):
-        return 'E-commerce', 'Fresh Produce'
-    elif any(fresh in keyword_lower for fresh in ['fish', 'meat', 'poultry', 'seafood', 'salmon', 'chicken', 'mutton', 'rohu']):
-        return 'E-commerce', 'Fresh Meat & Seafood'
-    elif any(fresh in keyword_lower for fresh in ['flower', 'bouquet', 'plants', 'jasmine', 'rose', 'lily']):
-        return 'E-commerce', 'Fresh Flowers & Plants'
+    rule_idx = first_matching_rule(condition_mask(keyword_lower, url_lower))
+    if rule_idx is not None:
+        _, category, subcategory = COMPILED_RULES['rule_masks'][rule_idx]
+        return category, subcategory
 
-    # Dairy products
-    if any(dairy in keyword_lower for dairy in ['milk', 'dairy', 'cheese', 'butter', 'yogurt', 'curd']):
-        return 'E-commerce', 'Dairy Products'
+    if len(keyword_lower.split()) <= 2:
+        return SHORT_QUERY_FALLBACK
+    return LONG_QUERY_FALLBACK
 
-    # Bakery items
-    if any(bakery in keyword_lower for bakery in ['bread', 'bakery', 'cake', 'pastry', 'cookie', 'ice cream', 'dessert']):
-        return 'E-commerce', 'Bakery Items'
 
-    # Snacks
-    if any(snack in keyword_lower for snack in ['snack', 'chips', 'chocolate', 'cookies', 'namkeen']):
-        return 'E-commerce', 'Snacks & Sweets'
+# Convert a column to lower-cased text the same way str(row.get(...)) does
+def as_lower_text(column):
+    if pd.api.types.is_string_dtype(column.dtype) and column.dtype != object:
+        # Missing cells become str() of the dtype's missing value ('<NA>' for pd.NA, 'nan' for NaN)
+        text = column.fillna(str(column.dtype.na_value))
+    else:
+        text = column.map(str)
+    return text.str.lower().reset_index(drop=True)
 
-    # Grains and staples
-    if any(grain in keyword_lower for grain in ['rice', 'wheat', 'grain', 'flour', 'atta', 'maida']):
-        return 'E-commerce', 'Grains & Cereals'
 
-    # Cooking essentials
-    if any(essential in keyword_lower for essential in ['oil', 'ghee', 'butter', 'sugar', 'salt', 'spice', 'masala']):
-        return 'E-commerce', 'Cooking Essentials'
+# Reduce lower-cased URLs to the bitmask of URL conditions they satisfy.
+# The rules only test URLs for a few substrings, so two URLs with the same
+# class always map the same way.
+def url_classes(urls_lower):
+    url_class = np.zeros(len(urls_lower), dtype=np.int64)
+    for term, term_mask in COMPILED_RULES['term_masks']['url'].items():
+        url_class[urls_lower.str.contains(term, regex=False).to_numpy(dtype=bool)] |= term_mask
+    return url_class
 
-    # Beverages
-    if any(beverage in keyword_lower for beverage in ['tea', 'coffee', 'juice', 'soda', 'drink', 'water']):
-        return 'E-commerce', 'Beverages'
 
-    # Household items
-    if any(household in keyword_lower for household in ['cleaning', 'detergent', 'soap', 'stationery', 'pen', 'paper']):
-        return 'E-commerce', 'Household Items'
+# Version of the rule set; cached mappings from any other version are discarded
+RULES_VERSION = hashlib.sha1(
+    repr((MAPPING_RULES, SHORT_QUERY_FALLBACK, LONG_QUERY_FALLBACK)).encode('utf-8')
+).hexdigest()[:16]
 
-    # Location-based searches (e.g., "near me")
-    location_keywords = ['near me', 'nearby', 'close to', 'around me', 'in my area']
-    if any(loc in keyword_lower for loc in location_keywords):
-        if any(word in keyword_lower for word in ['restaurant', 'food', 'swiggy']):
-            return 'Food & Dining', 'Local Restaurants'
-        elif any(word in keyword_lower for word in ['grocery', 'vegetable', 'fruit', 'bigbasket', 'supermarket', 'store', 'stationery', 'chicken']):
-            return 'E-commerce', 'Local Grocery Stores'
-        else:
-            return 'Local Services', 'Nearby Services'
+# Rule numbers used by the batch path: MAPPING_RULES positions, then the
+# short/long query fallbacks. Category tables are indexed by rule number.
+SHORT_QUERY_RULE = len(MAPPING_RULES)
+LONG_QUERY_RULE = len(MAPPING_RULES) + 1
+RULE_CATEGORIES = np.array([category for category, _, _ in MAPPING_RULES]
+                           + [SHORT_QUERY_FALLBACK[0], LONG_QUERY_FALLBACK[0]], dtype=object)
+RULE_SUBCATEGORIES = np.array([subcategory for _, subcategory, _ in MAPPING_RULES]
+                              + [SHORT_QUERY_FALLBACK[1], LONG_QUERY_FALLBACK[1]], dtype=object)
 
-    # Swiggy specific mappings (food delivery)
-    if 'swiggy' in url_lower:
-        if 'instamart' in url_lower or 'instamart' in keyword_lower:
-            return 'E-commerce', 'Instant Grocery'
-        elif 'partner' in url_lower or 'partner' in keyword_lower:
-            return 'Business Services', 'Food Delivery Partnership'
-        elif any(word in keyword_lower for word in ['customer care', 'support', 'help', 'contact']):
-            return 'Customer Service', 'Food Delivery Support'
-        elif any(word in keyword_lower for word in ['restaurant', 'food', 'delivery', 'order']):
-            return 'Food & Dining', 'Food Delivery'
-        else:
-            return 'Food & Dining', 'Restaurant Discovery'
 
-    # Food/restaurant related keywords
-    food_keywords = ['restaurant', 'food', 'pizza', 'burger', 'biryani', 'chinese', 'italian', 'cafe', 'dining']
-    if any(food in keyword_lower for food in food_keywords):
-        return 'Food & Dining', 'Restaurants'
-
-    # Specific food types
-    if any(food in keyword_lower for food in ['vegetarian', 'veg', 'vegan']):
-        return 'Food & Dining', 'Vegetarian Restaurants'
-    elif any(food in keyword_lower for food in ['non veg', 'chicken', 'meat']):
-        return 'Food & Dining', 'Non-Vegetarian Restaurants'
-    elif 'bar' in keyword_lower or 'pub' in keyword_lower:
-        return 'Food & Dining', 'Bars & Pubs'
+class RuleStats:
+    """
+    Optional instrumentation for the batch classifier: rows matched per rule
+    (including the two fallbacks), time spent evaluating each rule and time per
+    mapping stage. Pass an instance as `stats`; with None nothing is recorded.
+    """
 
-    # BigBasket specific mappings (grocery/e-commerce)
-    if 'bigbasket' in url_lower or 'big basket' in keyword_lower:
-        if any(word in keyword_lower for word in ['partner', 'seller', 'vendor', 'business']):
-            return 'Business Services', 'E-commerce Partnership'
-        elif any(word in keyword_lower for word in ['care', 'support', 'help', 'contact']):
-            return 'Customer Service', 'E-commerce Support'
-        else:
-            return 'E-commerce', 'Grocery Delivery'
+    def __init__(self):
+        self.rule_hits = np.zeros(len(RULE_CATEGORIES), dtype=np.int64)
+        self.rule_seconds = np.zeros(len(MAPPING_RULES), dtype=np.float64)
+        self.stage_seconds = {}
+        self.rows = 0
+        self.reused_rows = 0
+        self.unique_keys = 0
+        self.evaluated_keys = 0
+        self.lap_start = time.perf_counter()
 
-    # Delivery services
-    if 'delivery' in keyword_lower or 'order' in keyword_lower:
-        if any(word in keyword_lower for word in ['food', 'restaurant', 'swiggy']):
-            return 'Food & Dining', 'Food Delivery'
-        elif any(word in keyword_lower for word in ['grocery', 'bigbasket']):
-            return 'E-commerce', 'Grocery Delivery'
-        else:
-            return 'Delivery Services', 'General Delivery'
+    # Add the time since the previous lap to a stage
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + now - self.lap_start
+        self.lap_start = now
 
-    # Grocery/shopping related general
-    if any(grocery in keyword_lower for grocery in ['grocery', 'supermarket', 'store', 'shopping']):
-        return 'E-commerce', 'Grocery Shopping'
+    # Count the rule number chosen for every row; reused rows kept the rule
+    # of a previous incremental run and were not evaluated again
+    def record_rows(self, rule_numbers, reused=False):
+        self.rows += len(rule_numbers)
+        if reused:
+            self.reused_rows += len(rule_numbers)
+        self.rule_hits += np.bincount(rule_numbers, minlength=len(self.rule_hits))
 
-    # URL-based categorization for specific domains
-    if 'swiggy.com' in url_lower:
-        return 'Food & Dining', 'Online Food Ordering'
-    elif 'bigbasket.com' in url_lower:
-        return 'E-commerce', 'Online Grocery'
+    # Fold in stats collected elsewhere (e.g. by a pool worker)
+    def merge(self, other):
+        self.rule_hits += other.rule_hits
+        self.rule_seconds += other.rule_seconds
+        for stage, seconds in other.stage_seconds.items():
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+        self.rows += other.rows
+        self.reused_rows += other.reused_rows
+        self.unique_keys += other.unique_keys
+        self.evaluated_keys += other.evaluated_keys
+
+    def report(self):
+        rows = max(self.rows, 1)
+        fall_through = int(self.rule_hits[SHORT_QUERY_RULE] + self.rule_hits[LONG_QUERY_RULE])
+        return {
+            'rules_version': RULES_VERSION,
+            'rows': self.rows,
+            'reused_rows': self.reused_rows,
+            'unique_keys': self.unique_keys,
+            'evaluated_keys': self.evaluated_keys,
+            'fall_through': {
+                'rows': fall_through,
+                'rate': fall_through / rows,
+                'short_query_rows': int(self.rule_hits[SHORT_QUERY_RULE]),
+                'long_query_rows': int(self.rule_hits[LONG_QUERY_RULE]),
+            },
+            'rules': [
+                {
+                    'rule': rule_number,
+                    'category': RULE_CATEGORIES[rule_number],
+                    'sub_category': RULE_SUBCATEGORIES[rule_number],
+                    'hits': int(self.rule_hits[rule_number]),
+                    'hit_rate': int(self.rule_hits[rule_number]) / rows,
+                    'eval_seconds': round(float(self.rule_seconds[rule_number]), 6),
+                }
+                for rule_number in range(len(MAPPING_RULES))
+            ],
+            'dead_rules': [int(rule_number) for rule_number in np.flatnonzero(self.rule_hits[:len(MAPPING_RULES)] == 0)],
+            'stage_seconds': {stage: round(seconds, 6) for stage, seconds in self.stage_seconds.items()},
+        }
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as handle:
+            json.dump(self.report(), handle, indent=2)
+
+
+# Evaluate the rules for lower-cased keywords and their URL classes
+def evaluate_rules(keywords_lower, url_class, stats=None):
+    """
+    Rules are evaluated in priority order; each distinct condition becomes one
+    str.contains mask (URL terms come from url_class) the first time a rule
+    needs it, and np.select picks the first matching rule per row, just like
+    map_category_subcategory. Returns an array of rule numbers.
+    """
+    length = len(keywords_lower)
+
+    # A rule matches where all of its conditions do
+    condition_masks = {}
+    rule_matches = []
+    for rule_number, (rule_mask, _, _) in enumerate(COMPILED_RULES['rule_masks']):
+        if stats is not None:
+            start = time.perf_counter()
+        matched = np.ones(length, dtype=bool)
+        for bit, condition in COMPILED_RULES['conditions']:
+            if not rule_mask & bit:
+                continue
+            if bit not in condition_masks:
+                condition_matched = (url_class & bit) != 0
+                if 'keyword' in condition:
+                    pattern = '|'.join(re.escape(term) for term in condition['keyword'])
+                    condition_matched |= keywords_lower.str.contains(pattern, regex=True).to_numpy(dtype=bool)
+                condition_masks[bit] = condition_matched
+            matched &= condition_masks[bit]
+        rule_matches.append(matched)
+        if stats is not None:
+            stats.rule_seconds[rule_number] += time.perf_counter() - start
+
+    # np.select keeps the first matching rule
+    rule_numbers = np.select(rule_matches, np.arange(len(rule_matches)), default=-1)
+
+    # Fallback for unmatched rows: short queries (<= 2 words) are brand searches
+    unmatched = np.flatnonzero(rule_numbers < 0)
+    if len(unmatched):
+        word_counts = keywords_lower.iloc[unmatched].map(lambda keyword: len(keyword.split()))
+        short_query = (word_counts <= 2).to_numpy(dtype=bool)
+        rule_numbers[unmatched] = np.where(short_query, SHORT_QUERY_RULE, LONG_QUERY_RULE)
+
+    return rule_numbers
+
+
+# Find the rule number of every row of whole Keyword and URL columns in one pass
+def map_rule_numbers(keywords, urls, cache=None, stats=None):
+    """
+    Rows are collapsed to unique (lower-cased keyword, URL class) keys, only
+    those keys are evaluated (or looked up in the optional MappingCache), and
+    results are broadcast back as an array of rule numbers, one per row.
+    Pass a RuleStats as `stats` to record rule hits and timings.
+    """
+    if stats is not None:
+        stats.lap_start = time.perf_counter()
+
+    # Classify each distinct URL once, then broadcast the classes to rows
+    url_codes, unique_urls = pd.factorize(urls, use_na_sentinel=False)
+    keys = pd.DataFrame({
+        'keyword': as_lower_text(keywords),
+        'url_class': url_classes(as_lower_text(pd.Series(unique_urls, dtype=object)))[url_codes],
+    })
+    codes = keys.groupby(['keyword', 'url_class'], sort=False).ngroup().to_numpy()
+    unique_keys = keys.drop_duplicates(ignore_index=True)  # Same first-seen order as the codes
+    if stats is not None:
+        stats.lap('collapse')
+
+    rule_numbers = np.full(len(unique_keys), -1, dtype=np.int64)
+    if cache is not None:
+        for idx, rule_number in cache.lookup(unique_keys).items():
+            rule_numbers[idx] = rule_number
+        if stats is not None:
+            stats.lap('cache_lookup')
+
+    missing = rule_numbers < 0
+    if missing.any():
+        new_keys = unique_keys[missing].reset_index(drop=True)
+        new_rule_numbers = evaluate_rules(new_keys['keyword'], new_keys['url_class'].to_numpy(), stats)
+        rule_numbers[missing] = new_rule_numbers
+        if stats is not None:
+            stats.lap('evaluate')
+        if cache is not None:
+            cache.store(new_keys, new_rule_numbers)
+            if stats is not None:
+                stats.lap('cache_store')
+
+    row_rules = rule_numbers[codes]
+    if stats is not None:
+        stats.unique_keys += len(unique_keys)
+        stats.evaluated_keys += int(missing.sum())
+        stats.record_rows(row_rules)
+        stats.lap('broadcast')
+    return row_rules
+
+
+# Map whole Keyword and URL columns to Category and Sub-Category in one pass
+def map_categories(keywords, urls, cache=None, stats=None):
+    """
+    Vectorized version of map_category_subcategory for whole columns (see
+    map_rule_numbers). Returns a DataFrame with Category and Sub-Category.
+    """
+    row_rules = map_rule_numbers(keywords, urls, cache, stats)
+    return pd.DataFrame({'Category': RULE_CATEGORIES[row_rules], 'Sub-Category': RULE_SUBCATEGORIES[row_rules]},
+                        index=keywords.index)
+
+
+class MappingCache:
+    """
+    Persistent SQLite cache of (keyword, URL class) -> rule number.
+    Entries are tagged with RULES_VERSION, and entries from other rule-set
+    versions are deleted on open, so editing MAPPING_RULES invalidates it.
+    """
+
+    def __init__(self, path, rules_version=RULES_VERSION):
+        self.rules_version = rules_version
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')  # Lets pool workers share the file
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS key_rules ('
+            ' rules_version TEXT, keyword TEXT, url_class INTEGER, rule INTEGER,'
+            ' PRIMARY KEY (rules_version, keyword, url_class)) WITHOUT ROWID'
+        )
+        self.connection.execute('DELETE FROM key_rules WHERE rules_version != ?', (rules_version,))
+        self.connection.commit()
+
+    # Return {row position: rule number} for cached keys
+    def lookup(self, keys):
+        connection = self.connection
+        connection.execute('CREATE TEMP TABLE IF NOT EXISTS lookup_keys'
+                           ' (idx INTEGER PRIMARY KEY, keyword TEXT, url_class INTEGER)')
+        connection.execute('DELETE FROM lookup_keys')
+        connection.executemany('INSERT INTO lookup_keys VALUES (?, ?, ?)',
+                               zip(range(len(keys)), keys['keyword'], keys['url_class'].tolist()))
+        rows = connection.execute(
+            'SELECT lookup_keys.idx, key_rules.rule FROM lookup_keys'
+            ' JOIN key_rules ON key_rules.rules_version = ? AND key_rules.keyword = lookup_keys.keyword'
+            ' AND key_rules.url_class = lookup_keys.url_class',
+            (self.rules_version,),
+        )
+        return dict(rows.fetchall())
+
+    # Save freshly evaluated keys
+    def store(self, keys, rule_numbers):
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO key_rules VALUES (?, ?, ?, ?)',
+            zip([self.rules_version] * len(keys), keys['keyword'], keys['url_class'].tolist(),
+                rule_numbers.tolist()),
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+# One MappingCache per path per process (pool workers open their own)
+OPEN_CACHES = {}
+
+
+# Get the MappingCache for a path, or None when caching is disabled
+def get_mapping_cache(path):
+    if not path:
+        return None
+    if path not in OPEN_CACHES:
+        OPEN_CACHES[path] = MappingCache(path)
+    return OPEN_CACHES[path]
+
+
+# Convert an openpyxl cell the way pd.read_excel does: blank cells become '',
+# error cells NaN and integral numbers int
+def excel_cell_value(cell):
+    if cell.value is None:
+        return ''
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        value = int(cell.value)
+        return value if value == cell.value else float(cell.value)
+    return cell.value
 
-    # Generic fallbacks for online shopping
-    if any(word in keyword_lower for word in ['online', 'shopping', 'buy', 'purchase']):
-        return 'E-commerce', 'Online Shopping'
 
-    # Default categories based on keyword intent
-    if len(keyword_lower.split()) <= 2:  # Brand or short queries
-        return 'Brand Search', 'Direct Navigation'
+# Rows of the first sheet as pd.read_excel sees them: trailing blank cells are
+# trimmed, blank rows inside the data are kept (as []) and trailing ones dropped
+def excel_rows(file_path):
+    workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        blank_rows = 0
+        for row in sheet.rows:
+            values = [excel_cell_value(cell) for cell in row]
+            while values and values[-1] == '':
+                values.pop()
+            if not values:
+                blank_rows += 1  # Only yielded once a later row has data
+                continue
+            for _ in range(blank_rows):
+                yield []
+            blank_rows = 0
+            yield values
+    finally:
+        workbook.close()
+
+
+# Copy of pandas' default NA strings (pandas._libs.parsers.STR_NA_VALUES), used
+# when that private name cannot be imported
+EXCEL_NA_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>',
+    'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+
+# Class of a converted cell value for dtype inference. Values of one class
+# affect the dtype pd.read_excel infers for a column in the same way;
+# na_values are the strings it reads as NaN.
+def value_class(value, na_values):
+    if isinstance(value, str):
+        if value in na_values:
+            return 'missing'
+        if '_' not in value:
+            for kind, convert in (('int text', int), ('float text', float)):
+                try:
+                    convert(value)
+                    return kind
+                except ValueError:
+                    pass
+        return 'text'
+    if isinstance(value, float) and np.isnan(value):
+        return 'missing'
+    return type(value).__name__
+
+
+# Scan an Excel sheet once for the column names and the dtype pd.read_excel gives each column
+def excel_column_dtypes(file_path):
+    """
+    Returns (header, dtypes) or None for an empty sheet. One value per
+    value_class is kept per column, and the dtype is what pandas infers for
+    those samples, so every chunk can be parsed with the whole-file dtypes.
+    """
+    # pandas internals, imported here so only the chunked reader depends on them
+    from pandas.io.parsers import TextParser  # The parser pd.read_excel uses
+    try:
+        from pandas._libs.parsers import STR_NA_VALUES  # Strings pd.read_excel reads as NaN
+    except ImportError:
+        STR_NA_VALUES = EXCEL_NA_VALUES  # Moved or renamed in this pandas version
+
+    rows = excel_rows(file_path)
+    header = next(rows, None)
+    if header is None:
+        return None
+    samples = [{} for _ in header]
+    filled = [0] * len(header)  # Cells present per column; shorter rows leave the rest blank
+    row_count = 0
+    for row in rows:
+        row_count += 1
+        if len(row) > len(samples):
+            samples += [{} for _ in range(len(row) - len(samples))]
+            filled += [0] * (len(row) - len(filled))
+        for idx, value in enumerate(row):
+            filled[idx] += 1
+            samples[idx].setdefault(value_class(value, STR_NA_VALUES), value)
+    for column_samples, count in zip(samples, filled):
+        if count < row_count:
+            column_samples.setdefault('missing', '')
+
+    header = list(header) + [''] * (len(samples) - len(header))
+    names = TextParser([header], header=0).read().columns  # 'Unnamed: n' and de-duplicated names
+    dtypes = {}
+    for name, column_samples in zip(names, samples):
+        sample_rows = [['sample']] + [[value] for value in column_samples.values()]
+        dtypes[name] = TextParser(sample_rows, header=0, skip_blank_lines=False).read()['sample'].dtype
+    return header, dtypes
+
+
+# Read the first sheet of an Excel file as DataFrame chunks of chunk_size rows
+def read_excel_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream an Excel sheet in constant memory using openpyxl read-only mode.
+    The first row is the header. Chunks hold the same values, dtypes, blank
+    rows and row index as pd.read_excel, so concatenating them gives the
+    whole-file DataFrame. This takes two passes over the sheet: the first
+    (excel_column_dtypes) fixes each column's dtype.
+    """
+    from pandas.io.parsers import TextParser  # The parser pd.read_excel uses (pandas internals)
+
+    scanned = excel_column_dtypes(file_path)
+    if scanned is None:
+        return
+    header, dtypes = scanned
+
+    def parse(batch, start):
+        chunk = TextParser([header] + batch, header=0, skip_blank_lines=False, dtype=dtypes).read()
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        return chunk
+
+    rows = excel_rows(file_path)
+    next(rows)  # Header
+    batch = []
+    start = 0
+    for row in rows:
+        batch.append(row + [''] * (len(header) - len(row)))
+        if len(batch) == chunk_size:
+            yield parse(batch, start)
+            start += len(batch)
+            batch = []
+    if batch:
+        yield parse(batch, start)
+
+
+# Add Category and Sub-Category columns to a DataFrame (in place) and return
+# the rule number of every row. Rows with a rule number >= 0 in
+# `previous_rules` (from an incremental run) keep that rule and are not mapped.
+def add_category_columns(df, cache=None, previous_rules=None, stats=None):
+    if previous_rules is None:
+        rule_numbers = np.full(len(df), -1, dtype=np.int64)
     else:
-        return 'General Search', 'Information Search'
+        rule_numbers = previous_rules.astype(np.int64)
+    todo = rule_numbers < 0
+    if stats is not None and not todo.all():
+        stats.record_rows(rule_numbers[~todo], reused=True)
+    if todo.any():
+        rows = df if todo.all() else df[todo]
+        missing = pd.Series('', index=rows.index)
+        rule_numbers[todo] = map_rule_numbers(rows.get('Keyword', missing), rows.get('URL', missing), cache, stats)
+    df['Category'] = RULE_CATEGORIES[rule_numbers]
+    df['Sub-Category'] = RULE_SUBCATEGORIES[rule_numbers]
+    return rule_numbers
 
 
-# Process an Excel file: add Category and Sub-Category columns using mapping logic
-def process_excel_file(file_path):
+# Hash each row of a DataFrame into a uint64 fingerprint. Numeric columns are
+# hashed as float64 so a row keeps its fingerprint when its column turns from
+# int to float between runs (e.g. a blank cell appears elsewhere in the file).
+def row_fingerprints(df):
+    columns = {}
+    for name in df.columns:
+        column = df[name]
+        if pd.api.types.is_numeric_dtype(column.dtype) and not pd.api.types.is_bool_dtype(column.dtype):
+            column = column.astype('float64')
+        columns[name] = column
+    return pd.util.hash_pandas_object(pd.DataFrame(columns, index=df.index), index=False).to_numpy()
+
+
+# Fingerprint file kept next to a mapped output for incremental runs
+def fingerprint_path(output_path):
+    return os.path.splitext(output_path)[0] + '.fingerprints.npz'
+
+
+# Save row fingerprints and their rule numbers for the next incremental run.
+# The rule number gives the Category/Sub-Category for this RULES_VERSION and
+# lets --rule-stats count reused rows under the rule that matched them.
+def save_fingerprints(path, row_hashes, key_hashes, rule_numbers):
+    np.savez_compressed(
+        path,
+        rules_version=np.array(RULES_VERSION),
+        row_hash=row_hashes,
+        key_hash=key_hashes,
+        rule=np.asarray(rule_numbers, dtype=np.int16),
+    )
+
+
+# Load the fingerprints of a previous run, or None if missing or stale
+def load_fingerprints(path):
+    if not os.path.exists(path):
+        print(f"  No previous fingerprints at {path}; mapping all rows")
+        return None
+    with np.load(path) as data:
+        if str(data['rules_version']) != RULES_VERSION or 'rule' not in data.files:
+            print("  Mapping rules changed since the previous run; mapping all rows")
+            return None
+        row_hash = data['row_hash']
+        first = ~pd.Index(row_hash).duplicated()  # Identical rows share one mapping
+        return {
+            'row_hash': row_hash,
+            'key_hash': data['key_hash'],
+            'rows': pd.Index(row_hash[first]),
+            'keys': pd.Index(np.unique(data['key_hash'])),
+            'rule': data['rule'].astype(np.int64)[first],
+        }
+
+
+# Fingerprint chunks against a previous run and carry unchanged rows forward
+def prepare_incremental(chunks, previous, fingerprints, counts):
     """
-    Process Excel file to add Category and Sub-Category columns.
-    Reads the file, applies mapping, and saves the result.
+    Yield (chunk, previous_rules) pairs. Rows whose content hash appears in
+    the previous fingerprints get their old rule number in previous_rules;
+    the rest are -1 and still need mapping (previous_rules is None when there
+    is no previous run). Rows not reused count as 'changed' if their
+    (Keyword, URL) pair existed before, else 'added'. Hashes are appended to
+    `fingerprints` for the next run.
     """
-    print(f"Processing: {file_path}")
+    for chunk in chunks:
+        input_columns = [name for name in chunk.columns if name not in ('Category', 'Sub-Category')]
+        key_columns = [name for name in ('Keyword', 'URL') if name in chunk.columns]
+        row_hash = row_fingerprints(chunk[input_columns])
+        key_hash = row_fingerprints(chunk[key_columns])
+        fingerprints['row_hash'].append(row_hash)
+        fingerprints['key_hash'].append(key_hash)
+
+        if previous is None:
+            counts['added'] += len(chunk)
+            yield chunk, None
+            continue
+
+        positions = previous['rows'].get_indexer(row_hash)
+        reused = positions >= 0
+        known_key = previous['keys'].get_indexer(key_hash) >= 0
+        counts['reused'] += int(reused.sum())
+        counts['changed'] += int((~reused & known_key).sum())
+        counts['added'] += int((~reused & ~known_key).sum())
+
+        # Only reused rows have a previous position (an empty previous run has none)
+        previous_rules = np.full(len(chunk), -1, dtype=np.int64)
+        previous_rules[reused] = previous['rule'][positions[reused]]
+        yield chunk, previous_rules
+
+
+# Output sinks: each accepts mapped DataFrame chunks through write() and
+# finalizes the file on close(), so whole-file and chunked runs share one path.
+# abort() discards a partially written file after an error.
+class ExcelSink:
+    """Constant-memory XLSX output using an openpyxl write-only workbook."""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.header_written = False
 
-    # Read the Excel file into a DataFrame
-    df = pd.read_excel(file_path)
+    def write(self, chunk):
+        if not self.header_written:
+            self.sheet.append(list(chunk.columns))
+            self.header_written = True
+        # openpyxl cannot write NaN/NaT, so store missing cells as blanks
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        for row in chunk.itertuples(index=False, name=None):
+            self.sheet.append(row)
 
-    # Add columns if not already present
-    if 'Category' not in df.columns:
-        df['Category'] = ''
-    if 'Sub-Category' not in df.columns:
-        df['Sub-Category'] = ''
+    def close(self):
+        self.workbook.save(self.output_path)
+
+    def abort(self):
+        pass  # Nothing is on disk until close()
+
+
+class CsvSink:
+    """Appends chunks to a UTF-8 CSV file, writing the header once."""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.handle = open(output_path, 'w', newline='', encoding='utf-8')
+        self.header_written = False
+
+    def write(self, chunk):
+        chunk.to_csv(self.handle, index=False, header=not self.header_written)
+        self.header_written = True
+
+    def close(self):
+        self.handle.close()
+
+    def abort(self):
+        self.handle.close()
+        os.remove(self.output_path)
+
+
+class ParquetSink:
+    """
+    Writes each chunk as a Parquet row group with pyarrow, into a temporary
+    .part file that close() renames to output_path. Category and Sub-Category
+    are dictionary-encoded and other object columns are written as strings.
+    When a chunk needs a wider type than the file so far (int64 then float64,
+    numbers then text), the schema is widened and the row groups already
+    written are rewritten with it, so no value is ever cast down.
+    """
 
-    # Process each row and assign category/sub-category
-    for idx, row in df.iterrows():
-        keyword = str(row.get('Keyword', ''))
-        url = str(row.get('URL', ''))
+    DICTIONARY_COLUMNS = ('Category', 'Sub-Category')
 
-        category, subcategory = map_category_subcategory(keyword, url)
+    def __init__(self, output_path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.pa = pa
+        self.pq = pq
+        self.output_path = output_path
+        self.temp_path = output_path + '.part'
+        self.writer = None
+        self.schema = None
 
-        df.at[idx, 'Category'] = category
-        df.at[idx, 'Sub-Category'] = subcategory
+    # Arrow table of a chunk, with object columns (mixed text, numbers, None) as strings
+    def to_table(self, chunk):
+        pa = self.pa
+        text_columns = [idx for idx, dtype in enumerate(chunk.dtypes) if dtype == object]
+        if text_columns:
+            chunk = chunk.copy(deep=False)
+            for idx in text_columns:
+                column = chunk.iloc[:, idx]
+                chunk.isetitem(idx, column.map(str).where(column.notna(), None))
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        for idx, field in enumerate(table.schema):
+            if field.name in self.DICTIONARY_COLUMNS:
+                field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+            elif idx in text_columns and pa.types.is_null(field.type):
+                field = field.with_type(pa.string())  # All-blank column
+            else:
+                continue
+            table = table.set_column(idx, field, table.column(idx).cast(field.type))
+        return table
 
-        # Print progress every 5000 rows
-        if (idx + 1) % 5000 == 0:
-            print(f"  Processed {idx + 1}/{len(df)} rows")
+    # Narrowest type holding the values of both Arrow types
+    def wider_type(self, first, second):
+        types = self.pa.types
+        if first.equals(second) or types.is_null(second):
+            return first
+        if types.is_null(first):
+            return second
+        if types.is_dictionary(first) and types.is_dictionary(second):
+            return first
+        numbers = (types.is_boolean, types.is_integer, types.is_floating)
+        if all(any(test(kind) for test in numbers) for kind in (first, second)):
+            if types.is_floating(first) or types.is_floating(second):
+                return self.pa.float64()
+            return self.pa.int64()
+        if types.is_large_string(first) or types.is_large_string(second):
+            return self.pa.large_string()
+        return self.pa.string()  # Anything else mixes as text
 
-    # Save the updated DataFrame to mapped data set folder
-    mapped_folder = r"e:\Intern-Ship-AssignmentTest\Task 4\mapped data set"
-    os.makedirs(mapped_folder, exist_ok=True)
-    filename = os.path.basename(file_path).replace('.xlsx', '_mapped.xlsx')
-    output_path = os.path.join(mapped_folder, filename)
-    df.to_excel(output_path, index=False)
+    # Rewrite the row groups written so far with a wider schema
+    def widen(self, schema):
+        self.writer.close()
+        previous_path = self.temp_path + '.old'
+        os.replace(self.temp_path, previous_path)
+        self.writer = self.pq.ParquetWriter(self.temp_path, schema)
+        previous = self.pq.ParquetFile(previous_path)
+        for group in range(previous.num_row_groups):
+            self.writer.write_table(previous.read_row_group(group).cast(schema))
+        previous.close()
+        os.remove(previous_path)
+        self.schema = schema
+
+    def write(self, chunk):
+        table = self.to_table(chunk)
+        if self.schema is None:
+            self.schema = table.schema
+            self.writer = self.pq.ParquetWriter(self.temp_path, self.schema)
+        else:
+            if table.schema.names != self.schema.names:
+                raise ValueError(f"Chunk columns {table.schema.names} differ from {self.schema.names}")
+            schema = self.pa.schema([field.with_type(self.wider_type(field.type, other.type))
+                                     for field, other in zip(self.schema, table.schema)],
+                                    metadata=self.schema.metadata)
+            if not schema.equals(self.schema):
+                self.widen(schema)
+        self.writer.write_table(table.cast(self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            os.replace(self.temp_path, self.output_path)
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+            os.remove(self.temp_path)
+
+
+# Available output formats for mapped files
+SINKS = {
+    'xlsx': ExcelSink,
+    'csv': CsvSink,
+    'parquet': ParquetSink,
+}
+
+# Default folders, relative to this script instead of a machine-specific path
+TASK_FOLDER = os.path.dirname(os.path.abspath(__file__))
+DATA_FOLDER = os.path.join(TASK_FOLDER, 'data-set')
+MAPPED_FOLDER = os.path.join(TASK_FOLDER, 'mapped data set')
+CACHE_FILENAME = 'mapping_cache.sqlite'  # Default --cache file, in the output folder
+
+
+# Build the output path in the output folder for an input file
+def mapped_output_path(file_path, output_folder=MAPPED_FOLDER, output_format='xlsx'):
+    os.makedirs(output_folder, exist_ok=True)
+    filename = os.path.splitext(os.path.basename(file_path))[0] + f'_mapped.{output_format}'
+    return os.path.join(output_folder, filename)
+
+
+# Map one row shard in a worker process
+def map_shard(shard_idx, chunk, cache_path=None, previous_rules=None, collect_stats=False):
+    start = time.perf_counter()
+    stats = RuleStats() if collect_stats else None
+    rule_numbers = add_category_columns(chunk, get_mapping_cache(cache_path), previous_rules, stats)
+    return shard_idx, chunk, rule_numbers, time.perf_counter() - start, os.getpid(), stats
+
+
+# Map chunks in a process pool, yielding them back in their original order
+def map_chunks_in_pool(chunks, executor, label, max_pending, cache_path=None, stats=None):
+    """
+    Submit each (chunk, previous_rules) pair as a shard to the executor,
+    keeping at most max_pending shards in flight, and yield (mapped chunk,
+    rule numbers) pairs in submission order so the output is identical to a
+    single-process run.
+    """
+    pending = deque()
+    first_row = 1
+
+    def collect():
+        future, rows = pending.popleft()
+        shard_idx, mapped, rule_numbers, elapsed, pid, shard_stats = future.result()
+        if stats is not None:
+            stats.merge(shard_stats)
+        print(f"  [{label}] shard {shard_idx} (rows {rows}): mapped in {elapsed:.2f}s by pid {pid}")
+        return mapped, rule_numbers
+
+    for shard_idx, (chunk, previous_rules) in enumerate(chunks, 1):
+        rows = f"{first_row}-{first_row + len(chunk) - 1}"
+        pending.append((executor.submit(map_shard, shard_idx, chunk, cache_path, previous_rules, stats is not None),
+                        rows))
+        first_row += len(chunk)
+        if len(pending) >= max_pending:
+            yield collect()
+    while pending:
+        yield collect()
+
+
+# Process an Excel file: add Category and Sub-Category columns using mapping logic
+def process_excel_file(file_path, chunk_size=None, output_folder=MAPPED_FOLDER, output_format='xlsx',
+                       executor=None, max_pending=8, cache_path=None, incremental=False, rule_stats=False):
+    """
+    Process Excel file to add Category and Sub-Category columns.
+    Reads the file, applies mapping, and writes the result through the
+    output_format sink ('xlsx', 'csv' or 'parquet') into output_folder.
+    With chunk_size set, the file is streamed with read_excel_chunks and each
+    chunk is mapped, written and discarded, so memory stays flat; the mapped
+    DataFrame is only returned when the whole file is read at once.
+    With an executor, chunks are mapped as row shards in its worker processes
+    (at most max_pending in flight) and written in original order; without
+    chunk_size the file is read whole by pandas and cut into shards of
+    DEFAULT_CHUNK_SIZE rows, so the output matches a single-process run.
+    With cache_path, mappings are reused from and saved to a MappingCache.
+    With incremental, rows are fingerprinted against the previous run's
+    fingerprint file next to the output (see prepare_incremental); only added
+    or changed rows are mapped and the counts are reported.
+    With rule_stats, per-rule hit counts, timings and fall-through rates are
+    written to <name>_mapped.rule_stats.json next to the output.
+    """
+    if output_format not in SINKS:
+        raise ValueError(f"Unknown output format: {output_format} (expected one of {', '.join(SINKS)})")
+    if chunk_size:
+        print(f"Processing (chunks of {chunk_size}): {file_path}")
+        chunks = read_excel_chunks(file_path, chunk_size)
+    else:
+        print(f"Processing: {file_path}")
+        # Read the Excel file into a DataFrame
+        whole_file = pd.read_excel(file_path)
+        if executor is not None:
+            # Shard the pandas-read rows so the dtypes are the same as in one process
+            chunks = (whole_file.iloc[start:start + DEFAULT_CHUNK_SIZE].copy()
+                      for start in range(0, max(len(whole_file), 1), DEFAULT_CHUNK_SIZE))
+        else:
+            chunks = [whole_file]
+
+    output_path = mapped_output_path(file_path, output_folder, output_format)
+
+    # Pair each chunk with the mask of rows carried over from the previous run
+    if incremental:
+        counts = {'added': 0, 'changed': 0, 'removed': 0, 'reused': 0}
+        fingerprints = {'row_hash': [], 'key_hash': [], 'rule': []}
+        previous = load_fingerprints(fingerprint_path(output_path))
+        chunks = prepare_incremental(chunks, previous, fingerprints, counts)
+    else:
+        chunks = ((chunk, None) for chunk in chunks)
+
+    stats = RuleStats() if rule_stats else None
+    sink = SINKS[output_format](output_path)
+    if executor is not None:
+        mapped_chunks = map_chunks_in_pool(chunks, executor, os.path.basename(file_path), max_pending,
+                                           cache_path, stats)
+    else:
+        # Map all rows of each chunk at once
+        cache = get_mapping_cache(cache_path)
+        mapped_chunks = ((chunk, add_category_columns(chunk, cache, previous_rules, stats))
+                         for chunk, previous_rules in chunks)
+
+    total_rows = 0
+    categories = set()
+    subcategories = set()
+    try:
+        for chunk, rule_numbers in mapped_chunks:
+            # Stream each mapped chunk to the sink
+            sink.write(chunk)
+
+            total_rows += len(chunk)
+            categories.update(chunk['Category'].unique())
+            subcategories.update(chunk['Sub-Category'].unique())
+            if incremental:
+                fingerprints['rule'].append(rule_numbers)
+            if chunk_size and executor is None:
+                print(f"  Processed {total_rows} rows")
+    except BaseException:
+        sink.abort()  # Leave no truncated output behind
+        raise
+    sink.close()
 
     print(f"✓ Saved mapped file: {output_path}")
-    print(f"  Total rows processed: {len(df)}")
-    print(f"  Categories found: {df['Category'].nunique()}")
-    print(f"  Sub-categories found: {df['Sub-Category'].nunique()}")
+    print(f"  Total rows processed: {total_rows}")
+    print(f"  Categories found: {len(categories)}")
+    print(f"  Sub-categories found: {len(subcategories)}")
+
+    if incremental:
+        row_hashes = np.concatenate(fingerprints['row_hash'] or [np.array([], dtype=np.uint64)])
+        key_hashes = np.concatenate(fingerprints['key_hash'] or [np.array([], dtype=np.uint64)])
+        if previous is not None:
+            # Previous rows with neither their content nor their (Keyword, URL) pair left
+            gone = ~np.isin(previous['row_hash'], row_hashes) & ~np.isin(previous['key_hash'], key_hashes)
+            counts['removed'] = int(gone.sum())
+        save_fingerprints(fingerprint_path(output_path), row_hashes, key_hashes,
+                          np.concatenate(fingerprints['rule'] or [np.array([], dtype=np.int64)]))
+        print(f"  Incremental: {counts['added']} added, {counts['changed']} changed, "
+              f"{counts['removed']} removed, {counts['reused']} reused")
+    if stats is not None:
+        stats_path = os.path.splitext(output_path)[0] + '.rule_stats.json'
+        stats.write_json(stats_path)
+        report = stats.report()
+        print(f"  Rule stats: {report['fall_through']['rate']:.1%} fall-through, "
+              f"{len(report['dead_rules'])} rules never matched -> {stats_path}")
     print()
 
-    return df
+    return None if chunk_size or executor is not None else whole_file
+
+
+# Run process_excel_file in a worker without shipping the DataFrame back
+def process_file_job(file_path, **options):
+    process_excel_file(file_path, **options)
+
+
+# Process several Excel files, optionally across a pool of worker processes
+def process_files(file_paths, workers=1, **options):
+    """
+    Map every file in file_paths with process_excel_file.
+    With workers > 1 the work is spread over a process pool: when there are at
+    least as many files as workers each file runs in its own worker, otherwise
+    files are taken one at a time and split into row shards across the pool.
+    Output files are identical to a single-process run either way.
+    """
+    if workers <= 1:
+        for file_path in file_paths:
+            process_excel_file(file_path, **options)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if len(file_paths) >= workers:
+            futures = {executor.submit(process_file_job, file_path, **options): file_path
+                       for file_path in file_paths}
+            for future in as_completed(futures):
+                future.result()  # Re-raise any worker error
+                print(f"✓ Finished {os.path.basename(futures[future])}")
+        else:
+            for file_path in file_paths:
+                process_excel_file(file_path, executor=executor, max_pending=2 * workers, **options)
 
 
 # Main execution function
 def main():
+    parser = argparse.ArgumentParser(description="Task 4: map position files to Category/Sub-Category")
+    parser.add_argument('--chunk-size', type=int, nargs='?', const=DEFAULT_CHUNK_SIZE, default=None,
+                        help=f"stream files in chunks of this many rows (default when given: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument('--format', dest='output_format', choices=sorted(SINKS), default='xlsx',
+                        help="output file format (default: xlsx)")
+    parser.add_argument('--data-folder', default=DATA_FOLDER, help="folder containing the input Excel files")
+    parser.add_argument('--output-folder', default=MAPPED_FOLDER, help="folder for the mapped output files")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="worker processes for mapping files/row shards (default: 1)")
+    parser.add_argument('--cache', dest='cache_path', nargs='?', const='',
+                        help=f"reuse mappings from a persistent SQLite cache (default when given: {CACHE_FILENAME} "
+                             "in the output folder)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only map rows that are new or changed since the previous run")
+    parser.add_argument('--rule-stats', action='store_true',
+                        help="write per-rule hit counts and timings as JSON next to each mapped file")
+    parser.add_argument('files', nargs='*', help="input file names in the data folder (default: the sample exports)")
+    args = parser.parse_args()
+    if args.cache_path == '':
+        # Bare --cache: keep the cache next to the outputs it was built for
+        args.cache_path = os.path.join(args.output_folder, CACHE_FILENAME)
+
     print("Task 4: Research Data Mapping")
     print("=" * 50)
 
     # Folder containing input Excel files
-    data_folder = r"e:\Intern-Ship-AssignmentTest\Task 4\data-set"
+    data_folder = args.data_folder
 
     # List of files to process
-    files_to_process = [
+    files_to_process = args.files or [
         "Positions.bigbasket.com.xlsx",
         "Positions.swiggy.com.xlsx"
     ]
 
-    # Process each file
+    # Keep only files that exist
+    file_paths = []
     for filename in files_to_process:
         file_path = os.path.join(data_folder, filename)
         if os.path.exists(file_path):
-            process_excel_file(file_path)
+            file_paths.append(file_path)
         else:
             print(f"File not found: {file_path}")
 
-    print("Data mapping completed for both sheets!")
+    # Process each file
+    process_files(file_paths, workers=args.workers, chunk_size=args.chunk_size,
+                  output_folder=args.output_folder, output_format=args.output_format, cache_path=args.cache_path,
+                  incremental=args.incremental, rule_stats=args.rule_stats)
+
+    print(f"Data mapping completed for {len(file_paths)} sheets!")
 
 
 # Script entry point
@@ -0,0 +1,253 @@
+# Import required libraries
+import os            # For file and directory operations
+import sys           # For the module search path and exit codes
+import json          # For the stored baseline
+import time          # For stage timings
+import argparse      # For command-line options
+import tempfile      # For the default work folder
+import numpy as np   # For synthetic data generation
+import pandas as pd  # For data manipulation
+from concurrent.futures import ProcessPoolExecutor  # For one fresh process per run
+
+try:
+    import resource  # Peak RSS (not available on Windows)
+except ImportError:
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import Task4_Data_Mapping as mapping  # The pipeline under test
+
+
+# Benchmark sizes (rows of synthetic position data)
+SIZES = {
+    '10k': 10_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000,
+}
+
+# An Excel sheet holds 1,048,576 rows including the header. Larger corpora
+# skip the read stage (chunks are generated in memory) and are written as CSV.
+EXCEL_MAX_ROWS = 1_048_575
+
+# Words that match no rule, mixed into keywords so some rows fall through
+FILLER_WORDS = [
+    'best', 'cheap', 'price', 'list', 'today', 'offers', 'review', 'how', 'to', 'make',
+    'recipe', 'app', 'login', 'download', 'city', 'ahmedabad', 'surat', 'mumbai', 'bangalore', 'india',
+]
+
+# URLs covering every URL term the rules look for, plus unrelated domains
+SYNTHETIC_URLS = [
+    'https://www.swiggy.com/',
+    'https://www.swiggy.com/restaurants/pizza',
+    'https://www.swiggy.com/instamart',
+    'https://partner.swiggy.com/login',
+    'https://www.bigbasket.com/',
+    'https://www.bigbasket.com/pc/fruits-vegetables/',
+    'https://www.bigbasket.com/cl/beverages/',
+    'https://www.example.com/blog/grocery-list',
+    'https://en.wikipedia.org/wiki/Food_delivery',
+]
+
+DEFAULT_BASELINE = os.path.join(mapping.TASK_FOLDER, 'benchmark_baseline.json')
+DEFAULT_WORK_FOLDER = os.path.join(tempfile.gettempdir(), 'task4_benchmark')
+
+
+# Generate synthetic position rows in DataFrame chunks
+def synthetic_chunks(rows, chunk_size, seed=0):
+    """
+    Yield chunks of Positions-like rows. Keywords are 1-5 words drawn from the
+    rule vocabulary (about two thirds) and FILLER_WORDS, so every rule group
+    and both fallbacks get exercised. The same seed gives the same corpus.
+    """
+    rng = np.random.default_rng(seed)
+    rule_terms = sorted({term for _, _, conditions in mapping.MAPPING_RULES
+                         for condition in conditions for term in condition.get('keyword', [])})
+    vocabulary = np.array(rule_terms * 2 + FILLER_WORDS, dtype=object)
+
+    done = 0
+    while done < rows:
+        size = min(chunk_size, rows - done)
+        words = vocabulary[rng.integers(0, len(vocabulary), size=(size, 5))]
+        lengths = rng.integers(1, 6, size=size)
+        keywords = [' '.join(row[:length]) for row, length in zip(words, lengths)]
+        yield pd.DataFrame({
+            'Keyword': keywords,
+            'Position': rng.integers(1, 101, size=size),
+            'Search Volume': rng.integers(10, 2_000_000, size=size),
+            'CPC': rng.integers(0, 500, size=size) / 100,
+            'URL': np.array(SYNTHETIC_URLS, dtype=object)[rng.integers(0, len(SYNTHETIC_URLS), size=size)],
+            'Traffic': rng.integers(0, 100_000, size=size),
+            'Timestamp': pd.Timestamp('2025-08-11') + pd.to_timedelta(rng.integers(0, 86_400, size=size), unit='s'),
+        })
+        done += size
+
+
+# Write the synthetic input workbook for a size once and reuse it afterwards
+def prepare_input(rows, label, chunk_size, work_folder):
+    if rows > EXCEL_MAX_ROWS:
+        return None
+    os.makedirs(work_folder, exist_ok=True)
+    input_path = os.path.join(work_folder, f'Positions.synthetic_{label}.xlsx')
+    if not os.path.exists(input_path):
+        print(f"  Generating {input_path} ...")
+        sink = mapping.ExcelSink(input_path + '.partial')
+        try:
+            for chunk in synthetic_chunks(rows, chunk_size):
+                sink.write(chunk)
+        finally:
+            sink.close()
+        os.replace(input_path + '.partial', input_path)
+    return input_path
+
+
+# Peak resident set size of this process in MB (None where unsupported)
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024  # Bytes on macOS, KB elsewhere
+
+
+# Run the read -> map -> write pipeline once and time each stage
+def run_pipeline(rows, label, input_path, chunk_size, output_format, work_folder):
+    """
+    Stream the corpus through read_excel_chunks, add_category_columns and an
+    output sink, timing each stage separately. Runs in a fresh process so the
+    peak RSS belongs to this size alone.
+    """
+    if input_path is None:
+        chunks = synthetic_chunks(rows, chunk_size)
+        if output_format == 'xlsx':
+            output_format = 'csv'  # Too many rows for one sheet
+    else:
+        chunks = mapping.read_excel_chunks(input_path, chunk_size)
+
+    output_path = os.path.join(work_folder, f'Positions.synthetic_{label}_mapped.{output_format}')
+    sink = mapping.SINKS[output_format](output_path)
+    seconds = {'read': 0.0, 'map': 0.0, 'write': 0.0}
+    total_rows = 0
+    try:
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            seconds['read'] += time.perf_counter() - start
+            if chunk is None:
+                break
+
+            start = time.perf_counter()
+            mapping.add_category_columns(chunk)
+            seconds['map'] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            sink.write(chunk)
+            seconds['write'] += time.perf_counter() - start
+            total_rows += len(chunk)
+    finally:
+        start = time.perf_counter()
+        sink.close()
+        seconds['write'] += time.perf_counter() - start
+    os.remove(output_path)
+
+    if input_path is None:
+        seconds['read'] = None  # Generated in memory, not read from a file
+    return {
+        'rows': total_rows,
+        'format': output_format,
+        'seconds': {stage: None if value is None else round(value, 3) for stage, value in seconds.items()},
+        'rows_per_second': {stage: None if not value else round(total_rows / value) for stage, value in seconds.items()},
+        'peak_rss_mb': None if peak_rss_mb() is None else round(peak_rss_mb(), 1),
+    }
+
+
+# Baseline entry of a result: sizes are stored per output format, since the
+# write stage (and peak RSS) of one format says nothing about another
+def baseline_key(label, result):
+    return f"{label}/{result['format']}"
+
+
+# Compare a result with its baseline; returns a list of regression messages
+def compare_to_baseline(label, result, baseline, tolerance):
+    if baseline.get('format') != result['format']:
+        return []  # Not comparable
+    regressions = []
+    for stage, rate in result['rows_per_second'].items():
+        old_rate = baseline.get('rows_per_second', {}).get(stage)
+        if rate and old_rate and rate < old_rate * (1 - tolerance):
+            regressions.append(f"{label} {stage}: {rate:,} rows/s vs baseline {old_rate:,} rows/s")
+    old_rss = baseline.get('peak_rss_mb')
+    if result['peak_rss_mb'] and old_rss and result['peak_rss_mb'] > old_rss * (1 + tolerance):
+        regressions.append(f"{label} peak RSS: {result['peak_rss_mb']} MB vs baseline {old_rss} MB")
+    return regressions
+
+
+# Main execution function
+def main():
+    parser = argparse.ArgumentParser(description="Throughput benchmark for the Task 4 mapping pipeline")
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(SIZES),
+                        help="corpus sizes to run (default: all)")
+    parser.add_argument('--chunk-size', type=int, default=mapping.DEFAULT_CHUNK_SIZE, help="rows per chunk")
+    parser.add_argument('--format', dest='output_format', choices=sorted(mapping.SINKS), default='xlsx',
+                        help="output format for the write stage (default: xlsx)")
+    parser.add_argument('--work-folder', default=DEFAULT_WORK_FOLDER, help="where synthetic inputs are kept")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed slowdown / RSS growth before flagging a regression (default: 0.25)")
+    args = parser.parse_args()
+
+    print("Task 4: Mapping Pipeline Benchmark")
+    print("=" * 50)
+
+    results = {}
+    for label in args.sizes:
+        rows = SIZES[label]
+        print(f"Size {label} ({rows:,} rows)")
+        # Prepare and run in separate fresh processes so peak RSS is per run
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            input_path = executor.submit(prepare_input, rows, label, args.chunk_size, args.work_folder).result()
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(run_pipeline, rows, label, input_path, args.chunk_size,
+                                     args.output_format, args.work_folder).result()
+        results[label] = result
+
+        for stage in ('read', 'map', 'write'):
+            if result['seconds'][stage] is None:
+                print(f"  {stage:5}: skipped (no {result['format']} input beyond Excel's row limit)")
+            else:
+                print(f"  {stage:5}: {result['seconds'][stage]:8.2f}s  {result['rows_per_second'][stage]:>12,} rows/s")
+        print(f"  peak RSS: {result['peak_rss_mb']} MB  (output: {result['format']})")
+        print()
+
+    # Compare against the stored baseline
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+    regressions = []
+    for label, result in results.items():
+        key = baseline_key(label, result)
+        if key in baseline:
+            regressions += compare_to_baseline(key, result, baseline[key], args.tolerance)
+        elif baseline and not args.save_baseline:
+            print(f"No baseline for {key}: not compared")
+
+    if args.save_baseline:
+        baseline.update((baseline_key(label, result), result) for label, result in results.items())
+        with open(args.baseline, 'w', encoding='utf-8') as handle:
+            json.dump(baseline, handle, indent=2)
+        print(f"✓ Saved baseline: {args.baseline}")
+    elif not baseline:
+        print(f"No baseline at {args.baseline} (run with --save-baseline to create one)")
+
+    if regressions:
+        print("✗ Regressions against baseline:")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
+    elif baseline and not args.save_baseline:
+        print("✓ No regressions against baseline")
+
+
+# Script entry point
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,485 @@
+# Tests for the Task 4 mapping pipeline (run with: python -m pytest "Task 4")
+import os            # For file paths
+import sys           # For hiding pandas internals
+import random        # For fuzzed keyword/URL rows
+import datetime      # For date cells
+import json          # For benchmark baselines
+import importlib.util  # For optional pyarrow
+import numpy as np   # For NaN cells
+import pandas as pd  # For data manipulation
+import pytest
+from openpyxl import Workbook  # For small test workbooks
+
+import Task4_Data_Mapping as mapping
+import benchmark_mapping
+
+
+SAMPLE_FILES = ['Positions.bigbasket.com.xlsx', 'Positions.swiggy.com.xlsx']
+
+# Full-workbook tests that take minutes; run with TASK4_SLOW_TESTS=1
+slow = pytest.mark.skipif(not os.environ.get('TASK4_SLOW_TESTS'), reason="set TASK4_SLOW_TESTS=1 to run")
+
+# Every term the rules test, plus words and URLs that match none of them
+RULE_TERMS = sorted({term for _, _, conditions in mapping.MAPPING_RULES
+                     for condition in conditions for terms in condition.values() for term in terms})
+FILLER_WORDS = ['best', 'cheap', 'price', 'today', 'how', 'to', 'ahmedabad', 'surat', '', 'NEAR ME', 'Swiggy']
+FUZZ_URLS = [
+    'https://www.swiggy.com/', 'https://www.swiggy.com/instamart', 'https://partner.swiggy.com/login',
+    'https://www.bigbasket.com/', 'https://www.BigBasket.com/pc/fruits-vegetables/',
+    'https://www.example.com/blog/grocery-list', 'https://en.wikipedia.org/wiki/Food_delivery', '',
+]
+
+
+# Category/Sub-Category of every row the row-wise way (str() of each cell, as iterrows did)
+def row_wise(keywords, urls):
+    pairs = [mapping.map_category_subcategory(str(keyword), str(url)) for keyword, url in zip(keywords, urls)]
+    return pd.DataFrame(pairs, columns=['Category', 'Sub-Category'], index=keywords.index)
+
+
+def assert_parity(keywords, urls):
+    expected = row_wise(keywords, urls)
+    actual = mapping.map_categories(keywords, urls)
+    mismatches = (actual != expected).any(axis=1)
+    assert not mismatches.any(), pd.concat([keywords, urls, actual, expected], axis=1)[mismatches].head()
+
+
+@pytest.mark.parametrize('filename', SAMPLE_FILES)
+def test_map_categories_matches_row_wise_on_sample_files(filename):
+    path = os.path.join(mapping.DATA_FOLDER, filename)
+    if not os.path.exists(path):
+        pytest.skip(f"sample file missing: {path}")
+    df = pd.read_excel(path)
+    assert_parity(df['Keyword'], df['URL'])
+
+
+# The committed output of the original if/elif classifier, independent of MAPPING_RULES
+GOLDEN_SOURCE = os.path.join(mapping.DATA_FOLDER, 'Positions.swiggy.com.xlsx')
+GOLDEN_OUTPUT = os.path.join(mapping.MAPPED_FOLDER, 'Positions.swiggy.com_mapped.xlsx')
+
+
+def test_mapping_matches_committed_golden_output(tmp_path):
+    if not (os.path.exists(GOLDEN_SOURCE) and os.path.exists(GOLDEN_OUTPUT)):
+        pytest.skip("golden files missing")
+    golden = pd.read_excel(GOLDEN_OUTPUT)
+    source = pd.read_excel(GOLDEN_SOURCE)
+    pd.testing.assert_frame_equal(mapping.map_categories(source['Keyword'], source['URL']),
+                                  golden[['Category', 'Sub-Category']], check_dtype=False)
+    expected = row_wise(source['Keyword'], source['URL'])
+    assert (expected.values == golden[['Category', 'Sub-Category']].values).all()
+
+    # The whole pipeline writes the same categories next to the same keywords
+    mapping.process_excel_file(GOLDEN_SOURCE, output_folder=str(tmp_path), output_format='csv')
+    written = pd.read_csv(tmp_path / 'Positions.swiggy.com_mapped.csv', keep_default_na=False)
+    columns = ['Keyword', 'Category', 'Sub-Category']
+    assert (written[columns].astype(str).values == golden[columns].astype(str).values).all()
+
+
+def test_map_categories_matches_row_wise_on_fuzzed_rows():
+    rng = random.Random(0)
+    vocabulary = RULE_TERMS + FILLER_WORDS
+    keywords = [' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 5))) for _ in range(20000)]
+    # Glue some terms together so prefix/overlap cases (e.g. 'cookies', 'non veg') occur
+    keywords += [rng.choice(RULE_TERMS) + rng.choice(RULE_TERMS) for _ in range(2000)]
+    urls = [rng.choice(FUZZ_URLS) for _ in keywords]
+    assert_parity(pd.Series(keywords, dtype=object), pd.Series(urls, dtype=object))
+
+
+def test_map_categories_matches_row_wise_on_missing_cells():
+    keywords = pd.Series(['milk near me', None, np.nan, 'swiggy', None, 'big basket help', np.nan, 1234, 'nan'],
+                         dtype=object)
+    urls = pd.Series([None, 'https://www.swiggy.com/', np.nan, None, np.nan, None, 'https://www.bigbasket.com/',
+                      'https://www.swiggy.com/instamart', 'nan'], dtype=object)
+    assert_parity(keywords, urls)
+
+
+def test_map_categories_matches_row_wise_on_string_dtype():
+    keywords = pd.Series(['Pizza near me', None, 'order groceries', 'partner'], dtype='string')
+    urls = pd.Series(['https://www.swiggy.com/', 'https://www.bigbasket.com/', None, 'https://www.swiggy.com/'],
+                     dtype='string')
+    assert_parity(keywords, urls)
+
+
+@pytest.mark.parametrize('dtype', ['string', 'str', object])
+def test_as_lower_text_matches_str_of_each_cell(dtype):
+    column = pd.Series(['Milk', None, 'SWIGGY'], dtype=dtype)
+    assert mapping.as_lower_text(column).tolist() == [str(value).lower() for value in column]
+
+
+# Write rows (header first) to an .xlsx file
+def write_workbook(path, rows):
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+# Rows whose columns change type between chunks: ints then floats, ints then
+# text, numeric text then text, dates then blanks, plus a blank middle row
+TRICKY_ROWS = [
+    ['Keyword', 'Position', 'CPC', 'Mixed', 'Code', 'Timestamp', None, 'Position'],
+    ['milk near me', 1, 2, 'abc', '01', datetime.datetime(2024, 1, 1), None, 7],
+    ['swiggy', 3, 4, 5, '02', datetime.datetime(2024, 1, 2), None, 8],
+    [],
+    ['big basket', 5, 4.5, 'NA', 'x1', None, None, 9],
+    ['pizza', 6, 1, True, '', datetime.datetime(2024, 1, 3), 'late', 10],
+    [None, 7, None, 2.5, '03'],
+    [],
+    [],
+]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 100])
+def test_read_excel_chunks_matches_read_excel(tmp_path, chunk_size):
+    path = write_workbook(tmp_path / 'tricky.xlsx', TRICKY_ROWS)
+    expected = pd.read_excel(path)
+    chunks = list(mapping.read_excel_chunks(path, chunk_size))
+    assert all(len(chunk) <= chunk_size for chunk in chunks)
+    pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+
+
+def test_read_excel_chunks_matches_read_excel_on_sample_file():
+    path = os.path.join(mapping.DATA_FOLDER, SAMPLE_FILES[1])
+    if not os.path.exists(path):
+        pytest.skip(f"sample file missing: {path}")
+    pd.testing.assert_frame_equal(pd.concat(mapping.read_excel_chunks(path, 7000)), pd.read_excel(path))
+
+
+def test_excel_na_values_copy_matches_pandas():
+    from pandas._libs.parsers import STR_NA_VALUES
+    assert mapping.EXCEL_NA_VALUES == set(STR_NA_VALUES)
+
+
+def test_read_excel_chunks_without_private_pandas_na_values(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'pandas._libs.parsers', None)  # Import fails
+    path = write_workbook(tmp_path / 'tricky.xlsx', TRICKY_ROWS)
+    chunks = list(mapping.read_excel_chunks(path, 2))
+    monkeypatch.undo()
+    pd.testing.assert_frame_equal(pd.concat(chunks), pd.read_excel(path))
+
+
+def test_parquet_sink_widens_types_across_chunks(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'mapped.parquet')
+    sink = mapping.ParquetSink(path)
+    sink.write(pd.DataFrame({'Keyword': ['milk', 1234], 'Position': [1, 2], 'Category': ['E-commerce', 'Other']}))
+    sink.write(pd.DataFrame({'Keyword': ['tea', None], 'Position': [4.5, np.nan], 'Category': ['E-commerce', 'x']}))
+    assert not os.path.exists(path)  # Only the .part file exists until close()
+    sink.close()
+
+    table = pq.read_table(path)
+    assert str(table.schema.field('Position').type) == 'double'
+    assert table.schema.field('Category').type.value_type == 'string'
+    assert table.column('Keyword').to_pylist() == ['milk', '1234', 'tea', None]
+    assert table.column('Position').to_pylist()[:3] == [1.0, 2.0, 4.5]
+    assert not os.path.exists(path + '.part')
+
+
+def test_parquet_output_with_mixed_keyword_column(tmp_path):
+    pytest.importorskip('pyarrow')
+    path = write_workbook(tmp_path / 'mixed.xlsx', [['Keyword', 'URL', 'Position'], ['milk', 'https://www.bigbasket.com/', 1],
+                                                   [2024, 'https://www.swiggy.com/', 2]])
+    mapping.process_excel_file(path, output_folder=str(tmp_path / 'out'), output_format='parquet')
+    mapped = pd.read_parquet(tmp_path / 'out' / 'mixed_mapped.parquet')
+    assert mapped['Keyword'].tolist() == ['milk', '2024']
+    assert mapped['Position'].tolist() == [1, 2]
+
+
+def test_failed_run_leaves_no_partial_output(tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    path = write_workbook(tmp_path / 'positions.xlsx', TRICKY_ROWS)
+
+    add_category_columns = mapping.add_category_columns
+    calls = []
+
+    # Map the first chunk, fail on the second
+    def fail_later(chunk, *args):
+        calls.append(len(chunk))
+        if len(calls) > 1:
+            raise RuntimeError('mapping failed')
+        return add_category_columns(chunk, *args)
+
+    monkeypatch.setattr(mapping, 'add_category_columns', fail_later)
+    with pytest.raises(RuntimeError):
+        mapping.process_excel_file(path, chunk_size=2, output_folder=str(tmp_path / 'out'), output_format='parquet')
+    assert os.listdir(tmp_path / 'out') == []
+
+
+# Map files into a fresh output folder and return the output paths
+def run_mapping(tmp_path, label, file_paths, output_format, **options):
+    output_folder = str(tmp_path / label)
+    mapping.process_files(file_paths, output_folder=output_folder, output_format=output_format, **options)
+    return [mapping.mapped_output_path(path, output_folder, output_format) for path in file_paths]
+
+
+# Rows of fuzzed keywords and URLs; Position turns from int to float partway through
+def synthetic_rows(count, seed=0):
+    rng = random.Random(seed)
+    vocabulary = RULE_TERMS + FILLER_WORDS
+    rows = [['Keyword', 'URL', 'Position']]
+    for idx in range(count):
+        keyword = ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 4)))
+        rows.append([keyword, rng.choice(FUZZ_URLS) or None, None if idx == count * 2 // 3 else idx])
+    return rows
+
+
+# Map file_path with the default settings and with each set of worker options, and compare the outputs
+def assert_workers_match_default_run(tmp_path, output_format, cases):
+    if output_format == 'parquet':
+        pytest.importorskip('pyarrow')
+    for idx, (file_path, options) in enumerate(cases):
+        [expected] = run_mapping(tmp_path, f'default-{idx}', [file_path], output_format)
+        [actual] = run_mapping(tmp_path, f'workers-{idx}', [file_path], output_format, **options)
+        if output_format == 'csv':
+            with open(expected, 'rb') as expected_file, open(actual, 'rb') as actual_file:
+                assert expected_file.read() == actual_file.read(), options
+        else:
+            # Row groups carry their own Category dictionaries, so compare decoded values
+            pd.testing.assert_frame_equal(pd.read_parquet(actual), pd.read_parquet(expected), obj=str(options))
+
+
+@pytest.mark.parametrize('output_format', ['csv', 'parquet'])
+def test_workers_match_default_run(tmp_path, monkeypatch, output_format):
+    tricky = write_workbook(tmp_path / 'tricky.xlsx', TRICKY_ROWS)
+    synthetic = write_workbook(tmp_path / 'synthetic.xlsx', synthetic_rows(300))
+    monkeypatch.setattr(mapping, 'DEFAULT_CHUNK_SIZE', 70)  # Several shards per synthetic file
+    assert_workers_match_default_run(tmp_path, output_format, [
+        (tricky, {'workers': 2}), (tricky, {'workers': 3, 'chunk_size': 2}),
+        (synthetic, {'workers': 2}), (synthetic, {'workers': 3, 'chunk_size': 70}),
+    ])
+
+
+@slow
+@pytest.mark.parametrize('output_format', ['csv', 'parquet'])
+def test_workers_match_default_run_on_sample_file(tmp_path, monkeypatch, output_format):
+    sample = os.path.join(mapping.DATA_FOLDER, SAMPLE_FILES[1])
+    if not os.path.exists(sample):
+        pytest.skip(f"sample file missing: {sample}")
+    monkeypatch.setattr(mapping, 'DEFAULT_CHUNK_SIZE', 7000)  # Several shards per sample file
+    assert_workers_match_default_run(tmp_path, output_format, [
+        (sample, {'workers': 2}), (sample, {'workers': 2, 'chunk_size': 7000}),
+    ])
+
+
+def test_bare_cache_option_follows_output_folder(tmp_path, monkeypatch):
+    write_workbook(tmp_path / 'positions.xlsx', TRICKY_ROWS)
+    output_folder = tmp_path / 'out'
+    monkeypatch.setattr('sys.argv', ['Task4_Data_Mapping.py', '--format', 'csv', '--cache', '--data-folder',
+                                     str(tmp_path), '--output-folder', str(output_folder), 'positions.xlsx'])
+    mapping.main()
+    assert os.path.exists(output_folder / mapping.CACHE_FILENAME)
+    assert os.path.exists(output_folder / 'positions_mapped.csv')
+
+
+CACHE_KEYWORDS = pd.Series(['milk near me', 'swiggy', 'milk near me', 'best pizza in town today'], dtype=object)
+CACHE_URLS = pd.Series(['https://www.bigbasket.com/', 'https://www.swiggy.com/', 'https://www.bigbasket.com/', ''],
+                       dtype=object)
+
+
+# Map CACHE_KEYWORDS through a cache and return (mapped, keys evaluated)
+def map_with_cache(cache, keywords=CACHE_KEYWORDS, urls=CACHE_URLS):
+    stats = mapping.RuleStats()
+    mapped = mapping.map_categories(keywords, urls, cache, stats)
+    return mapped, stats.evaluated_keys
+
+
+def test_mapping_cache_reuses_keys_across_runs(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    expected = mapping.map_categories(CACHE_KEYWORDS, CACHE_URLS)
+
+    cache = mapping.MappingCache(path)
+    mapped, evaluated = map_with_cache(cache)
+    cache.close()
+    pd.testing.assert_frame_equal(mapped, expected)
+    assert evaluated == 3  # Miss: every unique key is evaluated and stored
+
+    cache = mapping.MappingCache(path)  # A second run
+    mapped, evaluated = map_with_cache(cache)
+    pd.testing.assert_frame_equal(mapped, expected)
+    assert evaluated == 0  # Hit: all keys come from the cache
+
+    keywords = pd.concat([CACHE_KEYWORDS, pd.Series(['order groceries online'])], ignore_index=True)
+    urls = pd.concat([CACHE_URLS, pd.Series([''])], ignore_index=True)
+    mapped, evaluated = map_with_cache(cache, keywords, urls)
+    cache.close()
+    pd.testing.assert_frame_equal(mapped, mapping.map_categories(keywords, urls))
+    assert evaluated == 1  # Only the new key misses
+
+
+def test_mapping_cache_is_invalidated_by_rules_version(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = mapping.MappingCache(path, rules_version='old-rules')
+    keys = pd.DataFrame({'keyword': ['milk near me'], 'url_class': [0]})
+    cache.store(keys, np.array([mapping.LONG_QUERY_RULE]))  # A stale answer
+    assert cache.lookup(keys) == {0: mapping.LONG_QUERY_RULE}
+    cache.close()
+
+    cache = mapping.MappingCache(path)  # Current RULES_VERSION
+    assert cache.lookup(keys) == {}
+    assert cache.connection.execute('SELECT COUNT(*) FROM key_rules').fetchone() == (0,)
+    mapped, evaluated = map_with_cache(cache)
+    cache.close()
+    pd.testing.assert_frame_equal(mapped, mapping.map_categories(CACHE_KEYWORDS, CACHE_URLS))
+    assert evaluated == 3
+
+
+INCREMENTAL_HEADER = ['Keyword', 'URL', 'Position']
+FIRST_RUN_ROWS = [
+    ['milk near me', 'https://www.bigbasket.com/', 1],
+    ['swiggy', 'https://www.swiggy.com/', 2],
+    ['best pizza in town today', None, 3],
+    ['milk near me', 'https://www.bigbasket.com/', 1],  # Duplicate row
+]
+SECOND_RUN_ROWS = [
+    ['milk near me', 'https://www.bigbasket.com/', 1],  # Reused, twice
+    ['swiggy', 'https://www.swiggy.com/', 5],  # Changed: same Keyword/URL, new Position
+    ['order groceries online', None, 4],  # Added, twice
+    ['order groceries online', None, 4],
+    ['milk near me', 'https://www.bigbasket.com/', 1],
+]  # 'best pizza in town today' is removed
+
+
+# Map a workbook incrementally into output_folder; return the printed counts
+def run_incremental(path, output_folder, capsys, **options):
+    capsys.readouterr()
+    mapping.process_excel_file(path, output_folder=str(output_folder), output_format='csv', incremental=True,
+                               **options)
+    [line] = [line for line in capsys.readouterr().out.splitlines() if 'Incremental:' in line]
+    numbers = [int(word) for word in line.replace(',', ' ').split() if word.isdigit()]
+    return dict(zip(['added', 'changed', 'removed', 'reused'], numbers))
+
+
+# Assert an incremental output file matches a full run over the same input
+def assert_matches_full_run(path, incremental_output, full_folder, **options):
+    mapping.process_excel_file(path, output_folder=str(full_folder), output_format='csv', **options)
+    with open(incremental_output, 'rb') as actual, open(full_folder / 'positions_mapped.csv', 'rb') as expected:
+        assert actual.read() == expected.read()
+
+
+@pytest.mark.parametrize('chunk_size', [None, 2])
+def test_incremental_counts_and_output(tmp_path, capsys, chunk_size):
+    path = tmp_path / 'positions.xlsx'
+    output = tmp_path / 'out' / 'positions_mapped.csv'
+    write_workbook(path, [INCREMENTAL_HEADER] + FIRST_RUN_ROWS)
+    assert run_incremental(path, tmp_path / 'out', capsys, chunk_size=chunk_size) == \
+        {'added': 4, 'changed': 0, 'removed': 0, 'reused': 0}
+    assert os.path.exists(mapping.fingerprint_path(str(output)))
+
+    write_workbook(path, [INCREMENTAL_HEADER] + SECOND_RUN_ROWS)
+    assert run_incremental(path, tmp_path / 'out', capsys, chunk_size=chunk_size) == \
+        {'added': 2, 'changed': 1, 'removed': 1, 'reused': 2}
+    assert_matches_full_run(path, output, tmp_path / 'full', chunk_size=chunk_size)
+
+    # Nothing changed since the last run: every row is reused
+    assert run_incremental(path, tmp_path / 'out', capsys, chunk_size=chunk_size) == \
+        {'added': 0, 'changed': 0, 'removed': 0, 'reused': 5}
+    assert_matches_full_run(path, output, tmp_path / 'full-again', chunk_size=chunk_size)
+
+
+def test_incremental_after_empty_previous_run(tmp_path, capsys):
+    path = tmp_path / 'positions.xlsx'
+    write_workbook(path, [INCREMENTAL_HEADER])
+    assert run_incremental(path, tmp_path / 'out', capsys) == {'added': 0, 'changed': 0, 'removed': 0, 'reused': 0}
+
+    write_workbook(path, [INCREMENTAL_HEADER] + FIRST_RUN_ROWS)
+    assert run_incremental(path, tmp_path / 'out', capsys) == {'added': 4, 'changed': 0, 'removed': 0, 'reused': 0}
+    assert_matches_full_run(path, tmp_path / 'out' / 'positions_mapped.csv', tmp_path / 'full')
+
+
+def test_incremental_ignores_fingerprints_of_other_rules(tmp_path, capsys, monkeypatch):
+    path = tmp_path / 'positions.xlsx'
+    write_workbook(path, [INCREMENTAL_HEADER] + FIRST_RUN_ROWS)
+    run_incremental(path, tmp_path / 'out', capsys)
+    monkeypatch.setattr(mapping, 'RULES_VERSION', 'edited-rules')
+    assert run_incremental(path, tmp_path / 'out', capsys) == {'added': 4, 'changed': 0, 'removed': 0, 'reused': 0}
+
+
+STATS_KEYWORDS = pd.Series(['fruit', 'fruit', 'fresh fish', 'swiggy', 'best phone', 'how to fix a phone'], dtype=object)
+STATS_URLS = pd.Series([''] * len(STATS_KEYWORDS), dtype=object)
+STATS_RULES = [0, 0, 1, mapping.SHORT_QUERY_RULE, mapping.SHORT_QUERY_RULE, mapping.LONG_QUERY_RULE]
+
+
+def test_rule_stats_counts_hits_fall_through_and_dead_rules():
+    stats = mapping.RuleStats()
+    mapping.map_categories(STATS_KEYWORDS, STATS_URLS, stats=stats)
+    report = stats.report()
+
+    expected_hits = np.bincount(STATS_RULES, minlength=len(mapping.RULE_CATEGORIES))
+    assert [rule['hits'] for rule in report['rules']] == expected_hits[:len(mapping.MAPPING_RULES)].tolist()
+    assert report['rules'][0]['hit_rate'] == pytest.approx(2 / 6)
+    assert (report['rules'][1]['category'], report['rules'][1]['sub_category']) == \
+        ('E-commerce', 'Fresh Meat & Seafood')
+    assert report['rows'] == 6 and report['reused_rows'] == 0
+    assert report['unique_keys'] == report['evaluated_keys'] == 5
+    assert report['fall_through'] == {'rows': 3, 'rate': 0.5, 'short_query_rows': 2, 'long_query_rows': 1}
+    assert report['dead_rules'] == [rule for rule in range(len(mapping.MAPPING_RULES)) if rule not in (0, 1)]
+    assert set(report['stage_seconds']) == {'collapse', 'evaluate', 'broadcast'}
+    assert all(rule['eval_seconds'] >= 0 for rule in report['rules'])
+    assert report['rules_version'] == mapping.RULES_VERSION
+
+    # Merging two runs adds their counters
+    merged = mapping.RuleStats()
+    merged.merge(stats)
+    merged.merge(stats)
+    assert merged.report()['rows'] == 12
+    assert merged.report()['rules'][0]['hits'] == 4
+
+
+def test_rule_stats_option_writes_report(tmp_path, monkeypatch):
+    rows = [['Keyword', 'URL']] + [[keyword, url] for keyword, url in zip(STATS_KEYWORDS, STATS_URLS)]
+    write_workbook(tmp_path / 'positions.xlsx', rows)
+    output_folder = tmp_path / 'out'
+    monkeypatch.setattr('sys.argv', ['Task4_Data_Mapping.py', '--format', 'csv', '--rule-stats', '--cache',
+                                     '--data-folder', str(tmp_path), '--output-folder', str(output_folder),
+                                     'positions.xlsx'])
+    mapping.main()
+    report = json.loads((output_folder / 'positions_mapped.rule_stats.json').read_text())
+    assert report['rows'] == 6
+    assert report['fall_through']['rows'] == 3
+    assert [rule['hits'] for rule in report['rules'][:2]] == [2, 1]
+    assert {'collapse', 'cache_lookup', 'evaluate', 'cache_store', 'broadcast'} <= set(report['stage_seconds'])
+
+
+def test_rule_stats_count_reused_rows_of_incremental_runs(tmp_path, capsys):
+    path = tmp_path / 'positions.xlsx'
+    rows = [['Keyword', 'URL']] + [[keyword, url] for keyword, url in zip(STATS_KEYWORDS, STATS_URLS)]
+    write_workbook(path, rows)
+    run_incremental(path, tmp_path / 'out', capsys, rule_stats=True)
+    write_workbook(path, rows + [['order groceries online', '']])
+    assert run_incremental(path, tmp_path / 'out', capsys, rule_stats=True)['reused'] == 6
+
+    report = json.loads((tmp_path / 'out' / 'positions_mapped.rule_stats.json').read_text())
+    assert report['rows'] == 7
+    assert report['reused_rows'] == 6
+    assert report['evaluated_keys'] == 1
+    assert [rule['hits'] for rule in report['rules'][:2]] == [2, 1]  # Matched by reused rows only
+    assert 0 not in report['dead_rules'] and 1 not in report['dead_rules']
+    assert report['fall_through']['rows'] == 3
+
+
+def test_benchmark_compares_only_the_same_format(tmp_path, monkeypatch, capsys):
+    baseline_path = tmp_path / 'baseline.json'
+
+    def run(output_format, *options):
+        monkeypatch.setattr('sys.argv', ['benchmark_mapping.py', '--sizes', '10k', '--format', output_format,
+                                         '--work-folder', str(tmp_path), '--baseline', str(baseline_path), *options])
+        try:
+            benchmark_mapping.main()
+        except SystemExit as exit:
+            return exit.code
+        return 0
+
+    assert run('csv', '--save-baseline') == 0
+    baseline = json.loads(baseline_path.read_text())
+    assert list(baseline) == ['10k/csv']
+    # Make the stored CSV run impossibly fast: a CSV run is now a regression, a Parquet run is not compared
+    baseline['10k/csv']['rows_per_second'] = {stage: 10 ** 12 for stage in ('read', 'map', 'write')}
+    baseline_path.write_text(json.dumps(baseline))
+    capsys.readouterr()
+    assert run('csv') == 1
+    assert 'Regressions against baseline' in capsys.readouterr().out
+    if importlib.util.find_spec('pyarrow') is not None:
+        assert run('parquet') == 0
+        assert 'No baseline for 10k/parquet' in capsys.readouterr().out
+    assert benchmark_mapping.compare_to_baseline('10k', {'format': 'parquet', 'rows_per_second': {'write': 1},
+                                                         'peak_rss_mb': 10 ** 6}, baseline['10k/csv'], 0.25) == []
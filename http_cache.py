@@ -0,0 +1,205 @@
+# Shared on-disk HTTP response cache for the scrapers (Task 2, Task 3)
+import os            # For the default cache path
+import json          # For stored response headers
+import time          # For TTLs
+import sqlite3       # For the on-disk store
+import hashlib       # For cache keys
+import threading     # For sharing one cache between worker threads
+import asyncio       # For keeping SQLite calls off the event loop
+import requests      # HTTP client for synchronous fetches
+
+
+# Default cache file (repository root) and freshness window
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'http_cache.sqlite')
+DEFAULT_TTL = 24 * 3600  # Seconds a stored response is served without revalidation
+
+
+class OfflineCacheMiss(requests.exceptions.ConnectionError):
+    """Raised in offline mode when a request has no stored response."""
+
+
+class CachedResponse:
+    """A stored response with the parts of requests.Response the scrapers use."""
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.from_cache = True
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of successful HTTP responses keyed by method,
+    URL and request body. Responses younger than ttl are served from disk;
+    older ones are revalidated with If-None-Match / If-Modified-Since when
+    the server sent an ETag or Last-Modified, and re-downloaded otherwise.
+    With offline=True nothing touches the network: every request is served
+    from the cache, whatever its age, or raises OfflineCacheMiss.
+    One cache can be shared by several threads.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, offline=False):
+        self.ttl = ttl
+        self.offline = offline
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')  # Lets several scrapers share the file
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            ' key TEXT PRIMARY KEY, method TEXT, url TEXT, status INTEGER, headers TEXT, body BLOB,'
+            ' etag TEXT, last_modified TEXT, stored_at REAL) WITHOUT ROWID'
+        )
+        self.connection.commit()
+
+    # Cache key of a request
+    @staticmethod
+    def key(method, url, body=None):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        digest = hashlib.sha256(f"{method.upper()}\n{url}\n".encode('utf-8'))
+        digest.update(body or b'')
+        return digest.hexdigest()
+
+    # Stored response for a key, or None
+    def load(self, key):
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT url, status, headers, body, etag, last_modified, stored_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        url, status, headers, body, etag, last_modified, stored_at = row
+        response = CachedResponse(url, status, json.loads(headers), body)
+        response.etag, response.last_modified, response.stored_at = etag, last_modified, stored_at
+        return response
+
+    # Decide how to serve a request: (stored response or None, headers to revalidate it or None)
+    def lookup(self, key, ttl=None):
+        """
+        Returns (response, None) when the stored response can be served as is,
+        (response, conditional headers) when it must be revalidated first and
+        (None, None) on a miss. Raises OfflineCacheMiss on an offline miss.
+        """
+        stored = self.load(key)
+        if self.offline:
+            if stored is None:
+                raise OfflineCacheMiss(f"Offline mode: no cached response for key {key[:12]}")
+            self.stats['hits'] += 1
+            return stored, None
+        if stored is None:
+            self.stats['misses'] += 1
+            return None, None
+        if time.time() - stored.stored_at < (self.ttl if ttl is None else ttl):
+            self.stats['hits'] += 1
+            return stored, None
+        conditional = {}
+        if stored.etag:
+            conditional['If-None-Match'] = stored.etag
+        if stored.last_modified:
+            conditional['If-Modified-Since'] = stored.last_modified
+        if not conditional:
+            self.stats['misses'] += 1
+            return None, None
+        return stored, conditional
+
+    # True when a GET/POST would be answered without the network (fresh entry or offline mode)
+    def fresh(self, method, url, body=None, ttl=None):
+        if self.offline:
+            return True
+        stored = self.load(self.key(method, url, body))
+        return stored is not None and time.time() - stored.stored_at < (self.ttl if ttl is None else ttl)
+
+    # Drop a stored response (e.g. a block page that was served with status 200)
+    def forget(self, method, url, body=None):
+        with self.lock:
+            self.connection.execute('DELETE FROM responses WHERE key = ?', (self.key(method, url, body),))
+            self.connection.commit()
+
+    # Save a successful response
+    def store(self, key, method, url, status, headers, body):
+        headers = {name.lower(): value for name, value in headers.items()}
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, method.upper(), url, status, json.dumps(headers), body,
+                 headers.get('etag'), headers.get('last-modified'), time.time()),
+            )
+            self.connection.commit()
+
+    # A 304 answer: the stored response is good for another ttl
+    def refresh(self, key, stored):
+        self.stats['revalidated'] += 1
+        stored.stored_at = time.time()
+        with self.lock:
+            self.connection.execute('UPDATE responses SET stored_at = ? WHERE key = ?', (stored.stored_at, key))
+            self.connection.commit()
+        return stored
+
+    # Synchronous request through the cache (requests.request arguments)
+    def request(self, method, url, ttl=None, **kwargs):
+        """
+        Drop-in for requests.request(method, url, **kwargs). Returns a
+        CachedResponse on a hit or 304, otherwise the live requests.Response
+        (stored when its status is 200).
+        """
+        prepared = requests.Request(method, url, params=kwargs.pop('params', None), data=kwargs.pop('data', None),
+                                    headers=kwargs.pop('headers', None)).prepare()
+        key = self.key(prepared.method, prepared.url, prepared.body)
+        stored, conditional = self.lookup(key, ttl)
+        if stored is not None and conditional is None:
+            return stored
+        if conditional:
+            prepared.headers.update(conditional)
+        with requests.Session() as session:
+            response = session.send(prepared, **kwargs)
+        if stored is not None and response.status_code == 304:
+            return self.refresh(key, stored)
+        if response.status_code == 200:
+            self.store(key, prepared.method, prepared.url, response.status_code, response.headers, response.content)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    # GET through an aiohttp session; returns the body bytes
+    async def fetch_async(self, session, url, ttl=None):
+        """
+        Cached counterpart of reading session.get(url). Raises for non-2xx
+        statuses like response.raise_for_status(). The SQLite reads and
+        writes run in the loop's default executor, so a slow disk or a
+        locked database does not stall other requests on the loop.
+        """
+        loop = asyncio.get_running_loop()
+        key = self.key('GET', url)
+        stored, conditional = await loop.run_in_executor(None, self.lookup, key, ttl)
+        if stored is not None and conditional is None:
+            return stored.content
+        async with session.get(url, headers=conditional) as response:
+            if stored is not None and response.status == 304:
+                return (await loop.run_in_executor(None, self.refresh, key, stored)).content
+            response.raise_for_status()
+            body = await response.read()
+            if response.status == 200:
+                await loop.run_in_executor(None, self.store, key, 'GET', url, response.status,
+                                           response.headers, body)
+            return body
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,97 @@
+# Adaptive per-host request pacing for the scrapers (Task 1, Task 2)
+import time          # For pacing
+import random        # For backoff jitter
+import asyncio       # For pacing inside the async fetchers
+import threading     # For sharing one controller between worker threads
+
+
+# Responses that mean "slow down"
+THROTTLE_STATUSES = (429, 503)
+
+
+# True when a response asks us to slow down (status code or a block/captcha page)
+def is_throttled(status, body=b'', markers=()):
+    if status in THROTTLE_STATUSES:
+        return True
+    return any(marker in body for marker in markers)
+
+
+class RateController:
+    """
+    AIMD pacing per host. Requests to a host are spaced 1/rate seconds
+    apart. Every healthy response adds `increase` requests/second (up to
+    max_rate); every throttled response multiplies the rate by `decrease`
+    (down to min_rate) and pushes the next slot out. Callers retry a
+    throttled or failed request after backoff(attempt), which doubles per
+    attempt. stats() reports the current rate and counters per host.
+    One controller can be shared by several threads.
+    """
+
+    def __init__(self, initial_rate=1.0, min_rate=0.1, max_rate=10.0, increase=0.25, decrease=0.5,
+                 max_retries=4, backoff_base=2.0, backoff_max=60.0):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def _host(self, host):
+        if host not in self.hosts:
+            self.hosts[host] = {'rate': self.initial_rate, 'next_slot': 0.0,
+                                'requests': 0, 'throttled': 0, 'retries': 0, 'failures': 0}
+        return self.hosts[host]
+
+    # Reserve the next request slot for a host; returns the seconds to wait for it
+    def reserve(self, host):
+        with self.lock:
+            state = self._host(host)
+            now = time.monotonic()
+            slot = max(now, state['next_slot'])
+            state['next_slot'] = slot + 1 / state['rate']
+            state['requests'] += 1
+        return slot - now
+
+    def wait(self, host):
+        time.sleep(self.reserve(host))
+
+    async def wait_async(self, host):
+        await asyncio.sleep(self.reserve(host))
+
+    # Additive increase after a healthy response
+    def success(self, host):
+        with self.lock:
+            state = self._host(host)
+            state['rate'] = min(self.max_rate, state['rate'] + self.increase)
+
+    # Multiplicative decrease after a throttled response
+    def throttled(self, host):
+        with self.lock:
+            state = self._host(host)
+            state['throttled'] += 1
+            state['rate'] = max(self.min_rate, state['rate'] * self.decrease)
+            state['next_slot'] = max(state['next_slot'], time.monotonic() + 1 / state['rate'])
+
+    def retried(self, host):
+        with self.lock:
+            self._host(host)['retries'] += 1
+
+    def failed(self, host):
+        with self.lock:
+            self._host(host)['failures'] += 1
+
+    # Seconds to wait before retry number `attempt` (0-based), with jitter
+    def backoff(self, attempt):
+        return min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    # Current rate and counters per host
+    def stats(self):
+        stats = {}
+        for host, state in self.hosts.items():
+            stats[host] = {key: value for key, value in state.items() if key != 'next_slot'}
+            stats[host]['rate'] = round(state['rate'], 2)
+        return stats